@@ -28,6 +28,7 @@ Bioconda Utilities Package
    hosters
    pkg_test
    recipe
+   repodata
    sphinxext
    autobump
    update_pinnings
@@ -7,7 +7,6 @@ import os
 import pickle
 import signal
 
-from concurrent.futures import ProcessPoolExecutor
 try:
     from concurrent.futures import BrokenExecutor
 except ImportError:
@@ -23,7 +22,7 @@ import aiohttp
 import aioftp
 import backoff
 
-from .utils import tqdm, threads_to_use
+from .utils import tqdm, threads_to_use, RenderPool
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -95,8 +94,6 @@ class AsyncPipeline(Generic[ITEM]):
         self.conda_sem: asyncio.Semaphore = asyncio.Semaphore(1)
         #: the filters successively applied to each item
         self.filters: List[AsyncFilter] = []
-        #: executor running things in separate python processes
-        self.proc_pool_executor = ProcessPoolExecutor(self.threads)
 
         self._shutting_down = False
 
@@ -108,7 +105,7 @@ class AsyncPipeline(Generic[ITEM]):
         self._shutting_down = True
         if sig == signal.SIGINT:
             logger.error("Ctrl-C pressed - aborting...")
-        self.proc_pool_executor.shutdown()
+        RenderPool.shutdown()
         tasks = [t for t in asyncio.Task.all_tasks() if t != asyncio.Task.current_task()]
         for t in tasks:
             t.cancel()
@@ -118,7 +115,7 @@ class AsyncPipeline(Generic[ITEM]):
     def run(self) -> bool:
         """Enters the asyncio loop and manages shutdown."""
         # We need to handle KeyboardInterrupt "manually" to get clean shutdown
-        # for the ProcessPoolExecutor
+        # for the process pool
         self.loop.add_signal_handler(signal.SIGINT,
                                      lambda: asyncio.ensure_future(self.shutdown(signal.SIGINT)))
         try:
@@ -218,8 +215,8 @@ class AsyncPipeline(Generic[ITEM]):
             return await self.loop.run_in_executor(None, func, *args)
 
     async def run_sp(self, func, *args):
-        """Run **func** in process pool executor using **args**"""
-        return await self.loop.run_in_executor(self.proc_pool_executor, func, *args)
+        """Run **func** in `RenderPool` process pool using **args**"""
+        return await asyncio.wrap_future(RenderPool.submit(func, *args), loop=self.loop)
 
 
 class AsyncRequests():
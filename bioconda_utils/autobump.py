@@ -43,8 +43,6 @@ Overview:
 import abc
 import asyncio
 import logging
-import os
-import pickle
 import random
 
 from collections import defaultdict, Counter
@@ -70,8 +68,7 @@ from . import utils
 from . import update_pinnings
 from . import graph
 from .utils import ensure_list, RepoData
-from .recipe import Recipe
-from .recipe import load_parallel_iter as recipes_load_parallel_iter
+from .recipe import Recipe, RecipeSummary
 from .aiopipe import AsyncFilter, AsyncPipeline, AsyncRequests, EndProcessingItem, EndProcessing
 
 from .githandler import GitHandler
@@ -123,6 +120,12 @@ class RecipeSource:
 
 
 class RecipeGraphSource(RecipeSource):
+    """Source for **Recipe** objects ordered by the dependency graph
+
+    Recipes are sent only after all their dependencies have been
+    processed. The graph is built from `RecipeSummary` records. The
+    recipes sent are not loaded yet (see `LoadRecipe`).
+    """
     def __init__(self, recipe_base: str, packages: List[str], exclude: List[str],
                  shuffle: bool, config: Dict[str, str], cache_fn: str = None) -> None:
         super().__init__(recipe_base, packages, exclude, shuffle)
@@ -132,6 +135,10 @@ class RecipeGraphSource(RecipeSource):
         self.dag = self.load_graph()
         self.dag = graph.filter_recipe_dag(self.dag, packages, exclude)
         logger.warning("Graph contains %i packages (blacklist excluded)", len(self.dag))
+        #: Graph nodes by recipe folder
+        self.nodes: Dict[str, RecipeSummary] = {node.reldir: node for node in self.dag}
+        #: Folders of the recipes modified by the pipeline
+        self.modified: Set[str] = set()
 
     async def queue_items(self, send_q, return_q):
         # Build a copy of the graph we can meddle with
@@ -139,37 +146,51 @@ class RecipeGraphSource(RecipeSource):
         dag.add_nodes_from(self.dag)
         dag.add_edges_from(self.dag.edges())
         # Keep set of recipes "in flight"
-        sent: Set[Recipe] = set()
+        sent: Set[RecipeSummary] = set()
         while dag:
-            remaining_recipes = dag.nodes()
+            remaining_recipes = list(dag.nodes())
             if self.shuffle:
                 random.shuffle(remaining_recipes)
-            for recipe in remaining_recipes:
-                if recipe not in sent and dag.in_degree(recipe) == 0:
-                    await send_q.put(recipe)
-                    sent.add(recipe)
+            for node in remaining_recipes:
+                if node not in sent and dag.in_degree(node) == 0:
+                    await send_q.put(Recipe(node.dir, node.basedir))
+                    sent.add(node)
+            if not sent:
+                logger.error("Dependency cycle among %i recipes", len(dag))
+                break
             item = await return_q.get()
-            dag.remove_node(item)
-            sent.remove(item)
+            if item.is_modified():
+                self.modified.add(item.reldir)
+            node = self.nodes[item.reldir]
+            dag.remove_node(node)
+            sent.remove(node)
             return_q.task_done()
 
     def get_item_count(self):
         return len(self.dag)
 
+    def get_pending_deps(self, recipe: Recipe) -> List[RecipeSummary]:
+        """Returns the dependencies of **recipe** modified by the pipeline"""
+        return [dep for dep in nx.ancestors(self.dag, self.nodes[recipe.reldir])
+                if dep.reldir in self.modified]
+
     def load_graph(self):
-        if self.cache_fn and os.path.exists(self.cache_fn):
-            with open(self.cache_fn, "rb") as stream:
-                dag = pickle.load(stream)
-        else:
-            blacklist = utils.get_blacklist(self.config, self.recipe_base)
-            dag = graph.build_from_recipes(
-                recipe for recipe in recipes_load_parallel_iter(self.recipe_base, "*")
-                if recipe.reldir not in blacklist
-            )
-            if self.cache_fn:
-                with open(self.cache_fn, "wb") as stream:
-                    pickle.dump(dag, stream)
-        return dag
+        """Builds the graph from `RecipeSummary` records kept in a `graph.RecipeGraphStore`
+
+        Only recipes changed since the graph was last loaded are parsed.
+        """
+        blacklist = utils.get_blacklist(self.config, self.recipe_base)
+        store = graph.RecipeGraphStore(
+            self.recipe_base, "summary",
+            partial(RecipeSummary.from_file, self.recipe_base, return_exceptions=True),
+            path=self.cache_fn)
+        summaries = store.update()
+        for reldir, (_, message) in store.failures.items():
+            logger.error("Skipping recipe %s: %s", reldir, message)
+        return graph.build_from_recipes(
+            summary for reldir, summary in summaries.items()
+            if reldir not in blacklist
+        )
 
 
 class Scanner(AsyncPipeline[Recipe]):
@@ -370,15 +391,12 @@ class ExcludeDependencyPending(Filter):
         """A dependency of this recipe is pending rebuild"""
         template = "deferred pending rebuild of dependencies: %s"
 
-    def __init__(self, scanner: Scanner, dag: nx.DiGraph) -> None:
+    def __init__(self, scanner: Scanner, recipe_source: RecipeGraphSource) -> None:
         self.scanner = scanner
-        self.dag = dag
+        self.recipe_source = recipe_source
 
     async def apply(self, recipe: Recipe) -> None:
-        pending_deps = [
-            dep for dep in nx.ancestors(self.dag, recipe)
-            if dep.is_modified()
-        ]
+        pending_deps = self.recipe_source.get_pending_deps(recipe)
         if pending_deps:
             msg =  ", ".join(str(x) for x in pending_deps)
             raise self.DependencyPending(recipe, msg)
@@ -389,8 +407,9 @@ class CheckPinning(Filter):
 
     def __init__(self, scanner: Scanner, bump_only_python: bool) -> None:
         self.scanner = scanner
-        self.build_config = utils.load_conda_build_config()
         self.bump_only_python = bump_only_python
+        # `_sp_apply` queries the repodata from the process pool
+        utils.RepoData().share()
 
     @staticmethod
     def match_version(spec, version):
@@ -412,18 +431,19 @@ class CheckPinning(Filter):
     async def apply(self, recipe: Recipe) -> None:
         reason = await self.scanner.run_sp(
             self._sp_apply,
-            (self.build_config, self.bump_only_python, recipe)
+            (self.bump_only_python, recipe)
         )
         if reason:
             recipe.data['pinning'] = reason
             new_buildno = recipe.build_number + 1
             logger.info("%s needs rebuild. Bumping buildnumber to %i", recipe, new_buildno)
             recipe.reset_buildnumber(new_buildno)
-            recipe.render()
 
     @classmethod
     def _sp_apply(cls, data) -> None:
-        config, bop, recipe = data
+        bop, recipe = data
+        # (loaded once per worker process)
+        config = utils.RenderPool.build_config()
         status = update_pinnings.check(recipe, build_config=config, keep_metas=True)
         if status.needs_bump(bop):
             metas = recipe.conda_render(config=config)
@@ -463,13 +483,11 @@ class CheckPinning(Filter):
         # Iterate over extant builds for this recipe at this version and build number
         # It's one for noarch, two if osx and linux are built, more if we have
         # variant pins such as for python.
-        package_data = RepoData().get_package_data(['build', 'depends', 'platform'],
-                                                   name=recipe.name,
-                                                   version=recipe.version,
-                                                   build_number=recipe.build_number)
-        for _build_id, package_deps, _platform in package_data:
-            for item in package_deps:
-                package, _, constraint = item.partition(" ")
+        package_data = RepoData().get_depends(recipe.name,
+                                              version=recipe.version,
+                                              build_number=recipe.build_number)
+        for package_deps in package_data:
+            for package, constraint in package_deps:
                 if not constraint or package not in pinnings:
                     continue
                 if any(cls.match_version(constraint, version)
@@ -596,19 +614,19 @@ class UpdateVersion(Filter, AutoBumpConfigMixin):
         if VersionOrder(latest) == VersionOrder(recipe.version):
             return
 
-        # Update `url:`s without Jinja expressions (plain text)
-        for fname in versions[latest]:
-            recipe.replace(fname, versions[latest][fname]['link'], within=["source"])
+        with recipe.edit():  # render only once, after all edits
+            # Update `url:`s without Jinja expressions (plain text)
+            for fname in versions[latest]:
+                recipe.replace(fname, versions[latest][fname]['link'], within=["source"])
 
-        # Update the version number itself. This will also usually update
-        # `url:`s expressed with `{{version}}` tags.
-        if not recipe.replace(recipe.version, latest, within=["package"]):
-            # allow changes between dash/dot/underscore
-            if recipe.replace(recipe.version, latest, within=["package"], with_fuzz=True):
-                logger.warning("Recipe %s: replaced version with fuzz", recipe)
+            # Update the version number itself. This will also usually update
+            # `url:`s expressed with `{{version}}` tags.
+            if not recipe.replace(recipe.version, latest, within=["package"]):
+                # allow changes between dash/dot/underscore
+                if recipe.replace(recipe.version, latest, within=["package"], with_fuzz=True):
+                    logger.warning("Recipe %s: replaced version with fuzz", recipe)
 
-        recipe.reset_buildnumber()
-        recipe.render()
+            recipe.reset_buildnumber()
 
         # Verify that the rendered recipe has the right version number
         if VersionOrder(recipe.version) != VersionOrder(latest):
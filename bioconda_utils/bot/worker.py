@@ -21,7 +21,7 @@ import simplejson
 
 from ..githubhandler import GitHubAppHandler, GitHubHandler
 from ..githandler import install_gpg_key
-from ..utils import RepoData, setup_logger
+from ..utils import RepoData, get_cache_dir, make_private_dir, setup_logger
 from .config import (
     APP_ID, APP_KEY, CODE_SIGNING_KEY, BOT_NAME, REPODATA_TIMEOUT,
     APP_CLIENT_ID, APP_CLIENT_SECRET
@@ -202,7 +202,13 @@ capp.conf.update(
 def setup_new_celery_process(sender=None, conf=None, **_kwargs):
     """This hook is called when a celery worker is initialized
 
-    Here we make sure that the GPG signing key is installed
+    Here we make sure that the GPG signing key is installed and that
+    the worker processes share one repodata cache. The cache is kept
+    in a directory private to the bot's user, as its content is
+    trusted for skip and pinning decisions.
     """
     install_gpg_key(CODE_SIGNING_KEY)
-    RepoData().set_timeout(REPODATA_TIMEOUT)
+    if not os.environ.get(RepoData.SHARED_CACHE_ENV):
+        cache_dir = make_private_dir(os.path.join(get_cache_dir(), "bot-repodata"))
+        os.environ[RepoData.SHARED_CACHE_ENV] = os.path.join(cache_dir, "RepoDataCache")
+    RepoData().set_timeout(REPODATA_TIMEOUT, background=True)
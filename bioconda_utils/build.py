@@ -8,7 +8,7 @@ import os
 import logging
 import itertools
 
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 # TODO: UnsatisfiableError is not yet in exports for conda 4.5.4
 # from conda.exports import UnsatisfiableError
@@ -22,6 +22,7 @@ from . import pkg_test
 from . import upload
 from . import lint
 from . import graph
+from . import recipe as _recipe
 
 logger = logging.getLogger(__name__)
 
@@ -158,22 +159,100 @@ def build(recipe: str, pkg_paths: List[str] = None,
     return BuildResult(True, None)
 
 
+def _get_package_keys(recipe_folder: str,
+                      recipe: str) -> Optional[List[Tuple[str, str, int]]]:
+    """Get name, version and build number of the packages of **recipe**
+
+    Uses the recipe with line selectors applied for the build platform
+    instead of rendering it with conda-build. If the recipe cannot be
+    read this way, None is returned.
+    """
+    try:
+        recip = _recipe.Recipe.from_file(recipe_folder, recipe, readonly=True)
+        meta = recip.get_platform_meta(utils.get_build_platform())
+        version = str(meta['package']['version'])
+        build_number = int(meta.get('build', {}).get('number', 0) or 0)
+        names = [meta['package']['name']]
+        names.extend(output['name'] for output in meta.get('outputs', [])
+                     if 'name' in output)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return [(name, version, build_number) for name in names]
+
+
+def _check_recipe_skippable(check_channels: List[str],
+                            item: Tuple[str, Dict[Tuple[str, str, int], List[str]]]
+                            ) -> Optional[bool]:
+    """Calls `utils.check_recipe_skippable`, returning None on failure
+
+    Args:
+      check_channels: Channels to look for existing builds in
+      item: Tuple of recipe and its package data
+
+    Errors are reported once the recipe is checked again before
+    building it.
+    """
+    recipe, package_data = item
+    try:
+        return utils.check_recipe_skippable(recipe, check_channels, package_data)
+    except (Exception, SystemExit):  # pylint: disable=broad-except
+        return None
+
+
+def check_recipes_skippable(recipe_folder: str, recipes: List[str],
+                            check_channels: List[str]) -> Dict[str, Optional[bool]]:
+    """Checks for each of **recipes** whether all its builds exist already
+
+    The packages of all recipes are looked up with a single query to
+    `utils.RepoData`, using name, version and build number as read
+    from the recipes without conda-build. The (slow) check using
+    conda-build (`utils.check_recipe_skippable`) is run up front for
+    recipes with some package in the channels, or which could not be
+    read without conda-build, and is passed the result of this query.
+
+    For recipes without any package found, the keys read may differ
+    from those rendered by conda-build (e.g. if the version is set
+    by Jinja functions conda-build provides), so that no result is
+    returned for them.
+
+    Returns:
+      Dictionary mapping recipes to True if skippable, False if not and
+      None if still to be checked with conda-build (see `utils.get_package_paths`).
+    """
+    recipe_keys = dict(zip(recipes, utils.parallel_iter(
+        _get_package_keys, recipes, "Reading recipes", recipe_folder)))
+    package_data = utils.RepoData().get_package_data_bulk(
+        {key for keys in recipe_keys.values() if keys for key in keys},
+        "subdir", channels=check_channels, native=True)
+    skippable = {recipe: None for recipe, keys in recipe_keys.items()
+                 if keys is not None and not any(package_data[key] for key in keys)}
+    to_check = [(recipe, {key: package_data[key] for key in recipe_keys[recipe] or []})
+                for recipe in recipes if recipe not in skippable]
+    skippable.update(zip((recipe for recipe, _ in to_check), utils.parallel_iter(
+        _check_recipe_skippable, to_check, "Checking channels", check_channels)))
+    return skippable
+
+
 def remove_cycles(dag, name2recipes, failed, skip_dependent):
-    nodes_in_cycles = set()
-    for cycle in list(nx.simple_cycles(dag)):
-        logger.error('BUILD ERROR: dependency cycle found: %s', cycle)
-        nodes_in_cycles.update(cycle)
-
-    for name in sorted(nodes_in_cycles):
-        cycle_fail_recipes = sorted(name2recipes[name])
-        logger.error('BUILD ERROR: cannot build recipes for %s since '
-                     'it cyclically depends on other packages in the '
-                     'current build job. Failed recipes: %s',
-                     name, cycle_fail_recipes)
-        failed.extend(cycle_fail_recipes)
-        for node in nx.algorithms.descendants(dag, name):
-            if node not in nodes_in_cycles:
-                skip_dependent[node].extend(cycle_fail_recipes)
+    indexed = graph.IndexedGraph.from_networkx(dag)
+    cycles = indexed.cycles()
+    nodes_in_cycles = set(itertools.chain.from_iterable(cycles))
+    for cycle in cycles:
+        logger.error('BUILD ERROR: dependency cycle found: %s', sorted(cycle))
+
+    # all nodes of a cycle have the same descendants
+    for cycle in cycles:
+        descendants = indexed.descendants(cycle[:1])
+        for name in sorted(cycle):
+            cycle_fail_recipes = sorted(name2recipes[name])
+            logger.error('BUILD ERROR: cannot build recipes for %s since '
+                         'it cyclically depends on other packages in the '
+                         'current build job. Failed recipes: %s',
+                         name, cycle_fail_recipes)
+            failed.extend(cycle_fail_recipes)
+            for node in descendants:
+                if node not in nodes_in_cycles:
+                    skip_dependent[node].extend(cycle_fail_recipes)
     return dag.subgraph(name for name in dag if name not in nodes_in_cycles)
 
 
@@ -278,7 +357,8 @@ def build_recipes(recipe_folder: str, config_path: str, recipes: List[str],
 
     failed = []
 
-    dag, name2recipes = graph.build(recipes, config=config_path, blacklist=blacklist)
+    dag, name2recipes = graph.build(recipes, config=config_path, blacklist=blacklist,
+                                     recipe_folder=recipe_folder)
     if not dag:
         logger.info("Nothing to be done.")
         return True
@@ -296,11 +376,20 @@ def build_recipes(recipe_folder: str, config_path: str, recipes: List[str],
         for recipe in recipe_list:
             recipe2name[recipe] = name
 
+    indexed = graph.IndexedGraph.from_networkx(subdag)
     recipes = [(recipe, recipe2name[recipe])
-               for package in nx.topological_sort(subdag)
+               for package in indexed.topological_sort()
                for recipe in name2recipes[package]]
 
 
+    # Whether builds already exist in the channels does not depend on
+    # what we build here, so we can check all recipes up front.
+    skippable = {}
+    if not force:
+        utils.RepoData().share()  # load once for all worker processes
+        skippable = check_recipes_skippable(
+            recipe_folder, [recipe for recipe, _ in recipes], check_channels)
+
     built_recipes = []
     skipped_recipes = []
     failed_uploads = []
@@ -315,20 +404,21 @@ def build_recipes(recipe_folder: str, config_path: str, recipes: List[str],
 
         logger.info('Determining expected packages for %s', recipe)
         try:
-            pkg_paths = utils.get_package_paths(recipe, check_channels, force=force)
+            pkg_paths = utils.get_package_paths(recipe, check_channels, force=force,
+                                                skippable=skippable.get(recipe))
         except utils.DivergentBuildsError as exc:
             logger.error('BUILD ERROR: packages with divergent build strings in repository '
                          'for recipe %s. A build number bump is likely needed: %s',
                          recipe, exc)
             failed.append(recipe)
-            for pkg in nx.algorithms.descendants(subdag, name):
+            for pkg in indexed.descendants([name]):
                 skip_dependent[pkg].append(recipe)
             continue
         except UnsatisfiableError as exc:
             logger.error('BUILD ERROR: could not determine dependencies for recipe %s: %s',
                          recipe, exc)
             failed.append(recipe)
-            for pkg in nx.algorithms.descendants(subdag, name):
+            for pkg in indexed.descendants([name]):
                 skip_dependent[pkg].append(recipe)
             continue
         if not pkg_paths:
@@ -345,7 +435,7 @@ def build_recipes(recipe_folder: str, config_path: str, recipes: List[str],
 
         if not res.success:
             failed.append(recipe)
-            for pkg in nx.algorithms.descendants(subdag, name):
+            for pkg in indexed.descendants([name]):
                 skip_dependent[pkg].append(recipe)
         else:
             built_recipes.append(recipe)
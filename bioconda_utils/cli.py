@@ -14,7 +14,6 @@ import os
 import shlex
 import logging
 from collections import defaultdict, Counter
-from functools import partial
 import inspect
 from typing import List, Tuple
 
@@ -33,6 +32,7 @@ from . import bioconductor_skeleton as _bioconductor_skeleton
 from . import cran_skeleton
 from . import update_pinnings
 from . import graph
+from . import recipe as _recipe
 from .githandler import BiocondaRepo, install_gpg_key
 
 logger = logging.getLogger(__name__)
@@ -290,8 +290,10 @@ def duplicates(config,
     help='Glob for package[s] to build. Default is to build all packages. Can '
     'be specified more than once')
 @arg('--cache', help='''To speed up debugging, use repodata cached locally in
-     the provided filename. If the file does not exist, it will be created the
-     first time.''')
+     the provided directory. If the directory does not exist, it will be created
+     the first time. Parsed recipes are cached in a directory of the same name
+     with suffix "_recipes", conda-build renderings in one with suffix
+     "_render".''')
 @arg('--list-checks', help='''List the linting functions to be used and then
      exit''')
 @arg('--exclude', nargs='+', help='''Exclude this linting function. Can be used
@@ -341,6 +343,8 @@ def do_lint(recipe_folder, config, packages="*", cache=None, list_checks=False,
 
     if cache is not None:
         utils.RepoData().set_cache(cache)
+        _recipe.Recipe.set_cache(cache + "_recipes")
+        utils.RenderCache.enable(cache + "_render")
 
     recipes = get_recipes(config, recipe_folder, packages, git_range)
     linter = lint.Linter(config, recipe_folder, exclude)
@@ -491,12 +495,22 @@ def build(recipe_folder, config, packages="*", git_range=None, testonly=False,
 @arg('--hide-singletons',
      action='store_true',
      help='Hide singletons in the printed graph.')
+@arg('--git-ref', help='''Use the recipes as of this git branch or commit.
+     The recipes are read from the git object database, so that the ref need
+     not be checked out.''')
 @enable_logging()
-def dag(recipe_folder, config, packages="*", format='gml', hide_singletons=False):
+def dag(recipe_folder, config, packages="*", format='gml', hide_singletons=False,
+        git_ref=None):
     """
     Export the DAG of packages to a graph format file for visualization
     """
-    dag, name2recipes = graph.build(utils.get_recipes(recipe_folder, "*"), config)
+    if git_ref:
+        repo = BiocondaRepo(recipe_folder)
+        dag, name2recipes = graph.build_at_ref(repo, git_ref)
+        repo.close()
+    else:
+        dag, name2recipes = graph.build(utils.get_recipes(recipe_folder, "*"), config,
+                                         recipe_folder=recipe_folder)
     if packages != "*":
         dag = graph.filter(dag, packages)
     if hide_singletons:
@@ -542,8 +556,10 @@ def dag(recipe_folder, config, packages="*", format='gml', hide_singletons=False
      change is the python version. This is generally required unless you plan
      on building everything.""")
 @arg('--cache', help='''To speed up debugging, use repodata cached locally in
-     the provided filename. If the file does not exist, it will be created the
-     first time.''')
+     the provided directory. If the directory does not exist, it will be created
+     the first time. Parsed recipes are cached in a directory of the same name
+     with suffix "_recipes", conda-build renderings in one with suffix
+     "_render".''')
 @enable_logging()
 @enable_threads()
 @enable_debugging()
@@ -560,14 +576,15 @@ def update_pinning(recipe_folder, config, packages="*",
 
     if cache:
         utils.RepoData().set_cache(cache)
-    utils.RepoData().df  # trigger load
+        _recipe.Recipe.set_cache(cache + "_recipes")
+        utils.RenderCache.enable(cache + "_render")
+    utils.RepoData().share()  # load once for all worker processes
 
-    build_config = utils.load_conda_build_config()
     blacklist = utils.get_blacklist(config, recipe_folder)
 
     from . import recipe
     dag = graph.build_from_recipes(
-        recip for recip in recipe.load_parallel_iter(recipe_folder, "*")
+        recip for recip in recipe.load_parallel_iter(recipe_folder, "*", readonly=True)
         if recip.reldir not in blacklist)
 
     dag = graph.filter_recipe_dag(dag, packages, [])
@@ -578,11 +595,10 @@ def update_pinning(recipe_folder, config, packages="*",
     hadErrors = set()
     bumpErrors = set()
 
-    needs_bump = partial(update_pinnings.check, build_config=build_config)
-
     State = update_pinnings.State
 
-    for status, recip in zip(utils.parallel_iter(needs_bump, dag, "Processing..."), dag):
+    for status, recip in zip(utils.parallel_iter(update_pinnings.check, dag, "Processing..."),
+                             dag):
         logger.debug("Recipe %s status: %s", recip, status)
         stats[status] += 1
         if status.needs_bump(bump_only_python):
@@ -636,7 +652,8 @@ def dependent(recipe_folder, config, restrict=False,
         raise ValueError(
             'One of `--dependencies` or `--reverse-dependencies` is required.')
 
-    d, n2r = graph.build(utils.get_recipes(recipe_folder, "*"), config, restrict=restrict)
+    d, n2r = graph.build(utils.get_recipes(recipe_folder, "*"), config, restrict=restrict,
+                         recipe_folder=recipe_folder)
 
     if reverse_dependencies is not None:
         func, packages = nx.algorithms.descendants, reverse_dependencies
@@ -760,7 +777,9 @@ def clean_cran_skeleton(recipe, no_windows=False):
 @arg('--cache', help='''To speed up debugging, use repodata cached locally in
      the provided filename. If the file does not exist, it will be created
      the first time. Caution: The cache will not be updated if
-     exclude-channels is changed''')
+     exclude-channels is changed. Parsed recipes are cached in a directory
+     of the same name with suffix "_recipes", conda-build renderings in one
+     with suffix "_render".''')
 @arg('--unparsed-urls', help='''Write unrecognized urls to this file''')
 @arg('--failed-urls', help='''Write urls with permanent failure to this file''')
 @arg('--recipe-status', help='''Write status for each recipe to this file''')
@@ -809,6 +828,9 @@ def autobump(recipe_folder, config, packages='*', exclude=None, cache=None,
     """
     # load and register config
     config_dict = utils.load_config(config)
+    if cache:
+        _recipe.Recipe.set_cache(cache + "_recipes")
+        utils.RenderCache.enable(cache + "_render")
     from . import autobump
     from . import githubhandler
     from . import hosters
@@ -827,21 +849,13 @@ def autobump(recipe_folder, config, packages='*', exclude=None, cache=None,
                                cache_fn=cache and cache + "_scan.pkl",
                                status_fn=recipe_status)
 
-    # Always exclude recipes that were explicitly disabled
-    scanner.add(autobump.ExcludeDisabled)
-
     # Exclude packages that are on the blacklist
     if not ignore_blacklists:
         scanner.add(autobump.ExcludeBlacklisted, recipe_folder, config_dict)
 
-    # Exclude sub-recipes
-    if exclude_subrecipes != "never":
-        scanner.add(autobump.ExcludeSubrecipe,
-                    always=exclude_subrecipes == "always")
-
     # Exclude recipes with dependencies pending an update
     if not no_check_pending_deps and not no_follow_graph:
-        scanner.add(autobump.ExcludeDependencyPending, recipe_source.dag)
+        scanner.add(autobump.ExcludeDependencyPending, recipe_source)
 
     # Load recipe
     git_handler = None
@@ -873,12 +887,21 @@ def autobump(recipe_folder, config, packages='*', exclude=None, cache=None,
         if sign or sign is None:
             logger.warning("Not using git. --sign has no effect")
 
+    # Always exclude recipes that were explicitly disabled
+    # (checked once loaded, as the recipe sources send unloaded recipes)
+    scanner.add(autobump.ExcludeDisabled)
+
+    # Exclude sub-recipes
+    if exclude_subrecipes != "never":
+        scanner.add(autobump.ExcludeSubrecipe,
+                    always=exclude_subrecipes == "always")
+
     # Exclude recipes that are present in "other channels"
     if exclude_channels != ["none"]:
         if not isinstance(exclude_channels, list):
             exclude_channels = [exclude_channels]
         scanner.add(autobump.ExcludeOtherChannel, exclude_channels,
-                    cache and cache + "_repodata.txt")
+                    cache and cache + "_repodata")
 
     # Test if due to pinnings, the package hash would change and a rebuild
     # has become necessary. If so, bump the buildnumber.
@@ -7,12 +7,13 @@ import os
 import re
 import tempfile
 import subprocess
-from typing import List, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import git
 import yaml
 
 from . import utils
+from .recipe import Recipe, MissingMetaYaml
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -233,14 +234,57 @@ class GitHandlerBase():
             )
         rel_file_name = abs_file_name[len(abs_repo_root):].lstrip("/")
         commit = getattr(branch, 'commit', branch)
-        blob = commit.tree / rel_file_name
-        if blob:
-            return blob.data_stream.read().decode("utf-8")
+        for _, data in self.read_blobs([f"{commit}:{rel_file_name}"]):
+            if data is not None:
+                return data.decode("utf-8")
 
         logger.error("File %s not found on branch %s commit %s",
                      rel_file_name, branch, commit)
         return None
 
+    def list_files(self, ref, path: str = None, name: str = None) -> Dict[str, str]:
+        """Lists files in the tree of **ref** using ``git ls-tree``
+
+        Args:
+          ref: Branch, commit or name of revision
+          path: Only list files below this folder (relative to repo root)
+          name: Only list files with this name (e.g. ``meta.yaml``)
+        Returns:
+          Dict mapping paths (from repo root) to the SHAs of the blobs
+        """
+        commit = getattr(ref, 'commit', ref)
+        args = ['-r', '-z', '--full-tree', str(commit)]
+        if path:
+            args.extend(['--', path.rstrip('/') + '/'])
+        files = {}
+        for line in self.repo.git.ls_tree(*args).split('\0'):
+            info, _, fname = line.partition('\t')
+            if not fname or info.split()[1] != 'blob':
+                continue
+            if name and os.path.basename(fname) != name:
+                continue
+            files[fname] = info.split()[2]
+        return files
+
+    def read_blobs(self, objects: Iterable[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Reads objects from the git object database
+
+        The objects are passed through a single ``git cat-file --batch``
+        process kept running by GitPython, so reading many files costs
+        no process starts and needs no checkout.
+
+        Args:
+          objects: SHAs or ``<ref>:<path>`` names of the objects
+        Yields:
+          Tuples of object name and data (`None` if the object is missing)
+        """
+        for obj in objects:
+            try:
+                _, _, _, data = self.repo.git.get_object_data(obj)
+            except ValueError:
+                data = None
+            yield obj, data
+
     def create_local_branch(self, branch_name: str, remote_branch: str = None):
         """Creates local branch from remote **branch_name**"""
         if remote_branch is None:
@@ -478,6 +522,45 @@ class BiocondaRepoMixin(GitHandlerBase):
                         and os.path.exists(recipe)])
         return list(tobuild)
 
+    def iter_recipes(self, ref=None, packages="*", return_exceptions=False) -> Iterator[Recipe]:
+        """Loads recipes as of **ref** from the git object database
+
+        The ``meta.yaml`` files below `recipes_folder` are listed with
+        `list_files` and read with `read_blobs`, so that no working
+        tree needs to be checked out. The recipes are placed in the
+        working tree (or the git folder of bare repos) as usual, but
+        files other than ``meta.yaml`` are not available there unless
+        **ref** is checked out.
+
+        Args:
+          ref: Branch, commit or name of revision (default: ``HEAD``)
+          packages: Pattern or patterns selecting recipes (see `utils.get_recipes`)
+          return_exceptions: Yield exceptions raised by recipes that failed
+                             to load instead of raising them
+        """
+        recipe_base = os.path.join(self.repo.working_tree_dir or self.repo.git_dir,
+                                   self.recipes_folder)
+        pattern = utils.compile_recipe_globs(tuple(utils.ensure_list(packages)), ())
+        recipe_dirs = {}
+        for path, sha in self.list_files(ref or 'HEAD', self.recipes_folder, 'meta.yaml').items():
+            reldir = os.path.dirname(path)[len(self.recipes_folder):].strip('/')
+            if reldir and pattern.match('/' + reldir):
+                recipe_dirs[sha] = recipe_dirs.get(sha, []) + [reldir]
+        for sha, data in self.read_blobs(recipe_dirs):
+            for reldir in recipe_dirs[sha]:
+                recipe = Recipe(os.path.join(recipe_base, reldir), recipe_base)
+                try:
+                    if data is None:
+                        raise MissingMetaYaml(reldir)
+                    recipe.load_from_string(data.decode('utf-8'))
+                except Exception as exc:  # pylint: disable=broad-except
+                    if return_exceptions:
+                        yield exc
+                        continue
+                    raise
+                recipe.set_original()
+                yield recipe
+
 
 class GitHandler(GitHandlerBase):
     """GitHandler for working with a pre-existing local checkout of bioconda-recipes
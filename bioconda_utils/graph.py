@@ -3,19 +3,195 @@ Construction and Manipulation of Package/Recipe Graphs
 """
 
 import logging
+import os
+import pickle
+import tempfile
 
 from collections import defaultdict
 from fnmatch import fnmatch
-from itertools import chain
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
 
 import networkx as nx
+import numpy as np
 
+from . import __version__
 from . import utils
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
-def build(recipes, config, blacklist=None, restrict=True):
+class RecipeGraphStore:
+    """Per-recipe graph data persisted across runs
+
+    Building a graph requires parsing every recipe. The store records
+    for each recipe the hash of its ``meta.yaml`` (as found by the
+    `utils.RecipeManifest`) together with the data **func** extracted
+    from it (e.g. the package name and the dependencies from which the
+    recipe's edges are drawn). Recipes that could not be parsed are
+    recorded in `failures` with their hash, so that they are not parsed
+    again either. On `update`, only recipes added or with a changed
+    hash are parsed again; records of removed recipes are dropped.
+    Stores written by a different bioconda-utils version or
+    store format `VERSION` are discarded as **func** may have changed.
+
+    Arguments:
+      recipe_folder: Top-level dir of the recipes
+      key: Name of the kind of data stored (part of the file name)
+      func: Called with the path of a recipe in the worker processes,
+            returns the data to store (exceptions raised or returned
+            are recorded in `failures`)
+      path: File name for the store (default: in the cache directory,
+            see `utils.get_recipe_cache_path`)
+    """
+    #: Name of store file (see `utils.get_recipe_cache_path`)
+    FNAME = 'graph_{}.pkl'
+
+    #: Format version of the store file. Increment when changing what
+    #: the stored functions return without changing the bioconda-utils
+    #: version.
+    VERSION = 2
+
+    def __init__(self, recipe_folder: str, key: str, func: Callable[[str], Any],
+                 path: str = None) -> None:
+        self.recipe_folder = recipe_folder
+        self.key = key
+        self.func = func
+        if path is None:
+            path = utils.get_recipe_cache_path(recipe_folder, self.FNAME.format(key))
+        self.path = path
+        #: Maps recipe directories to the hash of ``meta.yaml`` and the data
+        self.records: Dict[str, Tuple[str, Any]] = {}
+        #: Maps recipe directories that could not be parsed to the hash
+        #: of ``meta.yaml`` and the error message
+        self.failures: Dict[str, Tuple[str, str]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'rb') as fdes:
+                data = pickle.load(fdes)
+            if (data['version'] == self.VERSION and data['key'] == self.key
+                    and data.get('utils_version') == __version__):
+                self.records = data['records']
+                self.failures = data['failures']
+            else:
+                logger.warning("Ignoring outdated graph store %s", self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Ignoring broken graph store %s: %s", self.path, exc)
+
+    def save(self) -> None:
+        """Write the store to disk"""
+        data = {'version': self.VERSION, 'utils_version': __version__,
+                'key': self.key, 'records': self.records, 'failures': self.failures}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(self.path) or '.',
+                                             delete=False) as fdes:
+                pickle.dump(data, fdes, pickle.HIGHEST_PROTOCOL)
+            os.replace(fdes.name, self.path)
+        except OSError as exc:
+            logger.warning("Unable to write graph store %s: %s", self.path, exc)
+
+    def update(self, reldirs: Iterable[str] = None) -> Dict[str, Any]:
+        """Revalidate the records, parsing changed recipes
+
+        Args:
+          reldirs: Recipe directories (relative to the recipe folder) to
+                   revalidate (default: all)
+        Returns:
+          Dictionary mapping the recipe directories to their data. Recipes
+          that could not be parsed are omitted (see `failures`).
+        """
+        manifest = utils.RecipeManifest.get(self.recipe_folder)
+        manifest.check_files()
+        reldirs = manifest.recipes if reldirs is None else list(reldirs)
+        removed = [reldir for records in (self.records, self.failures)
+                   for reldir in records if reldir not in manifest.files]
+        for reldir in removed:
+            self.records.pop(reldir, None)
+            self.failures.pop(reldir, None)
+        stale = [reldir for reldir in reldirs
+                 if reldir in manifest.files
+                 and manifest.files[reldir][2] not in (
+                     self.records.get(reldir, (None,))[0],
+                     self.failures.get(reldir, (None,))[0])]
+        if stale:
+            logger.info("Parsing %i changed of %i recipes", len(stale), len(manifest.files))
+            prefix = os.path.join(self.recipe_folder, '')
+            results = utils.RenderPool.imap(partial(_call_catching, self.func),
+                                            [prefix + reldir for reldir in stale],
+                                            ordered=True)
+            for reldir, data in zip(stale, utils.tqdm(results, total=len(stale),
+                                                      desc="Loading Recipes")):
+                self.records.pop(reldir, None)
+                self.failures.pop(reldir, None)
+                if isinstance(data, Exception):
+                    self.failures[reldir] = (manifest.files[reldir][2], str(data))
+                else:
+                    self.records[reldir] = (manifest.files[reldir][2], data)
+        if stale or removed:
+            self.save()
+        return {reldir: self.records[reldir][1]
+                for reldir in reldirs if reldir in self.records}
+
+
+def _call_catching(func: Callable[[str], Any], recipe: str) -> Any:
+    """Returns **func** applied to **recipe**, or the exception it raised"""
+    try:
+        return func(recipe)
+    except Exception as exc:  # pylint: disable=broad-except
+        return exc
+
+
+def load_package_deps(recipe: str, platform: str = None) -> Tuple[str, List[str]]:
+    """Get the package name and build and host dependencies of **recipe**
+
+    Uses `utils.load_meta_fast`.
+    """
+    meta, _ = utils.load_meta_fast(recipe, platform=platform)
+    deps = []
+    for sec in ("build", "host"):
+        deps.extend(dep.split()[0]
+                    for dep in (meta.get("requirements") or {}).get(sec) or []
+                    if dep)
+    return meta["package"]["name"], list(dict.fromkeys(deps))
+
+
+def _load_package_deps(recipes: List[str], recipe_folder: str = None):
+    """Yields name, dependencies and path for each of **recipes**
+
+    If **recipe_folder** is given, the data is taken from and kept in a
+    `RecipeGraphStore`, so that only recipes changed since the last
+    call are parsed. Recipes the store failed to parse are logged and
+    skipped.
+    """
+    platform = utils.get_build_platform()
+    func = partial(load_package_deps, platform=platform)
+    records = {}
+    failures = {}
+    if recipe_folder:
+        prefix = os.path.join(recipe_folder, '')
+        store = RecipeGraphStore(recipe_folder, 'deps_' + platform, func)
+        records = store.update(recipe[len(prefix):] for recipe in recipes
+                               if recipe.startswith(prefix))
+        records = {prefix + reldir: data for reldir, data in records.items()}
+        failures = {prefix + reldir: message
+                    for reldir, (_, message) in store.failures.items()}
+    missing = [recipe for recipe in recipes
+               if recipe not in records and recipe not in failures]
+    records.update(zip(missing, utils.parallel_iter(func, missing, "Loading Recipes")))
+    for recipe in recipes:
+        if recipe in failures:
+            logger.error("Skipping recipe %s: %s", recipe, failures[recipe])
+            continue
+        name, deps = records[recipe]
+        yield name, deps, recipe
+
+
+def build(recipes, config, blacklist=None, restrict=True, recipe_folder=None):
     """
     Returns the DAG of recipe paths and a dictionary that maps package names to
     lists of recipe paths to all defined versions of the package.  defined
@@ -34,6 +210,11 @@ def build(recipes, config, blacklist=None, restrict=True):
         themselves in `recipes`. Otherwise, include all dependencies of
         `recipes`.
 
+    recipe_folder : str
+        If given, names and dependencies of the recipes in this folder
+        are kept in a `RecipeGraphStore`, so that only recipes changed
+        since the last call are parsed.
+
     Returns
     -------
     dag : nx.DiGraph
@@ -46,8 +227,44 @@ def build(recipes, config, blacklist=None, restrict=True):
     """
     logger.info("Generating DAG")
     recipes = list(recipes)
-    metadata = list(utils.parallel_iter(utils.load_meta_fast, recipes, "Loading Recipes"))
+    metadata = list(_load_package_deps(recipes, recipe_folder))
+    return _build_from_metadata(metadata, blacklist, restrict)
+
+
+def build_at_ref(repo, ref, packages="*", blacklist=None, restrict=True):
+    """Like `build`, but with the recipes as of git **ref**
 
+    The recipes are read from the git object database with
+    `githandler.BiocondaRepoMixin.iter_recipes`, so that **ref** need
+    not be checked out. Recipes that fail to load are logged and
+    skipped.
+
+    Parameters
+    ----------
+    repo : githandler.BiocondaRepo
+        Repository holding the recipes
+
+    ref : str
+        Branch, commit or name of revision
+
+    packages : str or list
+        Glob(s) selecting the recipes to include
+    """
+    logger.info("Generating DAG for %s", ref)
+    platform = utils.get_build_platform()
+    metadata = []
+    for recipe in repo.iter_recipes(ref, packages, return_exceptions=True):
+        if isinstance(recipe, Exception):
+            logger.error("Skipping recipe: %s", recipe)
+            continue
+        metadata.append((recipe.name,
+                         recipe.get_deps(('build', 'host'), False, platform),
+                         recipe.dir))
+    return _build_from_metadata(metadata, blacklist, restrict)
+
+
+def _build_from_metadata(metadata, blacklist=None, restrict=True):
+    """Builds the DAG of `build` from name, dependencies and path of each recipe"""
     if blacklist is None:
         blacklist = set()
 
@@ -59,89 +276,236 @@ def build(recipes, config, blacklist=None, restrict=True):
     #
     # Note that this may change once we support conda-build 3.
     name2recipe = defaultdict(set)
-    for meta, recipe in metadata:
-        name = meta["package"]["name"]
+    for name, deps, recipe in metadata:
         if name not in blacklist:
             name2recipe[name].update([recipe])
 
-    def get_deps(meta, sec):
-        reqs = meta.get("requirements")
-        if not reqs:
-            return []
-        deps = reqs.get(sec)
-        if not deps:
-            return []
-        return [dep.split()[0] for dep in deps if dep]
-
-    def get_inner_deps(dependencies):
-        dependencies = list(dependencies)
-        for dep in dependencies:
-            if dep in name2recipe or not restrict:
-                yield dep
-
     dag = nx.DiGraph()
-    dag.add_nodes_from(meta["package"]["name"]
-                       for meta, recipe in metadata)
-    for meta, recipe in metadata:
-        name = meta["package"]["name"]
-        dag.add_edges_from(
-            (dep, name)
-            for dep in set(chain(
-                get_inner_deps(get_deps(meta, "build")),
-                get_inner_deps(get_deps(meta, "host")),
-            ))
-        )
+    dag.add_nodes_from(name for name, deps, recipe in metadata)
+    dag.add_edges_from(
+        (dep, name)
+        for name, deps, recipe in metadata
+        for dep in deps
+        if dep in name2recipe or not restrict
+    )
 
     return dag, name2recipe
 
 
 def build_from_recipes(recipes):
+    """Builds DAG with **recipes** as nodes and edges from dependencies to dependents
+
+    The **recipes** (`Recipe` or `RecipeSummary` objects) are consumed
+    as they arrive, so they may be a generator such as
+    `recipe.load_parallel_iter`.
+    """
     logger.info("Building Recipe DAG")
 
+    dag = nx.DiGraph()
     package2recipes = {}
-    recipe_list = []
+    # dependents by name of (not yet seen) dependency
+    dep2recipes = {}
     for recipe in recipes:
+        dag.add_node(recipe)
         for package in recipe.package_names:
             package2recipes.setdefault(package, set()).add(recipe)
-            recipe_list.append(recipe)
-
-    dag = nx.DiGraph()
-    dag.add_nodes_from(recipe.reldir for recipe in recipes)
-    dag.add_edges_from(
-        (recipe2, recipe)
-        for recipe in recipe_list
-        for dep in recipe.get_deps()
-        for recipe2 in package2recipes.get(dep, [])
-    )
+            dag.add_edges_from((recipe, dependent)
+                               for dependent in dep2recipes.get(package, []))
+        for dep in recipe.get_deps():
+            dep2recipes.setdefault(dep, []).append(recipe)
+            dag.add_edges_from((recipe2, recipe)
+                               for recipe2 in package2recipes.get(dep, []))
 
     logger.info("Building Recipe DAG: done (%i nodes, %i edges)", len(dag), len(dag.edges()))
     return dag
 
 
+class IndexedGraph:
+    """Directed graph with integer node ids and CSR adjacency arrays
+
+    The networkx graphs keep their adjacency in dicts of dicts, which
+    makes traversals of graphs with thousands of nodes slow, in
+    particular if repeated for many nodes. Here, nodes are numbered in
+    the order given and the successors of node ``i`` are
+    ``succ[succ_ptr[i]:succ_ptr[i + 1]]`` (likewise for the
+    predecessors). Closures from many sources are computed with a single
+    breadth first search, handling each level of the search with a few
+    numpy operations.
+
+    Use `from_networkx` and `to_networkx` to convert.
+
+    Arguments:
+      nodes: The nodes of the graph (must be hashable)
+      edges: Pairs of nodes
+    """
+    def __init__(self, nodes: Sequence, edges: Iterable[Tuple[Any, Any]]) -> None:
+        #: Nodes by id
+        self.nodes = list(nodes)
+        #: Ids by node
+        self.ids = {node: num for num, node in enumerate(self.nodes)}
+        pairs = np.array([(self.ids[source], self.ids[target]) for source, target in edges],
+                         dtype=np.int64).reshape(-1, 2)
+        self.succ_ptr, self.succ = self._make_csr(pairs[:, 0], pairs[:, 1], len(self.nodes))
+        self.pred_ptr, self.pred = self._make_csr(pairs[:, 1], pairs[:, 0], len(self.nodes))
+
+    @classmethod
+    def from_networkx(cls, dag: nx.DiGraph) -> "IndexedGraph":
+        """Create from networkx graph **dag**"""
+        return cls(dag.nodes(), dag.edges())
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Convert to networkx graph"""
+        dag = nx.DiGraph()
+        dag.add_nodes_from(self.nodes)
+        dag.add_edges_from((self.nodes[source], self.nodes[target])
+                           for source in range(len(self.nodes))
+                           for target in self.succ[self.succ_ptr[source]:
+                                                   self.succ_ptr[source + 1]])
+        return dag
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @staticmethod
+    def _make_csr(sources: np.ndarray, targets: np.ndarray, size: int):
+        order = np.argsort(sources, kind='stable')
+        ptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=ptr[1:])
+        return ptr, targets[order]
+
+    @staticmethod
+    def _neighbors(ptr: np.ndarray, adj: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Concatenated neighbors of all of **ids** (with repeats)"""
+        starts = ptr[ids]
+        counts = ptr[ids + 1] - starts
+        # position in adj = start of the node's run + offset within the run
+        offsets = np.cumsum(counts) - counts
+        return adj[np.arange(counts.sum()) + np.repeat(starts - offsets, counts)]
+
+    def _closure(self, ptr: np.ndarray, adj: np.ndarray, nodes: Iterable) -> Set:
+        seen = np.zeros(len(self.nodes), dtype=bool)
+        frontier = np.array([self.ids[node] for node in nodes], dtype=np.int64)
+        while frontier.size:
+            found = self._neighbors(ptr, adj, frontier)
+            frontier = np.unique(found[~seen[found]])
+            seen[frontier] = True
+        return {self.nodes[num] for num in np.flatnonzero(seen)}
+
+    def descendants(self, nodes: Iterable) -> Set:
+        """Nodes reachable from any of **nodes** by a path of at least one edge
+
+        Raises:
+          KeyError if one of **nodes** is not in the graph
+        """
+        return self._closure(self.succ_ptr, self.succ, nodes)
+
+    def ancestors(self, nodes: Iterable) -> Set:
+        """Nodes from which any of **nodes** is reachable by a path of at least one edge
+
+        Raises:
+          KeyError if one of **nodes** is not in the graph
+        """
+        return self._closure(self.pred_ptr, self.pred, nodes)
+
+    def strongly_connected_components(self) -> List[List]:
+        """Strongly connected components (Tarjan's algorithm)
+
+        Components are returned in reverse topological order, i.e. no
+        component has an edge to a component listed after it.
+        """
+        succ_ptr = self.succ_ptr.tolist()
+        succ = self.succ.tolist()
+        index = [-1] * len(self.nodes)
+        lowlink = [0] * len(self.nodes)
+        on_stack = [False] * len(self.nodes)
+        stack: List[int] = []
+        components = []
+        counter = 0
+        for root in range(len(self.nodes)):
+            if index[root] >= 0:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            # recursion replaced with stack of (node, position in succ)
+            work = [(root, succ_ptr[root])]
+            while work:
+                node, pos = work[-1]
+                if pos < succ_ptr[node + 1]:
+                    work[-1] = (node, pos + 1)
+                    target = succ[pos]
+                    if index[target] < 0:
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = True
+                        work.append((target, succ_ptr[target]))
+                    elif on_stack[target]:
+                        lowlink[node] = min(lowlink[node], index[target])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(self.nodes[member])
+                        if member == node:
+                            break
+                    components.append(component)
+        return components
+
+    def cycles(self) -> List[List]:
+        """Strongly connected components containing a cycle
+
+        Unlike `nx.simple_cycles`, which may find exponentially many
+        cycles, each node in a cycle is reported once.
+        """
+        return [component for component in self.strongly_connected_components()
+                if len(component) > 1 or self._has_self_loop(self.ids[component[0]])]
+
+    def _has_self_loop(self, num: int) -> bool:
+        return num in self.succ[self.succ_ptr[num]:self.succ_ptr[num + 1]]
+
+    def topological_sort(self) -> List:
+        """Nodes ordered such that all edges point forward
+
+        Raises:
+          ValueError if the graph contains a cycle
+        """
+        indegree = np.diff(self.pred_ptr)
+        frontier = np.flatnonzero(indegree == 0)
+        order = []
+        while frontier.size:
+            order.append(frontier)
+            found = self._neighbors(self.succ_ptr, self.succ, frontier)
+            indegree = indegree - np.bincount(found, minlength=len(self.nodes))
+            frontier = np.unique(found[indegree[found] == 0])
+        order = np.concatenate(order) if order else []
+        if len(order) < len(self.nodes):
+            raise ValueError("Graph contains a cycle")
+        return [self.nodes[num] for num in order]
+
+
 def filter_recipe_dag(dag, include, exclude):
     """Reduces **dag** to packages in **names** and their requirements"""
-    nodes = set()
-    for recipe in dag:
-        if (recipe not in nodes
-            and any(fnmatch(recipe.reldir, p) for p in include)
-            and not any(fnmatch(recipe.reldir, p) for p in exclude)):
-            nodes.add(recipe)
-            nodes |= nx.ancestors(dag, recipe)
+    nodes = {recipe for recipe in dag
+             if any(fnmatch(recipe.reldir, p) for p in include)
+             and not any(fnmatch(recipe.reldir, p) for p in exclude)}
+    nodes |= IndexedGraph.from_networkx(dag).ancestors(nodes)
     return nx.subgraph(dag, nodes)
 
 
 def filter(dag, packages):
     nodes = set()
     for package in packages:
-        if package in nodes:
-            continue  # already got all ancestors
+        if package not in dag:
+            logger.error("Can't find %s in dag", package)
         nodes.add(package)
-        try:
-            nodes |= nx.ancestors(dag, package)
-        except nx.exception.NetworkXError:
-            if package not in nx.nodes(dag):
-                logger.error("Can't find %s in dag", package)
-            else:
-                raise
-
+    nodes |= IndexedGraph.from_networkx(dag).ancestors(package for package in nodes
+                                                       if package in dag)
     return nx.subgraph(dag, nodes)
@@ -8,16 +8,20 @@ object resulting from parsing by **conda_build** offers functions to
 edit the meta.yaml.
 """
 
+import hashlib
 import logging
 import os
+import pickle
 import re
 import sys
 import tempfile
 import types
 
-from collections import defaultdict
-from contextlib import redirect_stdout, redirect_stderr
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
 from copy import deepcopy
+from functools import partial
+from threading import Lock
 from typing import Any, Dict, List, Sequence, Tuple, Optional, Pattern
 
 
@@ -25,6 +29,7 @@ import conda_build.api
 from conda_build.metadata import MetaData
 
 import jinja2
+import yaml as pyyaml
 
 try:
     from ruamel.yaml import YAML
@@ -35,6 +40,7 @@ except ModuleNotFoundError:
     from ruamel_yaml.constructor import DuplicateKeyError
     from ruamel_yaml.error import YAMLError
 
+from . import __version__
 from . import utils
 from .aiopipe import EndProcessingItem
 
@@ -47,6 +53,40 @@ for digit in '0123456789':
     if digit in yaml.resolver.versioned_resolver:
         del yaml.resolver.versioned_resolver[digit]
 
+
+_SafeLoader = getattr(pyyaml, 'CSafeLoader', pyyaml.SafeLoader)
+
+
+class ReadonlyLoader(_SafeLoader):  # pylint: disable=too-many-ancestors
+    """Fast YAML loader for recipes that are not going to be edited
+
+    Uses libyaml (if available) and creates plain dicts and lists
+    without line/column information. Scalars are resolved as by the
+    round-trip loader above (YAML 1.2, no implicit numbers), and
+    duplicate keys raise `DuplicateKeyError` just the same.
+    """
+    yaml_implicit_resolvers = {
+        first: list(resolvers)
+        for first, resolvers in yaml.resolver.versioned_resolver.items()
+    }
+
+    def construct_mapping(self, node, deep=False):
+        mapping = super().construct_mapping(node, deep=deep)
+        if len(mapping) < len(node.value):
+            seen = set()
+            for key_node, _ in node.value:
+                key = self.construct_object(key_node)
+                if key in seen:
+                    raise DuplicateKeyError("while constructing a mapping", node.start_mark,
+                                            f'found duplicate key "{key}"',
+                                            key_node.start_mark)
+                seen.add(key)
+        return mapping
+
+
+ReadonlyLoader.add_constructor('tag:yaml.org,2002:map', ReadonlyLoader.construct_yaml_map)
+ReadonlyLoader.add_constructor('tag:yaml.org,2002:value', ReadonlyLoader.construct_yaml_str)
+
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
@@ -118,6 +158,159 @@ class RenderFailure(RecipeError):
     template = "failed to render in Jinja2. Error was: %s"
 
 
+class InvalidSelector(RecipeError):
+    """Raised if a ``# [expression]`` line selector cannot be evaluated"""
+    template = "has %s"
+
+
+class RecipeCache():
+    """On-disk cache of parsed recipes
+
+    Rendering a ``meta.yaml`` with Jinja2 and parsing the result with
+    the round-trip YAML loader is slow. This cache stores the parsed
+    ``meta`` (including the line/column information needed to edit the
+    recipe, see `Recipe.get_raw_range`) under the sha256 of the recipe
+    text, the bioconda-utils version and the cache format `VERSION`.
+    Entries are never invalidated. A changed recipe simply has a
+    different key.
+
+    Arguments:
+      path: cache directory (created if missing)
+    """
+    #: Format version of the cache entries. Increment when changing
+    #: how recipes are rendered or parsed (e.g. `Recipe.JINJA_VARS`)
+    #: without changing the bioconda-utils version.
+    VERSION = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @classmethod
+    def get_key(cls, text: str, readonly: bool = False) -> str:
+        """Compute the key under which the parsed **text** is stored"""
+        digest = hashlib.sha256()
+        digest.update(__version__.encode())
+        digest.update(str(cls.VERSION).encode())
+        digest.update(b"readonly" if readonly else b"roundtrip")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def _get_fname(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".pkl")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the parsed recipe stored under **key** (or None)"""
+        try:
+            with open(self._get_fname(key), "rb") as fdes:
+                return pickle.load(fdes)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Ignoring broken recipe cache entry %s: %s", key, exc)
+            return None
+
+    def put(self, key: str, meta: Dict[str, Any]) -> None:
+        """Store the parsed recipe **meta** under **key**"""
+        fname = self._get_fname(key)
+        try:
+            os.makedirs(os.path.dirname(fname), exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(fname),
+                                             delete=False) as fdes:
+                pickle.dump(meta, fdes, pickle.HIGHEST_PROTOCOL)
+            # atomic, so that concurrent readers never see partial files
+            os.replace(fdes.name, fname)
+        except OSError as exc:
+            logger.debug("Unable to write recipe cache entry %s: %s", key, exc)
+
+
+class TemplateCache():
+    """Process wide LRU cache of compiled Jinja2 templates
+
+    Compiling a template (parsing it and generating and compiling
+    Python code) is the most expensive part of rendering a recipe.
+    Before compiling, the literal text between the Jinja tags is
+    replaced with references to a list passed to the template as
+    global. Templates are then cached by the hash of the remainder,
+    so that edits outside of Jinja tags (e.g. bumping the build
+    number) and recipes with identical Jinja tags reuse the
+    compiled code.
+
+    Arguments:
+      env: Jinja2 environment used to compile templates
+      maxsize: maximum number of compiled templates kept
+    """
+    #: Splits template source into literal text and Jinja tags
+    TAG_RE = re.compile(r'(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})', re.DOTALL)
+
+    def __init__(self, env: jinja2.Environment, maxsize: int = 1024) -> None:
+        self.env = env
+        self.maxsize = maxsize
+        #: number of templates found in the cache
+        self.hits = 0
+        #: number of templates compiled
+        self.misses = 0
+        self._codes: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def _split(self, text: str) -> Tuple[str, List[str]]:
+        """Replace literal text with references to ``_literals``
+
+        Newlines are kept within the references, so that line numbers
+        in errors remain valid. If Jinja would lex the text differently
+        (e.g. due to whitespace control or ``raw`` blocks), the text is
+        returned unchanged.
+        """
+        try:
+            data = [value for _, token, value in self.env.lex(text) if token == 'data']
+        except jinja2.exceptions.TemplateSyntaxError:
+            return text, []
+        source = text
+        if source.endswith("\n") and not self.env.keep_trailing_newline:
+            source = source[:-1]  # as done by the Jinja lexer
+        parts = self.TAG_RE.split(source)
+        literals = [part for part in parts[::2] if part]
+        if data != literals:
+            return text, []
+        skeleton = []
+        num = 0
+        for idx, part in enumerate(parts):
+            if idx % 2:
+                skeleton.append(part)
+            elif part:
+                skeleton.append("{{ _literals[%i]%s}}" % (num, "\n" * part.count("\n") or " "))
+                num += 1
+        return "".join(skeleton), literals
+
+    def get_template(self, text: str) -> jinja2.Template:
+        """Get template for **text**, compiling it if needed
+
+        Raises:
+          `jinja2.exceptions.TemplateError` if the template is invalid
+        """
+        skeleton, literals = self._split(text)
+        key = hashlib.sha256(skeleton.encode()).digest()
+        with self._lock:
+            code = self._codes.get(key)
+            if code is not None:
+                self._codes.move_to_end(key)
+                self.hits += 1
+        if code is None:
+            code = self.env.compile(skeleton)
+            with self._lock:
+                self.misses += 1
+                self._codes[key] = code
+                while len(self._codes) > self.maxsize:
+                    self._codes.popitem(last=False)
+        return self.env.template_class.from_code(
+            self.env, code, self.env.make_globals({'_literals': literals}))
+
+    def clear(self) -> None:
+        """Empty cache and reset counters"""
+        with self._lock:
+            self._codes.clear()
+            self.hits = self.misses = 0
+
+
 class Recipe():
     """Represents a recipe (meta.yaml) in editable form
 
@@ -129,12 +322,18 @@ class Recipe():
      1. Selecting lines using ``# [expression]``
      2. Rendering as Jinja2 template
 
-    (1) is currently unhandled, leading to recipes with repeated mapping keys
-    (commonly two ``url`` keys). Those recipes are ignored for the time being.
+    (1) is not applied to `meta`, which is needed to edit the recipe
+    and therefore has the lines for all platforms. Repeated mapping
+    keys resulting from this (commonly two ``url`` keys) are resolved
+    as lists where possible. Use `get_platform_meta` to get the recipe
+    as seen on a specific platform.
 
     Arguments:
       recipe_folder: base recipes folder
       recipe_dir: path to specific recipe
+      readonly: parse with the faster `ReadonlyLoader`. The positions
+                of nodes in the raw text, needed to edit the recipe,
+                are then determined only once requested.
     """
 
 
@@ -146,8 +345,17 @@ class Recipe():
         "cdt": lambda x: x
     }
 
+    #: Environment variable naming a directory in which parsed recipes
+    #: are cached (see `set_cache`)
+    CACHE_ENV = 'BIOCONDA_RECIPE_CACHE'
 
-    def __init__(self, recipe_dir, recipe_folder):
+    #: `RecipeCache` used by `render` (if any)
+    _cache: Optional[RecipeCache] = None
+
+    #: Compiled Jinja2 templates shared by all recipes
+    TEMPLATES = TemplateCache(utils.jinja_silent_undef)
+
+    def __init__(self, recipe_dir, recipe_folder, readonly=False):
         if not recipe_dir.startswith(recipe_folder):
             raise RuntimeError(f"'{recipe_dir}' not inside '{recipe_folder}'")
 
@@ -157,17 +365,26 @@ class Recipe():
         #: relative path to recipe dir from folder containing recipes
         self.reldir = recipe_dir[len(recipe_folder):].strip("/")
 
+        #: Whether `meta` lacks position information (see `ReadonlyLoader`)
+        self.readonly: bool = readonly
+
         # Filled in by render()
         #: Parsed recipe YAML
         self.meta: Dict[str, Any] = {}
+        # Parsed recipe YAML with position information (if readonly)
+        self._roundtrip_meta = None
+        # Recipe text with Jinja rendered
+        self._yaml_text: Optional[str] = None
+        # Parsed recipe YAML after applying selectors (see get_platform_meta)
+        self._platform_metas: Dict[Tuple, Dict[str, Any]] = {}
 
         # These will be filled in by load_from_string()
         #: Lines of the raw recipe file
         self.meta_yaml: List[str] = []
         # Filled in by update filter
         self.version_data: Dict[str, Any] = {}
-        #: Original recipe before modifications (updated by load_from_string)
-        self.orig: Recipe = deepcopy(self)
+        #: Original recipe before modifications (updated by `set_original`)
+        self.orig: RecipeSnapshot = RecipeSnapshot(self)
         #: Whether the recipe was loaded from a branch (update in progress)
         self.on_branch: bool = False
         #: For passing data around
@@ -175,8 +392,14 @@ class Recipe():
 
         # for conda_render() and conda_release()
         self._conda_meta = None
+        self._conda_meta_key = None
         self._conda_tempdir = None
 
+        # for edit()
+        self._edit_depth = 0
+        self._render_pending = False
+        self._lines_shifted = False
+
     @property
     def path(self):
         """Full path to ``meta.yaml``"""
@@ -207,16 +430,19 @@ class Recipe():
         return self
 
     @classmethod
-    def from_file(cls, recipe_dir, recipe_fname, return_exceptions=False) -> "Recipe":
+    def from_file(cls, recipe_dir, recipe_fname, return_exceptions=False,
+                  readonly=False) -> "Recipe":
         """Create new `Recipe` object from file
 
         Args:
            recipe_dir: Path to recipes folder
            recipe_fname: Relative path to recipe (folder or meta.yaml)
+           readonly: Use the faster parser for recipes not (usually)
+                     edited (see `Recipe`)
         """
         if recipe_fname.endswith("meta.yaml"):
             recipe_fname = os.path.dirname(recipe_fname)
-        recipe = cls(recipe_fname, recipe_dir)
+        recipe = cls(recipe_fname, recipe_dir, readonly)
         try:
             with open(os.path.join(recipe_fname, 'meta.yaml')) as text:
                 recipe.load_from_string(text.read())
@@ -232,13 +458,70 @@ class Recipe():
         recipe.set_original()
         return recipe
 
+    @staticmethod
+    def set_cache(path: str) -> None:
+        """Cache parsed recipes in directory **path** (see `RecipeCache`)
+
+        The location is exported in `CACHE_ENV`, so that worker
+        processes started from here on use the cache as well.
+        """
+        os.environ[Recipe.CACHE_ENV] = path
+
+    @staticmethod
+    def get_cache() -> Optional[RecipeCache]:
+        """Get the `RecipeCache` in use (None if caching is disabled)"""
+        path = os.environ.get(Recipe.CACHE_ENV)
+        if not path:
+            return None
+        if Recipe._cache is None or Recipe._cache.path != path:
+            Recipe._cache = RecipeCache(path)
+        return Recipe._cache
+
     def save(self):
         with open(self.path, "w", encoding="utf-8") as fdes:
             fdes.write(self.dump())
 
     def set_original(self) -> None:
         """Store the current state of the recipe as "original" version"""
-        self.orig = deepcopy(self)
+        self.orig = RecipeSnapshot(self)
+
+    @contextmanager
+    def edit(self):
+        """Group edits, rendering the recipe only once at the end
+
+        Within the block, `replace`, `set` and `reset_buildnumber` only
+        modify the raw lines. The recipe is rendered when the outermost
+        block is left. If an exception is raised, the raw lines are
+        restored to their state at the start of the block.
+
+        Note that `meta` (and properties based on it, like `version`)
+        reflect the edits only after the block.
+
+        >>> with recipe.edit():
+        ...     recipe.replace(recipe.version, "1.2.3")
+        ...     recipe.reset_buildnumber()
+        """
+        state = (list(self.meta_yaml), self.meta, self._roundtrip_meta,
+                 self._render_pending, self._lines_shifted)
+        self._edit_depth += 1
+        try:
+            yield self
+        except BaseException:
+            (self.meta_yaml, self.meta, self._roundtrip_meta,
+             self._render_pending, self._lines_shifted) = state
+            raise
+        finally:
+            self._edit_depth -= 1
+        if not self._edit_depth and self._render_pending:
+            self.render()
+
+    def _edited(self, lines_shifted: bool = False) -> None:
+        """Render after an edit, unless deferred by `edit`"""
+        if self._edit_depth:
+            self._render_pending = True
+            self._lines_shifted |= lines_shifted
+        else:
+            self.render()
 
     def is_modified(self) -> bool:
         return self.meta_yaml != self.orig.meta_yaml
@@ -300,9 +583,7 @@ class Recipe():
         # Storing it means the recipe cannot be pickled, which in turn
         # means we cannot pass it to ProcessExecutors.
         try:
-            return utils.jinja_silent_undef.from_string(
-                "\n".join(self.meta_yaml)
-            )
+            return self.TEMPLATES.get_template("\n".join(self.meta_yaml))
         except jinja2.exceptions.TemplateSyntaxError as exc:
             raise RenderFailure(self, message=exc.message, line=exc.lineno)
         except jinja2.exceptions.TemplateError as exc:
@@ -332,10 +613,32 @@ class Recipe():
         - render template
         - parse yaml
         - normalize
+
+        If a cache is configured (see `set_cache`), the parsed data
+        is taken from there if the recipe text was seen before.
         """
-        yaml_text = self.get_template().render(self.JINJA_VARS)
+        self._roundtrip_meta = None
+        self._yaml_text = None
+        self._platform_metas = {}
+        self.meta = self._parse(self.readonly)
+        self._render_pending = self._lines_shifted = False
+
+    def _parse(self, readonly: bool) -> Dict[str, Any]:
+        """Render and parse the recipe text (see `render`)"""
+        cache = self.get_cache()
+        if cache is not None:
+            key = cache.get_key("\n".join(self.meta_yaml), readonly)
+            meta = cache.get(key)
+            if meta is not None:
+                return meta
+
+        if readonly:
+            load = partial(pyyaml.load, Loader=ReadonlyLoader)
+        else:
+            load = yaml.load
+        yaml_text = self._get_yaml_text()
         try:
-            self.meta = yaml.load(yaml_text)
+            meta = load(yaml_text)
         except DuplicateKeyError as err:
             line = err.problem_mark.line + 1
             column = err.problem_mark.column + 1
@@ -345,17 +648,79 @@ class Recipe():
                                                      err.context_mark.column)
             if yaml_text:
                 try:
-                    self.meta = yaml.load(yaml_text)
+                    meta = load(yaml_text)
                 except DuplicateKeyError:
                     raise DuplicateKey(self, line=line, column=column)
             else:
                 raise DuplicateKey(self, line=line, column=column)
 
-        if "package" not in self.meta \
-           or "version" not in self.meta["package"] \
-           or "name" not in self.meta["package"]:
+        if "package" not in meta \
+           or "version" not in meta["package"] \
+           or "name" not in meta["package"]:
             raise MissingKey(self)
 
+        if cache is not None:
+            cache.put(key, meta)
+        return meta
+
+    def _get_yaml_text(self) -> str:
+        """Get the recipe text with Jinja rendered (once per `render`)"""
+        if self._yaml_text is None:
+            self._yaml_text = self.get_template().render(self.JINJA_VARS)
+        return self._yaml_text
+
+    def get_platform_meta(self, platform: str = 'linux', **variables) -> Dict[str, Any]:
+        """Get the recipe data as seen when building on **platform**
+
+        Other than in `meta`, lines with ``# [expression]`` selectors are
+        only present if the expression is true for the platform (see
+        `utils.SelectorNamespace`). This is much faster than rendering
+        with conda-build (`conda_render`), but does not expand variants.
+        The Jinja template is rendered only once for all platforms and
+        the results are kept until the next `render`.
+
+        Args:
+          platform: ``linux``, ``osx``, ``noarch`` or a subdir
+          variables: Passed on to `utils.SelectorNamespace` (e.g. ``py=37``)
+        Raises:
+          `InvalidSelector`: if a selector could not be evaluated
+          `DuplicateKey`: if keys are repeated after selecting lines
+          `MissingKey`: if package name or version are missing
+        """
+        key = (platform, tuple(sorted(variables.items())))
+        if key not in self._platform_metas:
+            namespace = utils.SelectorNamespace(platform, **variables)
+            try:
+                yaml_text = utils.select_lines(self._get_yaml_text(), namespace)
+            except ValueError as exc:
+                raise InvalidSelector(self, str(exc))
+            try:
+                meta = pyyaml.load(yaml_text, Loader=ReadonlyLoader)
+            except DuplicateKeyError:
+                raise DuplicateKey(self)
+            if not meta \
+               or "package" not in meta \
+               or "version" not in meta["package"] \
+               or "name" not in meta["package"]:
+                raise MissingKey(self)
+            self._platform_metas[key] = meta
+        return self._platform_metas[key]
+
+    def _get_roundtrip_meta(self):
+        """Get `meta` with position information
+
+        For readonly recipes, the round-trip parse happens here, on the
+        first request after each `render`.
+        """
+        if self._lines_shifted:
+            # lines were inserted within `edit`, positions are outdated
+            self.render()
+        if not self.readonly:
+            return self.meta
+        if self._roundtrip_meta is None:
+            self._roundtrip_meta = self._parse(False)
+        return self._roundtrip_meta
+
     @property
     def maintainers(self):
         """List of recipe maintainers"""
@@ -381,8 +746,8 @@ class Recipe():
     def __getitem__(self, key):
         return self.meta[key]
 
-    def _walk(self, path, noraise=False):
-        nodes = [self.meta]
+    def _walk(self, path, noraise=False, meta=None):
+        nodes = [self.meta if meta is None else meta]
         keys = []
         for key in path.split('/'):
             last = nodes[-1]
@@ -417,7 +782,7 @@ class Recipe():
         if not path:
             return 0, 0, len(self.meta_yaml), len(self.meta_yaml[-1])
 
-        nodes, keys = self._walk(path)
+        nodes, keys = self._walk(path, meta=self._get_roundtrip_meta())
         nodes.pop()  # pop parsed value
 
         # get the start row/col for the value
@@ -477,7 +842,7 @@ class Recipe():
         lines.append(self.meta_yaml[end_row][:end_col])
         return "\n".join(lines).strip()
 
-    def get(self, path: str, default: Any=KeyError) -> Any:
+    def get(self, path: str, default: Any=KeyError, platform: str = None) -> Any:
         """Get a value or section from the recipe
 
         >>> recipe.get('requirements/build')
@@ -496,11 +861,13 @@ class Recipe():
           path: Path through YAML
           default: If not KeyError, this value will be returned
                    if the path does not exist in the recipe
+          platform: Get the value for this platform (see `get_platform_meta`)
         Raises:
           KeyError if no default given and the path does not exist.
         """
+        meta = self.get_platform_meta(platform) if platform else None
         try:
-            nodes, keys = self._walk(path)
+            nodes, keys = self._walk(path, meta=meta)
         except (KeyError, TypeError):
             if default is not KeyError:
                 return default
@@ -515,6 +882,8 @@ class Recipe():
 
         See `get` for a description of how **path** works.
         """
+        if self._lines_shifted:
+            self.render()  # lines were inserted within `edit`
         # walk path into nodes/keys
         nodes, keys = self._walk(path, noraise=True)
 
@@ -536,7 +905,7 @@ class Recipe():
         self.meta_yaml[row] = self.meta_yaml[row].replace(str(content), str(value))
         if not str(value) in self.meta_yaml[row]:
             self.meta_yaml[row] = self.meta_yaml[row][:col] + value
-        self.render()
+        self._edited()
 
     @property
     def package_names(self) -> List[str]:
@@ -570,8 +939,9 @@ class Recipe():
 
         # get lines covered by keys listed in ``within``
         start: Optional[int] = None
-        for key in self.meta.keys():
-            lineno = self.meta.lc.key(key)[0]
+        meta = self._get_roundtrip_meta()
+        for key in meta.keys():
+            lineno = meta.lc.key(key)[0]
             if key in within:
                 if start is None:
                     start = lineno
@@ -612,26 +982,29 @@ class Recipe():
 
         If the build number is missing, it is added after build.
         """
+        meta = self._get_roundtrip_meta()
+        lines_shifted = False
         try:
-            lineno: int = self.meta["build"].lc.key("number")[0]
+            lineno: int = meta["build"].lc.key("number")[0]
         except (KeyError, AttributeError):  # no build number?
-            if "build" in self.meta and self.meta["build"] is not None:
-                build = self.meta["build"]
+            if "build" in meta and meta["build"] is not None:
+                build = meta["build"]
                 first_in_build = next(iter(build))
                 lineno, colno = build.lc.key(first_in_build)
                 self.meta_yaml.insert(lineno, " "*colno + "number: 0")
+                lines_shifted = True
             else:
                 raise MissingBuild(self)
 
         line = self.meta_yaml[lineno]
         line = re.sub("number: [0-9]+", "number: "+str(n), line)
         self.meta_yaml[lineno] = line
-        self.render()
+        self._edited(lines_shifted)
 
-    def get_deps(self, sections=None, output=True):
-        return list(self.get_deps_dict(sections, output).keys())
+    def get_deps(self, sections=None, output=True, platform=None):
+        return list(self.get_deps_dict(sections, output, platform).keys())
 
-    def get_deps_dict(self, sections=None, outputs=True):
+    def get_deps_dict(self, sections=None, outputs=True, platform=None):
         if not sections:
             sections = ('build', 'run', 'host')
         else:
@@ -641,11 +1014,11 @@ class Recipe():
             check_paths.append(f'requirements/{section}')
         if outputs:
             for section in sections:
-                for n in range(len(self.get('outputs', []))):
+                for n in range(len(self.get('outputs', [], platform))):
                     check_paths.append(f'outputs/{n}/requirements/{section}')
         deps = {}
         for path in check_paths:
-            for n, spec in enumerate(self.get(path, [])):
+            for n, spec in enumerate(self.get(path, [], platform)):
                 if spec is None:  # Fixme: lint this
                     continue
                 dep = re.split(r'[\s<=>]', spec)[0]
@@ -668,6 +1041,11 @@ class Recipe():
         various exceptions and rewriting them into `CondaRenderFailure`, then
         cache the result.
 
+        If a `utils.RenderCache` is configured and **finalize** is False,
+        results are also kept on disk, keyed by the recipe contents and
+        the arguments. The ``meta.yaml`` is then written to the cache
+        entry's directory rather than a temporary one.
+
         Since the ``MetaData`` objects returned expect the on-disk ``meta.yaml``
         to persist (it can get reloaded later on), clients of this function
         must **make sure to call `conda_release` once you are done** with those
@@ -698,18 +1076,33 @@ class Recipe():
         Returns:
           List of 3-tuples each comprising the rendered MetaData and the flags
           ``needs_download`` and ``needs_render_in_env``.
-
-        FIXME:
-          Need to use **kwargs** to invalidate cache.
         """
-        if self._conda_meta:
+        text = self.dump()
+        flags = dict(kwargs,
+                     bypass_env_check=bypass_env_check,
+                     finalize=finalize,
+                     permit_unsatisfiable_variants=permit_unsatisfiable_variants)
+        config = flags.pop('config', None)
+        key = utils.RenderCache.get_key({'meta.yaml': text.encode()}, config, **flags)
+        if self._conda_meta and self._conda_meta_key == key:
             return self._conda_meta
         self.conda_release()
 
-        self._conda_tempdir = tempfile.TemporaryDirectory()
-
-        with open(os.path.join(self._conda_tempdir.name, 'meta.yaml'), 'w') as tmpfile:
-                tmpfile.write(self.dump())
+        cache = utils.RenderCache.from_env(finalize)
+        if cache is not None:
+            self._conda_meta = cache.load(key)
+            if self._conda_meta is not None:
+                self._conda_meta_key = key
+                return self._conda_meta
+            render_dir = cache.get_dir(key)
+            with tempfile.NamedTemporaryFile('w', dir=render_dir, delete=False) as tmpfile:
+                tmpfile.write(text)
+            os.replace(tmpfile.name, os.path.join(render_dir, 'meta.yaml'))
+        else:
+            self._conda_tempdir = tempfile.TemporaryDirectory()
+            render_dir = self._conda_tempdir.name
+            with open(os.path.join(render_dir, 'meta.yaml'), 'w') as tmpfile:
+                tmpfile.write(text)
 
         old_exit = sys.exit
         if isinstance(sys.exit, types.FunctionType):
@@ -721,7 +1114,7 @@ class Recipe():
             with open("/dev/null", "w") as devnull:
                 with redirect_stdout(devnull), redirect_stderr(devnull):
                     self._conda_meta = conda_build.api.render(
-                        self._conda_tempdir.name,
+                        render_dir,
                         finalize=finalize,
                         bypass_env_check=bypass_env_check,
                         permit_unsatisfiable_variants=permit_unsatisfiable_variants,
@@ -741,25 +1134,225 @@ class Recipe():
                 self, f"Unknown SystemExit raised in Conda-Build Render API: '{msg}'")
         finally:
             sys.exit = old_exit
+        self._conda_meta_key = key
+        if cache is not None:
+            cache.store(key, self._conda_meta)
         return self._conda_meta
 
     def conda_release(self):
         """Releases resources acquired in `conda_render`"""
         if self._conda_meta:
             self._conda_meta = None
+            self._conda_meta_key = None
         if self._conda_tempdir:
             self._conda_tempdir.cleanup()
             self._conda_tempdir = None
 
 
-def load_parallel_iter(recipe_folder, packages):
-    recipes = list(utils.get_recipes(recipe_folder, packages))
-    for recipe in utils.parallel_iter(Recipe.from_file, recipes, "Loading Recipes...",
-                                      recipe_folder, return_exceptions=True):
+class RecipeSnapshot():
+    """Read-only state of a `Recipe` at one point in time (see `Recipe.orig`)
+
+    Instead of a deep copy of the recipe, this holds a copy of the
+    lines of the raw recipe and shares the parsed ``meta`` with the
+    recipe. This is safe as `Recipe` never modifies ``meta`` in place,
+    but replaces it whenever the raw text is edited and re-rendered.
+
+    Arguments:
+      recipe: the recipe to take the snapshot of
+    """
+    def __init__(self, recipe: Recipe) -> None:
+        self.basedir = recipe.basedir
+        self.reldir = recipe.reldir
+        #: Lines of the raw recipe file (do not modify)
+        self.meta_yaml: List[str] = list(recipe.meta_yaml)
+        #: Parsed recipe YAML (shared, do not modify)
+        self.meta: Dict[str, Any] = recipe.meta
+        #: Version data for the original version (filled in by update filter)
+        self.version_data: Dict[str, Any] = deepcopy(recipe.version_data)
+        #: Whether `meta` lacks position information
+        self.readonly: bool = recipe.readonly
+        self._roundtrip_meta = recipe._roundtrip_meta  # pylint: disable=protected-access
+        # (copied, as the recipe adds platforms until it is rendered again)
+        self._yaml_text = recipe._yaml_text  # pylint: disable=protected-access
+        self._platform_metas = dict(recipe._platform_metas)  # pylint: disable=protected-access
+        self._recipe_class = type(recipe)
+
+    def _get_roundtrip_meta(self):
+        """Get `meta` with position information (see `Recipe`)"""
+        if not self.readonly:
+            return self.meta
+        if self._roundtrip_meta is None:
+            recipe = self._recipe_class(self.dir, self.basedir)
+            recipe.meta_yaml = list(self.meta_yaml)
+            self._roundtrip_meta = recipe._parse(False)  # pylint: disable=protected-access
+        return self._roundtrip_meta
+
+    # Read-only parts of the `Recipe` API
+    JINJA_VARS = Recipe.JINJA_VARS
+    TEMPLATES = Recipe.TEMPLATES
+    path = Recipe.path
+    relpath = Recipe.relpath
+    dir = Recipe.dir
+    name = Recipe.name
+    version = Recipe.version
+    build_number = Recipe.build_number
+    maintainers = Recipe.maintainers
+    package_names = Recipe.package_names
+    __str__ = Recipe.__str__
+    __getitem__ = Recipe.__getitem__
+    _walk = Recipe._walk
+    get = Recipe.get
+    get_template = Recipe.get_template
+    _get_yaml_text = Recipe._get_yaml_text
+    get_platform_meta = Recipe.get_platform_meta
+    get_raw_range = Recipe.get_raw_range
+    get_raw = Recipe.get_raw
+    get_deps = Recipe.get_deps
+    get_deps_dict = Recipe.get_deps_dict
+    dump = Recipe.dump
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__} "{self.reldir}"'
+
+
+class RecipeSummary():
+    """Compact read-only record of a `Recipe` for whole-repository scans
+
+    A loaded `Recipe` keeps the raw lines, the parsed YAML (with
+    position information if edited) and a snapshot of its original
+    state. Operations on all recipes, such as building the dependency
+    graph, only need a few fields, which this class keeps in slots as
+    tuples of interned strings. Names shared by many recipes (e.g.
+    ``python`` in ``deps``) are thus stored only once.
+
+    Use `load` to get the full, editable `Recipe`.
+
+    Arguments:
+      recipe: the recipe to summarize
+    """
+    __slots__ = ('basedir', 'reldir', 'name', 'version', 'build_number',
+                 'package_names', 'deps', 'maintainers', 'source_urls')
+
+    #: Requirement sections recorded in `deps`
+    SECTIONS = ('build', 'host', 'run')
+
+    def __init__(self, recipe: Recipe) -> None:
+        try:
+            build_number = int(recipe.get('build/number', 0))
+        except (TypeError, ValueError):
+            build_number = 0
+        source_urls = []
+        for source in utils.ensure_list(recipe.get('source', [])):
+            if isinstance(source, dict):
+                source_urls.extend(str(url) for url in utils.ensure_list(source.get('url', []))
+                                   if url)
+        self._set(
+            basedir=recipe.basedir,
+            reldir=recipe.reldir,
+            name=recipe.name,
+            version=recipe.version,
+            build_number=build_number,
+            package_names=recipe.package_names,
+            deps={section: list(recipe.get_deps_dict(section)) for section in self.SECTIONS},
+            maintainers=[str(maintainer) for maintainer in recipe.maintainers],
+            source_urls=source_urls,
+        )
+
+    def _set(self, basedir, reldir, name, version, build_number, package_names, deps,
+             maintainers, source_urls) -> None:
+        intern = sys.intern
+        #: path to folder containing recipes
+        self.basedir: str = intern(basedir)
+        #: relative path to recipe dir from folder containing recipes
+        self.reldir: str = intern(reldir)
+        #: The name of the toplevel package built by this recipe
+        self.name: str = intern(name)
+        #: The version of the package built by this recipe
+        self.version: str = intern(version)
+        #: The build number (0 if not set)
+        self.build_number: int = build_number
+        #: The packages built by this recipe (including outputs)
+        self.package_names: Tuple[str, ...] = tuple(intern(package) for package in package_names)
+        #: Names of the dependencies by requirement section (including outputs)
+        self.deps: Dict[str, Tuple[str, ...]] = {
+            intern(section): tuple(intern(dep) for dep in section_deps)
+            for section, section_deps in deps.items() if section_deps
+        }
+        #: Recipe maintainers
+        self.maintainers: Tuple[str, ...] = tuple(intern(maintainer) for maintainer in maintainers)
+        #: Source URLs (for all platforms)
+        self.source_urls: Tuple[str, ...] = tuple(source_urls)
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        # Strings are no longer interned after unpickling
+        self._set(*state)
+
+    @classmethod
+    def from_file(cls, recipe_dir, recipe_fname, return_exceptions=False) -> "RecipeSummary":
+        """Create new `RecipeSummary` from file (see `Recipe.from_file`)"""
+        recipe = Recipe.from_file(recipe_dir, recipe_fname, return_exceptions, readonly=True)
+        if isinstance(recipe, Exception):
+            return recipe
+        return cls(recipe)
+
+    def load(self, readonly=False) -> Recipe:
+        """Loads the full `Recipe` from file
+
+        Args:
+           readonly: Use the faster parser for recipes not (usually)
+                     edited (see `Recipe`)
+        """
+        return Recipe.from_file(self.basedir, self.dir, readonly=readonly)
+
+    def get_deps(self, sections=None) -> List[str]:
+        """Names of the dependencies in **sections** (default: all)"""
+        if not sections:
+            sections = ('build', 'run', 'host')
+        else:
+            sections = utils.ensure_list(sections)
+        return list(dict.fromkeys(dep
+                                  for section in sections
+                                  for dep in self.deps.get(section, ())))
+
+    path = Recipe.path
+    relpath = Recipe.relpath
+    dir = Recipe.dir
+    __str__ = Recipe.__str__
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__} "{self.reldir}"'
+
+
+def load_parallel_iter(recipe_folder, packages, readonly=False, summary=False,
+                       chunksize=16, window=None):
+    """Loads recipes in parallel, yielding them as they are loaded
+
+    The recipe folder is scanned while loading, and only a bounded
+    number of recipes is in flight at any time (see `RenderPool.imap`).
+    Errors are logged and the failed recipes skipped.
+
+    Args:
+      recipe_folder: Path to recipes folder
+      packages: Package name globs selecting recipes
+      readonly: Load recipes with the faster parser (see `Recipe`)
+      summary: Yield `RecipeSummary` records instead of full recipes
+      chunksize: Number of recipes loaded by a worker at once
+      window: Maximum number of chunks in flight
+    """
+    if summary:
+        load = partial(RecipeSummary.from_file, recipe_folder, return_exceptions=True)
+    else:
+        load = partial(Recipe.from_file, recipe_folder, return_exceptions=True,
+                       readonly=readonly)
+    recipes = utils.RenderPool.imap(load, utils.get_recipes(recipe_folder, packages),
+                                    chunksize=chunksize, window=window)
+    for recipe in utils.tqdm(recipes, desc="Loading Recipes..."):
         if isinstance(recipe, RecipeError):
             recipe.log()
         elif isinstance(recipe, Exception):
             logger.error("Could not load recipe %s", recipe)
         else:
             yield recipe
-
@@ -0,0 +1,643 @@
+"""
+Parsing and Storage Backends for `RepoData`
+
+`utils.RepoData` keeps the package directories of all configured
+channels in a single `pandas.DataFrame`. This module implements
+parsing the downloaded ``repodata.json`` files into that frame and
+the on-disk cache for it.
+
+The parser (`RepodataParser`) is fed the data as it is downloaded
+and decodes one package entry at a time, keeping only the fields
+needed in compact column buffers. The JSON object graph of the
+entire file is never held in memory. Strings are stored as integer
+codes into a table shared by all columns and files parsed.
+
+The cache is a directory holding one ``.npy`` file per array making
+up a column. String columns are stored as integer codes into a string
+table, which is stored only once if shared by several category
+columns. List columns are stored as flat value codes plus row
+offsets. Arrays are opened with ``mmap``, so that many processes
+loading the same cache share their pages and nothing is unpickled.
+
+`utils.RepoData` keeps the string columns as the codes mapped from the
+cache and accesses the shared string table through a `StringTable`.
+Strings are decoded only for the values a query compares against or
+returns.
+"""
+
+import codecs
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+#: Version of the cache layout. Caches with other versions are ignored.
+CACHE_VERSION = 2
+
+#: Name of file describing the columns in a cache directory
+CACHE_INDEX = "columns.json"
+
+
+#: Matches JSON whitespace
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+#: Matches an object key including the colon following it
+_OBJECT_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:')
+
+
+class RepodataParser:
+    """Incremental parser for ``repodata.json``
+
+    Pass the data to `write` in chunks as it arrives, then call
+    `close`. Package entries are decoded one at a time as soon as they
+    are complete. Only the fields listed in **columns** are kept, and
+    they are appended to column buffers directly:
+
+    - ``build_number`` is stored in an integer array,
+    - ``depends`` in a flat array of string codes, with the range of
+      each package file given by ``depends_start`` and ``depends_stop``
+      (see `get_values`),
+    - all other fields (including ``filename``, the key of the package
+      entry) as string codes.
+
+    String codes refer to the table of unique strings **strings**,
+    which may be shared between parsers.
+
+    Only entries of ``packages`` are loaded. Entries of
+    ``packages.conda`` are skipped without being kept in memory, all
+    other top level keys except ``info`` are ignored.
+
+    Args:
+      columns: Names of the fields to load
+      strings: Table mapping strings to their codes. New strings are
+        added with the next free code.
+
+    Raises:
+      `ValueError` if the data is not valid JSON or incomplete.
+    """
+    #: Fields stored as integers
+    INT_FIELDS = ('build_number',)
+    #: Fields stored as lists of strings
+    LIST_FIELDS = ('depends',)
+    #: Top level keys containing package entries
+    PACKAGE_KEYS = ('packages', 'packages.conda')
+
+    def __init__(self, columns: Sequence[str], strings: Dict[str, int] = None) -> None:
+        self.columns = list(columns)
+        #: Maps strings to codes
+        self.strings: Dict[str, int] = {} if strings is None else strings
+        #: The **info** section of the repodata
+        self.info: Dict[str, Any] = {}
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._wait_size = 0
+        self._state = 'start'
+        self._key = None
+        self._data: Dict[str, array] = {}
+        self._values: Dict[str, array] = {}
+        for name in self.columns:
+            if name in self.INT_FIELDS:
+                self._data[name] = array('q')
+            elif name in self.LIST_FIELDS:
+                self._data[name] = array('q')  # end of range in values
+                self._values[name] = array('i')
+            else:
+                self._data[name] = array('i')
+
+    def write(self, data: bytes) -> None:
+        """Parse the next chunk of **data**"""
+        text = self._text.decode(data)
+        self._pending.append(text)
+        self._pending_size += len(text)
+        # Values not parsed incrementally are retried only once the
+        # buffered data doubled, keeping the total work linear.
+        if self._pending_size >= self._wait_size:
+            self._parse(final=False)
+
+    def close(self) -> None:
+        """Finish parsing"""
+        self._pending.append(self._text.decode(b'', final=True))
+        self._parse(final=True)
+        if self._state != 'done':
+            raise ValueError("Incomplete repodata")
+        if self._buf[self._pos:].strip():
+            raise ValueError("Extra data after repodata")
+
+    def _parse(self, final: bool) -> None:
+        buf = self._buf[self._pos:] + ''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self._wait_size = 0
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos == len(buf) or self._state == 'done':
+                break
+            char = buf[pos]
+            if self._state == 'start':
+                if char != '{':
+                    raise ValueError("Repodata is not a JSON object")
+                self._state = 'first_key'
+                pos += 1
+            elif self._state in ('next', 'next_entry'):
+                # after a value, expecting ',' or '}'
+                if char == ',':
+                    self._state = 'key' if self._state == 'next' else 'entry'
+                elif char == '}':
+                    self._state = 'done' if self._state == 'next' else 'next'
+                else:
+                    raise ValueError(f"Unexpected {char!r} in repodata at {pos}")
+                pos += 1
+            elif char == '}':
+                # only objects without any key may be closed here
+                if self._state == 'first_key':
+                    self._state = 'done'
+                elif self._state == 'first_entry':
+                    self._state = 'next'
+                else:
+                    what = 'value' if self._state == 'value' else 'key'
+                    raise ValueError(f"Expected {what} in repodata at {pos}")
+                pos += 1
+            elif self._state == 'value':
+                end = self._parse_value(buf, pos, final)
+                if end is None:
+                    break
+                pos = end
+            else:  # 'key' or 'entry' (or the first of them)
+                match = _OBJECT_KEY.match(buf, pos)
+                if match is None:
+                    if char != '"' or final:
+                        raise ValueError(f"Expected key in repodata at {pos}")
+                    break
+                key = match.group(1)
+                if '\\' in key:
+                    key = json.loads('"' + key + '"')
+                if self._state in ('key', 'first_key'):
+                    self._key = key
+                    self._state = 'value'
+                    pos = match.end()
+                    continue
+                end = _WHITESPACE.match(buf, match.end()).end()
+                try:
+                    package, end = self._decoder.raw_decode(buf, end)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError(f"Invalid package entry in repodata at {pos}")
+                    break
+                if not isinstance(package, dict):
+                    raise ValueError(f"Invalid package entry in repodata at {pos}")
+                if self._key == 'packages':
+                    self._add_package(key, package)
+                self._state = 'next_entry'
+                pos = end
+        self._buf = buf
+        self._pos = pos
+
+    def _parse_value(self, buf: str, pos: int, final: bool):
+        """Parse value of top level key, returns end or None if incomplete"""
+        if self._key in self.PACKAGE_KEYS and buf[pos] == '{':
+            self._state = 'first_entry'
+            return pos + 1
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            value, end = None, None
+        # a scalar may just be cut off by the end of the chunk
+        if end is None or (end == len(buf) and not final):
+            if final:
+                raise ValueError(f"Invalid value in repodata at {pos}")
+            self._wait_size = len(buf) - pos
+            return None
+        if self._key == 'info':
+            self.info = value
+        self._state = 'next'
+        return end
+
+    def _add_package(self, filename: str, package: Dict[str, Any]) -> None:
+        strings = self.strings
+        for name, column in self._data.items():
+            if name in self.INT_FIELDS:
+                column.append(int(package.get(name, 0)))
+            elif name in self.LIST_FIELDS:
+                values = self._values[name]
+                values.extend(strings.setdefault(str(item), len(strings))
+                              for item in package.get(name, ()))
+                column.append(len(values))
+            else:
+                value = filename if name == 'filename' else str(package.get(name, ''))
+                column.append(strings.setdefault(value, len(strings)))
+
+    def get_values(self, name: str) -> np.ndarray:
+        """Get flat array of string codes for list field **name**"""
+        return _as_array(self._values[name], np.int32)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Create DataFrame from the loaded package entries
+
+        String fields are returned as codes. List fields are returned
+        as two columns ``<name>_start`` and ``<name>_stop``, giving the
+        range of each row in `get_values`.
+        """
+        data = {}
+        for name, column in self._data.items():
+            if name in self.LIST_FIELDS:
+                stops = _as_array(column, np.int64)
+                data[name + '_start'] = np.concatenate(([0], stops))[:-1].astype(np.int64)
+                data[name + '_stop'] = stops
+            elif name in self.INT_FIELDS:
+                data[name] = _as_array(column, np.int64)
+            else:
+                data[name] = _as_array(column, np.int32)
+        return pd.DataFrame(data)
+
+
+def _as_array(buf: array, dtype) -> np.ndarray:
+    """Convert `array.array` **buf** to numpy array of **dtype**"""
+    if not buf:
+        return np.zeros(0, dtype=dtype)
+    return np.frombuffer(buf, dtype=buf.typecode).astype(dtype, copy=False)
+
+
+def gather_ranges(values: np.ndarray, starts: np.ndarray, stops: np.ndarray):
+    """Collect ranges of **values** into new, contiguous array
+
+    Returns:
+      Tuple of the new values array and the new starts and stops
+      of each range within it.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    new_stops = np.cumsum(lengths)
+    new_starts = new_stops - lengths
+    total = int(new_stops[-1]) if len(new_stops) else 0
+    index = np.arange(total, dtype=np.int64) - np.repeat(new_starts - starts, lengths)
+    return np.asarray(values)[index], new_starts, new_stops
+
+
+def _write_strings(prefix: str, strings: Sequence[str]) -> None:
+    """Write **strings** as UTF-8 blob plus offsets"""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    np.save(prefix + ".strings.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(prefix + ".offsets.npy", offsets)
+
+
+def _read_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Decode strings written by `_write_strings`"""
+    data = blob.tobytes()
+    offsets = offsets.tolist()
+    return [data[start:stop].decode('utf-8')
+            for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+class StringTable:
+    """Table of strings addressed by integer codes
+
+    The strings are either given as list, or as UTF-8 blob plus
+    offsets as written by `_write_strings` (e.g. memory mapped from a
+    `ColumnarCache`). In the latter case, strings are decoded only
+    when requested via `take`, and looked up by binary search over
+    the blob if the table is sorted. The table is never decoded as a
+    whole unless `to_list` is called.
+
+    Args:
+      strings: The strings (if not given as **blob** and **offsets**)
+      blob: UTF-8 encoded strings concatenated
+      offsets: Start of each string in **blob**, followed by its length
+      is_sorted: Whether the strings are sorted (by code point)
+    """
+    def __init__(self, strings: Sequence[str] = None, blob: np.ndarray = None,
+                 offsets: np.ndarray = None, is_sorted: bool = False) -> None:
+        self._strings = None if strings is None else list(strings)
+        self._blob = blob
+        self._offsets = offsets
+        self._data = None if blob is None else memoryview(np.asarray(blob))
+        #: Whether the strings are sorted, so that codes sort like strings
+        self.is_sorted = is_sorted
+        self._codes: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        if self._strings is not None:
+            return len(self._strings)
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        if self._strings is not None:
+            return self._strings[code]
+        return str(self._data[int(self._offsets[code]):int(self._offsets[code + 1])], 'utf-8')
+
+    def take(self, codes: Iterable[int]) -> List[str]:
+        """Get the strings for **codes**"""
+        if self._strings is not None:
+            strings = self._strings
+            return [strings[code] for code in np.asarray(codes, dtype=np.int64).tolist()]
+        codes = np.asarray(codes, dtype=np.int64)
+        data = self._data
+        return [str(data[start:stop], 'utf-8')
+                for start, stop in zip(self._offsets[codes].tolist(),
+                                       self._offsets[codes + 1].tolist())]
+
+    def to_list(self) -> List[str]:
+        """Get all strings (decodes the entire table)"""
+        if self._strings is not None:
+            return list(self._strings)
+        return _read_strings(self._blob, self._offsets)
+
+    def get_code(self, string: str) -> int:
+        """Get the code of **string** (-1 if not in the table)"""
+        if self._strings is not None or not self.is_sorted:
+            if self._codes is None:
+                self._codes = {value: code for code, value in enumerate(self.to_list())}
+            return self._codes.get(string, -1)
+        key = string.encode('utf-8')
+        data, offsets = self._data, self._offsets
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if data[int(offsets[mid]):int(offsets[mid + 1])].tobytes() < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self) and data[int(offsets[low]):int(offsets[low + 1])].tobytes() == key:
+            return low
+        return -1
+
+    def get_codes(self, strings: Iterable[str]) -> np.ndarray:
+        """Get the codes of **strings** (-1 for those not in the table)"""
+        return np.array([self.get_code(str(string)) for string in strings], dtype=np.int64)
+
+    def write(self, prefix: str) -> None:
+        """Write table to **prefix** ``.strings.npy`` and ``.offsets.npy``"""
+        if self._strings is not None:
+            _write_strings(prefix, self._strings)
+        else:
+            np.save(prefix + ".strings.npy", np.asarray(self._blob))
+            np.save(prefix + ".offsets.npy", np.asarray(self._offsets))
+
+
+def _write_column(path: str, name: str, column: pd.Series,
+                  written: Dict[int, str]) -> Dict[str, str]:
+    """Write a single column, returning its description for the index
+
+    Category columns sharing their categories with a column already
+    written (listed in **written**) refer to that column's strings.
+    """
+    prefix = os.path.join(path, name)
+    if hasattr(column, 'cat'):
+        np.save(prefix + ".codes.npy", np.asarray(column.array.codes))
+        categories = column.cat.categories
+        if id(categories) in written:
+            return {'kind': 'category', 'strings': written[id(categories)]}
+        _write_strings(prefix, list(categories))
+        written[id(categories)] = name
+        return {'kind': 'category', 'strings': name}
+    if column.dtype.kind in 'biuf':
+        np.save(prefix + ".npy", np.asarray(column))
+        return {'kind': 'array'}
+    if len(column) and isinstance(column.iloc[0], list):
+        lengths = np.fromiter((len(item) for item in column), dtype=np.int64,
+                              count=len(column))
+        offsets = np.zeros(len(column) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = [item for items in column for item in items]
+        codes, uniques = pd.factorize(pd.Series(flat, dtype=object))
+        np.save(prefix + ".rows.npy", offsets)
+        np.save(prefix + ".codes.npy", codes.astype(np.int32))
+        _write_strings(prefix, list(uniques))
+        return {'kind': 'list'}
+    codes, uniques = pd.factorize(column.astype(str))
+    np.save(prefix + ".codes.npy", codes.astype(np.int32))
+    _write_strings(prefix, list(uniques))
+    return {'kind': 'string'}
+
+
+def _write_coded_column(path: str, name: str, column: pd.Series, table: StringTable,
+                        written: Dict[int, str]) -> Dict[str, str]:
+    """Write column of codes into **table** like a category column"""
+    np.save(os.path.join(path, name) + ".codes.npy", np.asarray(column, dtype=np.int32))
+    if id(table) not in written:
+        table.write(os.path.join(path, name))
+        written[id(table)] = name
+    return {'kind': 'category', 'strings': written[id(table)], 'sorted': table.is_sorted}
+
+
+def save_frame(df: pd.DataFrame, path: str, meta: Dict[str, Any] = None,
+               arrays: Dict[str, np.ndarray] = None, table: StringTable = None,
+               coded: Sequence[str] = ()) -> None:
+    """Store **df** in columnar format in directory **path**
+
+    The cache is written to a new directory next to **path**, and
+    **path** is then atomically replaced with a link to it, so that
+    concurrent readers always see a complete cache (see `_replace`).
+    An existing cache (or an old style pickle file) at **path** is
+    replaced.
+
+    Args:
+      df: The frame to store
+      path: The cache directory
+      meta: JSON serializable data to store along with the frame
+      arrays: Additional numeric arrays to store along with the frame
+      table: String table for the columns in **coded**
+      coded: Columns holding codes into **table**. These are stored
+        as category columns sharing the table (see `ColumnarCache.get_codes`).
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    tmpdir = tempfile.mkdtemp(prefix=".repodata-", dir=parent)
+    try:
+        written: Dict[int, str] = {}
+        columns = {name: (_write_coded_column(tmpdir, name, df[name], table, written)
+                          if name in coded else
+                          _write_column(tmpdir, name, df[name], written))
+                   for name in df.columns}
+        for name, values in (arrays or {}).items():
+            np.save(os.path.join(tmpdir, "_" + name + ".npy"), np.asarray(values))
+        with open(os.path.join(tmpdir, CACHE_INDEX), "w") as fdes:
+            json.dump({'version': CACHE_VERSION, 'rows': len(df), 'columns': columns,
+                       'arrays': list(arrays or ()), 'meta': meta or {}},
+                      fdes)
+        _replace(tmpdir, path)
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+
+def _replace(tmpdir: str, path: str) -> None:
+    """Make **path** point to the cache written to **tmpdir**
+
+    **path** is a symbolic link to the current cache directory, which
+    is its sibling. The link is swapped with `os.replace`, which is
+    atomic, so that readers always find a complete cache. Several
+    processes sharing a cache may replace it concurrently. Swaps are
+    serialized with a lock, so that each process removes exactly the
+    directory it replaced. Readers that mapped its files keep them;
+    readers still opening it retry (see `ColumnarCache`).
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    link = os.path.join(parent, ".repodata-link-" + os.path.basename(tmpdir))
+    os.symlink(os.path.basename(tmpdir), link)
+    try:
+        with open(os.path.abspath(path) + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            old = os.readlink(path) if os.path.islink(path) else None
+            try:
+                os.replace(link, path)
+            except IsADirectoryError:
+                # cache directory written by an older version is in the way
+                _remove_dir(path)
+                os.replace(link, path)
+            if old is not None:
+                shutil.rmtree(os.path.join(parent, old), ignore_errors=True)
+    finally:
+        if os.path.lexists(link):
+            os.unlink(link)
+
+
+def _remove_dir(path: str) -> None:
+    """Remove directory **path**, moving it out of the way first"""
+    old = tempfile.mkdtemp(prefix=".repodata-old-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.rename(path, os.path.join(old, "cache"))
+    finally:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class ColumnarCache:
+    """Read access to a cache directory written by `save_frame`
+
+    All files of the cache are mapped when it is opened, so that the
+    data remains accessible even if the cache is replaced later on.
+    Columns are decoded only when first requested via `get_column`.
+    Integer arrays are used directly from the memory map. Category
+    codes are copied by pandas when the categorical is created. To
+    avoid decoding and copying, use `get_codes` and `get_strings`.
+
+    Args:
+      path: Cache directory
+
+    Raises:
+      `ValueError` if **path** is not a valid cache of the current version.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        while True:
+            # the cache may be replaced while we open it (see `_replace`)
+            directory = os.path.realpath(path)
+            try:
+                before = os.stat(directory)
+                index, self._arrays = self._open(directory)
+                if os.path.samestat(os.stat(path), before):
+                    break
+            except OSError as exc:
+                if os.path.realpath(path) == directory:
+                    raise ValueError(f"Not a repodata cache: {path}") from exc
+            except ValueError as exc:
+                raise ValueError(f"Unable to read repodata cache {path}") from exc
+        if index.get('version') != CACHE_VERSION:
+            raise ValueError(f"Repodata cache {path} has version {index.get('version')}")
+        #: Number of rows
+        self.rows: int = index['rows']
+        #: Maps column names to column description
+        self.columns: Dict[str, Dict[str, str]] = index['columns']
+        #: Names of additional arrays (see `get_array`)
+        self.arrays: List[str] = index.get('arrays', [])
+        #: Data stored with the frame (see `save_frame`)
+        self.meta: Dict[str, Any] = index.get('meta', {})
+        self._decoded: Dict[str, pd.Series] = {}
+        self._dtypes: Dict[str, pd.CategoricalDtype] = {}
+        self._tables: Dict[str, StringTable] = {}
+
+    @staticmethod
+    def _open(directory: str):
+        """Read the index and map the arrays of cache **directory**"""
+        with open(os.path.join(directory, CACHE_INDEX)) as fdes:
+            index = json.load(fdes)
+        arrays = {
+            fname[:-len(".npy")]: np.load(os.path.join(directory, fname), mmap_mode='r')
+            for fname in os.listdir(directory) if fname.endswith(".npy")
+        }
+        return index, arrays
+
+    def _load(self, name: str, suffix: str) -> np.ndarray:
+        return self._arrays[name + suffix[:-len(".npy")]]
+
+    def _strings(self, name: str) -> List[str]:
+        return _read_strings(self._load(name, ".strings.npy"),
+                             self._load(name, ".offsets.npy"))
+
+    def _decode(self, name: str):
+        kind = self.columns[name]['kind']
+        if kind == 'array':
+            return self._load(name, ".npy")
+        if kind == 'category':
+            source = self.columns[name].get('strings', name)
+            if source not in self._dtypes:
+                self._dtypes[source] = pd.CategoricalDtype(self._strings(source))
+            return pd.Categorical.from_codes(self._load(name, ".codes.npy"),
+                                             dtype=self._dtypes[source])
+        strings = np.array(self._strings(name), dtype=object)
+        values = strings[self._load(name, ".codes.npy")]
+        if kind == 'string':
+            return values
+        rows = self._load(name, ".rows.npy").tolist()
+        return [values[start:stop].tolist() for start, stop in zip(rows[:-1], rows[1:])]
+
+    def get_column(self, name: str):
+        """Get decoded column **name**"""
+        if name not in self._decoded:
+            self._decoded[name] = self._decode(name)
+        return self._decoded[name]
+
+    def get_codes(self, name: str) -> np.ndarray:
+        """Get the codes of category column **name** (memory mapped)"""
+        if self.columns[name]['kind'] != 'category':
+            raise ValueError(f"Column {name} of {self.path} is not a category column")
+        return self._load(name, ".codes.npy")
+
+    def get_strings(self, name: str) -> StringTable:
+        """Get the table of the strings the codes of category column **name** refer to
+
+        The table is read from the memory map as needed. Columns
+        sharing their strings get the same table.
+        """
+        if self.columns[name]['kind'] != 'category':
+            raise ValueError(f"Column {name} of {self.path} is not a category column")
+        source = self.columns[name].get('strings', name)
+        if source not in self._tables:
+            self._tables[source] = StringTable(
+                blob=self._load(source, ".strings.npy"),
+                offsets=self._load(source, ".offsets.npy"),
+                is_sorted=self.columns[name].get('sorted', False))
+        return self._tables[source]
+
+    def get_array(self, name: str) -> np.ndarray:
+        """Get additional array **name** (memory mapped)"""
+        return self._load("_" + name, ".npy")
+
+    def to_frame(self, columns: Sequence[str] = None) -> pd.DataFrame:
+        """Create DataFrame from (selected) columns"""
+        if columns is None:
+            columns = list(self.columns)
+        return pd.DataFrame({name: self.get_column(name) for name in columns},
+                            columns=columns, copy=False)
+
+
+def load_frame(path: str) -> pd.DataFrame:
+    """Load frame stored with `save_frame` from directory **path**"""
+    return ColumnarCache(path).to_frame()
@@ -560,7 +560,7 @@ def generate_readme(recipe_basedir, output_dir, folder, repodata, renderer):
 
     # Read the meta.yaml file(s)
     try:
-        recipe = Recipe.from_file(recipe_basedir, meta_fname)
+        recipe = Recipe.from_file(recipe_basedir, meta_fname, readonly=True)
     except RecipeError as e:
         logger.error("Unable to process %s: %s", meta_fname, e)
         return []
@@ -575,14 +575,10 @@ def generate_readme(recipe_basedir, output_dir, folder, repodata, renderer):
                                  reverse=True)
 
         if sorted_versions:
-            depends = [
-                depstring.split(' ', 1) if ' ' in depstring else (depstring, '')
-                for depstring in
-                repodata.get_package_data('depends', name=package,
-                                          version=sorted_versions[0][0],
-                                          build_number=sorted_versions[0][1],
-                )[0]
-            ]
+            depends = repodata.get_depends(package,
+                                           version=sorted_versions[0][0],
+                                           build_number=sorted_versions[0][1],
+            )[0]
         else:
             depends = []
 
@@ -617,7 +613,7 @@ def generate_recipes(app):
     doctree_dir = app.env.doctreedir  # .../build/doctrees
     repo_dir = op.join(op.dirname(app.env.srcdir), "_bioconda_recipes")
     recipe_basedir = op.join(repo_dir, app.config.bioconda_recipes_path)
-    repodata_cache_file = op.join(doctree_dir, 'RepoDataCache.pkl')
+    repodata_cache_file = op.join(doctree_dir, 'RepoDataCache')
     repo_config_file = os.path.join(repo_dir, app.config.bioconda_config_file)
     output_dir = op.join(source_dir, 'recipes')
 
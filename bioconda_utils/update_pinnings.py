@@ -9,9 +9,11 @@ import logging
 import collections
 import enum
 
+from typing import Dict, List, Tuple
+
 import networkx as nx
 
-from .utils import RepoData, load_conda_build_config, parallel_iter
+from .utils import RepoData, RenderPool, load_conda_build_config, parallel_iter
 
 # for type checking
 from .recipe import Recipe, RecipeError
@@ -21,21 +23,42 @@ from conda_build.metadata import MetaData
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
-def will_build_variant(meta: MetaData) -> bool:
+def get_variant_data(metas: List[MetaData]) -> Dict[Tuple[str, str], List[Tuple[str, int]]]:
+    """Fetch the extant builds for all **metas** with a single query
+
+    Args:
+      metas: Variant MetaData objects
+
+    Returns:
+      Dictionary mapping name and version of each variant to a list of
+      build string and build number tuples for linux and noarch.
+    """
+    return RepoData().get_package_data_bulk(
+        set((meta.name(), meta.version()) for meta in metas),
+        ['build', 'build_number'],
+        platform=['linux', 'noarch'],
+        by=['name', 'version'],
+    )
+
+
+def _get_variant_builds(meta: MetaData, variant_data=None) -> List[Tuple[str, int]]:
+    if variant_data is None:
+        variant_data = get_variant_data([meta])
+    return variant_data.get((meta.name(), meta.version()), [])
+
+
+def will_build_variant(meta: MetaData, variant_data=None) -> bool:
     """Check if the recipe variant will be built as currently rendered
 
     Args:
       meta: Variant MetaData object
+      variant_data: Result of `get_variant_data` (queried if not given)
 
     Returns:
       True if all extant build numbers are smaller than the one indicated
       by the variant MetaData.
     """
-    build_numbers = RepoData().get_package_data(
-        'build_number',
-        name=meta.name(), version=meta.version(),
-        platform=['linux', 'noarch'],
-    )
+    build_numbers = [num for _, num in _get_variant_builds(meta, variant_data)]
     current_num = int(meta.build_number())
     res = all(num < current_num for num in build_numbers)
     if res:
@@ -46,26 +69,25 @@ def will_build_variant(meta: MetaData) -> bool:
     return res
 
 
-def have_variant(meta: MetaData) -> bool:
+def have_variant(meta: MetaData, variant_data=None) -> bool:
     """Checks if we have an exact match to name/version/buildstring
 
     Args:
       meta: Variant MetaData object
+      variant_data: Result of `get_variant_data` (queried if not given)
 
     Returns:
       True if the variant's build string exists already in the repodata
     """
-    res = RepoData().get_package_data(
-        name=meta.name(), version=meta.version(), build=meta.build_id(),
-        platform=['linux', 'noarch']
-    )
+    res = any(build == meta.build_id()
+              for build, _ in _get_variant_builds(meta, variant_data))
     if res:
         logger.debug("Package %s=%s=%s exists",
                      meta.name(), meta.version(), meta.build_id())
     return res
 
 
-def have_variant_but_for_python(meta: MetaData) -> bool:
+def have_variant_but_for_python(meta: MetaData, variant_data=None) -> bool:
     """Checks if we have an exact or ``py[23]_`` prefixed match to
     name/version/buildstring
 
@@ -73,6 +95,7 @@ def have_variant_but_for_python(meta: MetaData) -> bool:
 
     Args:
       meta: Variant MetaData object
+      variant_data: Result of `get_variant_data` (queried if not given)
 
     Returns:
       True if FIXME
@@ -82,11 +105,7 @@ def have_variant_but_for_python(meta: MetaData) -> bool:
             return build[4:]
         return build
 
-    builds = RepoData().get_package_data(
-        'build',
-        name=meta.name(), version=meta.version(),
-        platform=['linux', 'noarch']
-    )
+    builds = [build for build, _ in _get_variant_builds(meta, variant_data)]
     res = [build for build in builds
            if strip_py(build) == strip_py(meta.build_id())]
     if res:
@@ -127,18 +146,21 @@ class State(enum.Flag):
         return self & self.FAIL
 
 
-def check(recipe: Recipe, build_config, keep_metas=False) -> State:
+def check(recipe: Recipe, build_config=None, keep_metas=False) -> State:
     """Determine if a given recipe should have its build number increments
     (bumped) due to a recent change in pinnings.
 
     Args:
       recipe: The recipe to check
-      build_config: conda build config object
+      build_config: conda build config object (defaults to
+                    `RenderPool.build_config`)
       keep_metas: If true, `Recipe.conda_release` is not called
 
     Returns:
       Tuple of state and a list of rendered MetaYaml variant objects
     """
+    if build_config is None:
+        build_config = RenderPool.build_config()
     try:
         logger.debug("Calling Conda to render %s", recipe)
         metas = recipe.conda_render(config=build_config)
@@ -154,15 +176,16 @@ def check(recipe: Recipe, build_config, keep_metas=False) -> State:
         logger.error("Failed to render %s. Got 'None' from recipe.conda_render()", recipe)
         return State.FAIL
 
+    variant_data = get_variant_data([meta for meta, _, _ in metas if not meta.skip()])
     flags = State(0)
     for meta, _, _ in metas:
         if meta.skip():
             flags |= State.SKIP
-        elif have_variant(meta):
+        elif have_variant(meta, variant_data):
             flags |= State.HAVE
-        elif will_build_variant(meta):
+        elif will_build_variant(meta, variant_data):
             flags |= State.BUMPED
-        elif have_variant_but_for_python(meta):
+        elif have_variant_but_for_python(meta, variant_data):
             flags |= State.BUMP_PYTHON_ONLY
         else:
             logger.info("Package %s=%s=%s missing!",
@@ -5,29 +5,37 @@ This module collects small pieces of code used throughout :py:mod:`bioconda_util
 """
 
 import asyncio
+import atexit
 import contextlib
 import datetime
 import fnmatch
-import glob
+import hashlib
+import json
 import logging
 import os
+import pickle
+import re
 import subprocess as sp
 import sys
 import shutil
-import json
 import queue
+import tempfile
+import time
 import warnings
 
-from threading import Event, Thread
+from threading import Event, Lock, Thread
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from pathlib import PurePath
-from collections import Counter, Iterable, defaultdict, namedtuple
-from itertools import product, chain, groupby, zip_longest
-from functools import partial
-from typing import Sequence, Collection, List, Dict, Any, Union
-from multiprocessing import Pool
+from stat import S_IMODE, S_ISDIR
+from collections import Counter, Iterable, defaultdict, deque, namedtuple
+from itertools import product, chain, groupby, islice, zip_longest
+from functools import lru_cache, partial
+from typing import (Sequence, Collection, List, Dict, Any, Iterator, Optional, Pattern,
+                    Set, Tuple, Union)
 from multiprocessing.pool import ThreadPool
 
 import pkg_resources
+import numpy as np
 import pandas as pd
 import tqdm as _tqdm
 import aiohttp
@@ -35,12 +43,15 @@ import backoff
 import yaml
 import jinja2
 from jinja2 import Environment, PackageLoader
+import conda_build
 from conda_build import api
 from conda.exports import VersionOrder
 from jsonschema import validate
 from colorlog import ColoredFormatter
 from boltons.funcutils import FunctionBuilder
 
+from . import repodata
+
 
 logger = logging.getLogger(__name__)
 
@@ -306,6 +317,109 @@ jinja_silent_undef = Environment(
 )
 
 
+class JinjaMarkedUndefined(jinja2.Undefined):
+    """Undefined rendering as `MARKER` (see `get_recipe_version`)
+
+    Values depending on names only defined when rendering with
+    conda-build can thus be told apart from values that are empty.
+    """
+    #: Rendered in place of undefined names
+    MARKER = "__bioconda_utils_undefined__"
+
+    def _fail_with_undefined_error(self, *args, **kwargs):
+        return self.MARKER
+
+    __str__ = __add__ = __radd__ = __mul__ = __rmul__ = __div__ = __rdiv__ = \
+        __truediv__ = __rtruediv__ = __floordiv__ = __rfloordiv__ = \
+        __mod__ = __rmod__ = __pos__ = __neg__ = __call__ = \
+        __getitem__ = __lt__ = __le__ = __gt__ = __ge__ = __int__ = \
+        __float__ = __complex__ = __pow__ = __rpow__ = \
+        _fail_with_undefined_error
+
+
+jinja_marked_undef = Environment(
+    undefined=JinjaMarkedUndefined
+)
+
+
+class SelectorNamespace(dict):
+    """Names available to ``# [expression]`` line selectors
+
+    Mirrors the namespace conda-build uses (``conda_build.metadata.ns_cfg``)
+    for the target **platform**. As in conda-build, names not defined
+    evaluate to False. Names of the form ``pyXY`` are True if ``py`` is
+    ``XY``.
+
+    Args:
+      platform: ``linux``, ``osx``, ``noarch`` or a subdir such as
+                ``linux-aarch64``. Noarch packages are built on Linux.
+      variables: Additional names, e.g. ``py=37`` (the Python version
+                 defaults to that of the running interpreter)
+    """
+    #: Maps platforms to the subdir their packages are built on
+    PLATFORM_SUBDIRS = {
+        'linux': 'linux-64',
+        'osx': 'osx-64',
+        'noarch': 'linux-64',
+    }
+
+    def __init__(self, platform: str = 'linux', **variables) -> None:
+        subdir = self.PLATFORM_SUBDIRS.get(platform, platform)
+        plat, _, arch = subdir.partition('-')
+        py = int(variables.pop('py', "%i%i" % sys.version_info[:2]))
+        super().__init__(
+            linux=plat == 'linux',
+            linux64=subdir == 'linux-64',
+            aarch64=arch == 'aarch64',
+            arm64=arch == 'arm64',
+            osx=plat == 'osx',
+            unix=plat in ('linux', 'osx'),
+            win=plat == 'win',
+            x86=arch in ('32', '64'),
+            x86_64=arch == '64',
+            build_platform=subdir,
+            target_platform=subdir,
+            py=py,
+            py2k=20 <= py < 30,
+            py3k=py >= 30,
+        )
+        self.update(variables)
+
+    def __missing__(self, key):
+        match = re.fullmatch(r'py(\d+)', key)
+        if match:
+            return self['py'] == int(match.group(1))
+        return False
+
+
+#: Matches lines ending in a ``# [expression]`` selector
+SELECTOR_RE = re.compile(r'^\s*[^\s#].*?\s*#.*\[([^\[\]]+)\]\s*$')
+
+
+def select_lines(text: str, namespace: SelectorNamespace) -> str:
+    """Remove lines from **text** whose selector is false in **namespace**
+
+    Raises:
+      ValueError if a selector expression cannot be evaluated
+    """
+    selected = {}
+    lines = []
+    for line in text.splitlines():
+        match = SELECTOR_RE.match(line)
+        if match:
+            expr = match.group(1)
+            if expr not in selected:
+                try:
+                    # pylint: disable=eval-used
+                    selected[expr] = bool(eval(expr, {'__builtins__': {}}, namespace))
+                except Exception as exc:  # pylint: disable=broad-except
+                    raise ValueError(f"invalid selector [{expr}]: {exc}") from None
+            if not selected[expr]:
+                continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
 # Patterns of allowed environment variables that are allowed to be passed to
 # conda-build.
 ENV_VAR_WHITELIST = [
@@ -394,10 +508,142 @@ def sandboxed_env(env):
         os.environ.update(orig)
 
 
+class RenderCache:
+    """On-disk cache of results from ``conda_build.api.render``
+
+    Rendering with conda-build is slow and happens again and again
+    for the same recipes (in lint, autobump, update-pinning and
+    build). Entries are keyed by the hash of the recipe files, the
+    contents of the variant config files, the render flags, the
+    target platform and the conda-build version. Each entry is a
+    directory holding the pickled list of ``(MetaData, needs_download,
+    needs_render_in_env)`` tuples. Recipes rendered from text (see
+    `Recipe.conda_render`) are rendered inside that directory, so that
+    the ``MetaData`` objects keep referring to an existing
+    ``meta.yaml``.
+
+    Only renderings without ``finalize`` are cached. Finalized
+    renderings depend on the state of the channels (e.g. the versions
+    resolved for ``pin_compatible``), which the key does not capture.
+
+    ``MetaData`` objects are not reliably picklable. Results that
+    cannot be pickled and restored are therefore not cached (see
+    `store`).
+
+    The cache is enabled by setting the environment variable `ENV`
+    (see `enable`), so that worker processes use it as well.
+
+    Arguments:
+      path: cache directory (created if missing)
+    """
+    #: Environment variable naming the cache directory
+    ENV = 'BIOCONDA_RENDER_CACHE'
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @classmethod
+    def enable(cls, path: str) -> None:
+        """Cache renderings in directory **path** from here on"""
+        os.environ[cls.ENV] = path
+
+    @classmethod
+    def from_env(cls, finalize: bool = False) -> "RenderCache":
+        """Get the cache configured in the environment (or None)
+
+        Args:
+          finalize: Whether the rendering is finalized (never cached)
+        """
+        path = os.environ.get(cls.ENV)
+        return cls(path) if path and not finalize else None
+
+    @staticmethod
+    def read_recipe(recipe: str) -> Dict[str, bytes]:
+        """Read the files of recipe folder (or ``meta.yaml``) **recipe**"""
+        folder = recipe if os.path.isdir(recipe) else os.path.dirname(recipe)
+        files = {}
+        for fname in os.listdir(folder):
+            path = os.path.join(folder, fname)
+            if os.path.isfile(path):
+                with open(path, 'rb') as fdes:
+                    files[fname] = fdes.read()
+        return files
+
+    @staticmethod
+    def get_key(files: Dict[str, bytes], config=None, **flags) -> str:
+        """Compute key for rendering **files** with **config** and **flags**
+
+        Args:
+          files: Maps file names of the recipe to their contents
+          config: The conda-build ``Config`` used
+          flags: Other arguments to ``conda_build.api.render``
+        """
+        digest = hashlib.sha256()
+        digest.update(conda_build.__version__.encode())
+        for fname, data in sorted(files.items()):
+            digest.update(fname.encode())
+            digest.update(hashlib.sha256(data).digest())
+        if config is not None:
+            config_files = (list(getattr(config, 'exclusive_config_files', None) or []) +
+                            list(getattr(config, 'variant_config_files', None) or []))
+            for fname in config_files:
+                digest.update(fname.encode())
+                try:
+                    with open(fname, 'rb') as fdes:
+                        digest.update(hashlib.sha256(fdes.read()).digest())
+                except OSError:
+                    digest.update(b'missing')
+            flags = dict(flags,
+                         subdir=getattr(config, 'subdir', None),
+                         variant=getattr(config, 'variant', None),
+                         channel_urls=getattr(config, 'channel_urls', None))
+        digest.update(json.dumps(flags, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get_dir(self, key: str) -> str:
+        """Get (and create) the directory of entry **key**"""
+        path = os.path.join(self.path, key[:2], key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def load(self, key: str):
+        """Get the rendered metadata stored under **key** (or None)"""
+        try:
+            with open(os.path.join(self.path, key[:2], key, 'render.pkl'), 'rb') as fdes:
+                return pickle.load(fdes)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Ignoring broken render cache entry %s: %s", key, exc)
+            return None
+
+    def store(self, key: str, metas) -> None:
+        """Store the rendered metadata **metas** under **key**
+
+        Nothing is stored unless **metas** can be pickled and restored.
+        """
+        try:
+            data = pickle.dumps(metas, pickle.HIGHEST_PROTOCOL)
+            pickle.loads(data)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Unable to pickle rendered metadata: %s", exc)
+            return
+        try:
+            path = self.get_dir(key)
+            with tempfile.NamedTemporaryFile(dir=path, delete=False) as fdes:
+                fdes.write(data)
+            os.replace(fdes.name, os.path.join(path, 'render.pkl'))
+        except OSError as exc:
+            logger.debug("Unable to write render cache entry %s: %s", key, exc)
+
+
 def load_all_meta(recipe, config=None, finalize=True):
     """
     For each environment, yield the rendered meta.yaml.
 
+    Results are cached if a `RenderCache` is configured and **finalize**
+    is False.
+
     Parameters
     ----------
     finalize : bool
@@ -407,21 +653,33 @@ def load_all_meta(recipe, config=None, finalize=True):
         run_exports). For fast-running tasks like linting, set to False.
     """
     if config is None:
-        config = load_conda_build_config()
+        config = RenderPool.build_config()
     # `bypass_env_check=True` prevents evaluating (=environment solving) the
     # package versions used for `pin_compatible` and the like.
     # To avoid adding a separate `bypass_env_check` alongside every `finalize`
     # parameter, just assume we always want to bypass if `finalize is True`.
     bypass_env_check = (not finalize)
-    return [meta for (meta, _, _) in api.render(recipe,
-                                                config=config,
-                                                finalize=finalize,
-                                                bypass_env_check=bypass_env_check,
-                                                )]
-
-
-
-def load_meta_fast(recipe: str, env=None):
+    cache = RenderCache.from_env(finalize)
+    metas = None
+    if cache is not None:
+        # (the MetaData objects refer to the recipe location)
+        key = cache.get_key(RenderCache.read_recipe(recipe), config,
+                            recipe=os.path.abspath(recipe), finalize=finalize,
+                            bypass_env_check=bypass_env_check)
+        metas = cache.load(key)
+    if metas is None:
+        metas = api.render(recipe,
+                           config=config,
+                           finalize=finalize,
+                           bypass_env_check=bypass_env_check,
+                           )
+        if cache is not None:
+            cache.store(key, metas)
+    return [meta for (meta, _, _) in metas]
+
+
+
+def load_meta_fast(recipe: str, env=None, platform=None):
     """
     Given a package name, find the current meta.yaml file, parse it, and return
     the dict.
@@ -429,6 +687,8 @@ def load_meta_fast(recipe: str, env=None):
     Args:
       recipe: Path to recipe (directory containing the meta.yaml file)
       env: Optional variables to expand
+      platform: If given, remove lines with ``# [expression]`` selectors
+                false for this platform (see `SelectorNamespace`)
 
     Returns:
       Tuple of original recipe string and rendered dict
@@ -439,12 +699,43 @@ def load_meta_fast(recipe: str, env=None):
     try:
         pth = os.path.join(recipe, 'meta.yaml')
         template = jinja_silent_undef.from_string(open(pth, 'r', encoding='utf-8').read())
-        meta = yaml.safe_load(template.render(env))
+        text = template.render(env)
+        if platform:
+            text = select_lines(text, SelectorNamespace(platform))
+        meta = yaml.safe_load(text)
         return (meta, recipe)
     except Exception:
         raise ValueError('Problem inspecting {0}'.format(recipe))
 
 
+def get_recipe_version(recipe: str, platform: str = None) -> Optional[str]:
+    """Get the version of a recipe without rendering it with conda-build
+
+    The ``meta.yaml`` is rendered with Jinja2 and the selectors for
+    **platform** are applied as in `load_meta_fast`.
+
+    Args:
+      recipe: Path to recipe (directory containing the meta.yaml file)
+      platform: If given, remove lines with selectors false for this platform
+
+    Returns:
+      The version or None if it cannot be determined statically (e.g.
+      because it depends on variables defined only by conda-build)
+    """
+    try:
+        with open(os.path.join(recipe, 'meta.yaml'), encoding='utf-8') as fdes:
+            text = jinja_marked_undef.from_string(fdes.read()).render()
+        if platform:
+            text = select_lines(text, SelectorNamespace(platform))
+        # BaseLoader keeps scalars as written (``1.10`` is not a float)
+        version = yaml.load(text, Loader=yaml.BaseLoader)['package']['version']
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if not version or not isinstance(version, str) or JinjaMarkedUndefined.MARKER in version:
+        return None
+    return version
+
+
 def load_conda_build_config(platform=None, trim_skip=True):
     """
     Load conda build config while considering global pinnings from conda-forge.
@@ -478,7 +769,7 @@ CondaBuildConfigFile = namedtuple('CondaBuildConfigFile', (
 
 def get_conda_build_config_files(config=None):
     if config is None:
-        config = load_conda_build_config()
+        config = RenderPool.build_config()
     # TODO: open PR upstream for conda-build to support multiple exclusive_config_files
     for file_path in (config.exclusive_config_files or []):
         yield CondaBuildConfigFile('-e', file_path)
@@ -755,23 +1046,445 @@ def threads_to_use():
     return min(_max_threads, cores)
 
 
+class RenderPool:
+    """Long-lived pool of worker processes prepared for conda-build
+
+    Starting a fresh process pool for each batch of work, and loading
+    the conda-build config (which looks up the environment and checks
+    the variant config files) for each rendering adds up to a
+    significant share of the time spent when processing all
+    recipes. This class holds a single `ProcessPoolExecutor`, shared
+    by `parallel_iter`, `AsyncPipeline.run_sp` and the build, whose
+    workers load the conda-build config once on startup (see
+    `build_config`).
+
+    The workers are forked with the environment of this process. As
+    caches are configured via the environment (e.g. by
+    `RepoData.share`), the pool is restarted if one of `ENV_VARS`
+    changed since its workers were started. The restart is deferred
+    until no work submitted to the pool is pending.
+    """
+    #: Environment variables read by the workers (`RenderCache.ENV`,
+    #: `RepoData.SHARED_CACHE_ENV` and `Recipe.CACHE_ENV`)
+    ENV_VARS = (RenderCache.ENV, 'BIOCONDA_REPODATA_CACHE', 'BIOCONDA_RECIPE_CACHE')
+
+    _executor: ProcessPoolExecutor = None
+    _environ: Dict[str, Optional[str]] = None
+    _lock = Lock()
+    _pending: Set[Future] = set()
+    _build_configs: Dict[str, Any] = {}
+
+    @classmethod
+    def get(cls) -> ProcessPoolExecutor:
+        """Get the executor, starting it if needed"""
+        with cls._lock:
+            environ = {name: os.environ.get(name) for name in cls.ENV_VARS}
+            if cls._executor is not None and cls._environ != environ:
+                if cls._pending:
+                    logger.debug("Deferring restart of render pool while work is pending")
+                    return cls._executor
+                logger.debug("Restarting render pool to pick up changed environment")
+                cls._executor.shutdown()
+                cls._executor = None
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(threads_to_use(),
+                                                    initializer=cls._init_worker)
+                cls._environ = environ
+            return cls._executor
+
+    @classmethod
+    def shutdown(cls, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=wait)
+                cls._executor = None
+
+    @classmethod
+    def submit(cls, func, *args, **kwargs) -> Future:
+        """Schedule **func** to be run in a worker, returning a future"""
+        future = cls.get().submit(func, *args, **kwargs)
+        cls._pending.add(future)
+        future.add_done_callback(cls._pending.discard)
+        return future
+
+    @classmethod
+    def map(cls, func, items: Sequence) -> Iterable:
+        """Apply **func** to **items** in the workers, yielding results in order"""
+        items = list(items)
+        chunksize, extra = divmod(len(items), threads_to_use() * 4)
+        if extra or not chunksize:
+            chunksize += 1
+        futures = [cls.submit(_apply_chunk, func, items[start:start + chunksize])
+                   for start in range(0, len(items), chunksize)]
+        return (result for future in futures for result in future.result())
+
+    @classmethod
+    def imap(cls, func, items: Iterable, chunksize: int = 16, window: int = None,
+             ordered: bool = False) -> Iterator:
+        """Apply **func** to **items** in the workers, yielding results as completed
+
+        In contrast to `map`, **items** are consumed lazily and at most
+        **window** chunks of **chunksize** items are in flight at any
+        time (default: four per worker). Memory use and the amount of
+        data in transit between the processes therefore do not grow
+        with the number of items.
+
+        Args:
+          chunksize: number of items sent to a worker at once
+          window: maximum number of chunks submitted to the workers
+          ordered: yield results in the order of **items** instead
+        """
+        if window is None:
+            window = threads_to_use() * 4
+        items = iter(items)
+        pending: deque = deque()
+
+        def submit() -> bool:
+            chunk = list(islice(items, chunksize))
+            if chunk:
+                pending.append(cls.submit(_apply_chunk, func, chunk))
+            return bool(chunk)
+
+        try:
+            while len(pending) < window and submit():
+                pass
+            while pending:
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done = [future for future in pending if future in finished]
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    submit()  # keep the workers busy while the results are consumed
+                    yield from future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @classmethod
+    def build_config(cls, platform: str = None):
+        """Get the conda-build config for **platform**
+
+        The config is loaded with `load_conda_build_config` once per
+        process and then reused. Pass a config of your own to
+        conda-build if you need to modify it.
+        """
+        if platform not in cls._build_configs:
+            cls._build_configs[platform] = load_conda_build_config(platform=platform)
+        return cls._build_configs[platform]
+
+    @classmethod
+    def _init_worker(cls) -> None:
+        try:
+            cls.build_config()
+        except Exception as exc:  # pylint: disable=broad-except
+            # report when the config is needed
+            logger.debug("Failed to load conda-build config in worker: %s", exc)
+
+
+def _apply_chunk(func, chunk: List) -> List:
+    """Applies **func** to the items of **chunk** (see `RenderPool.imap`)"""
+    return [func(item) for item in chunk]
+
+
 def parallel_iter(func, items, desc, *args, **kwargs):
+    """Yields **func** applied to each of **items** (in order)
+
+    Runs in the worker processes of the `RenderPool`.
+    """
     pfunc = partial(func, *args, **kwargs)
-    with Pool(threads_to_use()) as pool:
-        yield from tqdm(
-            pool.imap_unordered(pfunc, items),
-            desc=desc,
-            total=len(items)
-        )
+    yield from tqdm(
+        RenderPool.map(pfunc, items),
+        desc=desc,
+        total=len(items)
+    )
+
+
+
+
+#: Environment variable overriding the directory for caches kept across runs
+CACHE_DIR_ENV = 'BIOCONDA_UTILS_CACHE_DIR'
+
+
+def get_cache_dir() -> str:
+    """Get the directory for caches kept across runs
+
+    This is the directory given by `CACHE_DIR_ENV` or ``bioconda-utils``
+    in the per-user cache directory (``$XDG_CACHE_HOME``, default
+    ``~/.cache``).
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME')
+                                 or os.path.join(os.path.expanduser('~'), '.cache'),
+                                 'bioconda-utils')
+    return cache_dir
+
+
+def get_recipe_cache_path(recipe_folder: str, fname: str) -> str:
+    """Get the path of cache file **fname** for **recipe_folder**
+
+    Caches are kept in the directory given by `get_cache_dir`, never in
+    the recipe repository itself. Each recipe folder gets a
+    sub-directory keyed by its absolute path.
+    """
+    folder = os.path.abspath(recipe_folder)
+    key = hashlib.sha256(folder.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(get_cache_dir(), 'recipes', f'{os.path.basename(folder)}-{key}', fname)
 
 
+def make_private_dir(path: str) -> str:
+    """Create directory **path** accessible only by the current user
+
+    Data read from the directory is trusted, so an existing directory
+    (which may have been created by someone else, e.g. in ``/tmp``)
+    is used only if owned by the current user. Its permissions are
+    then restricted to the owner.
+
+    Returns:
+      The path
+    Raises:
+      PermissionError: if **path** is not a directory owned by the
+        current user
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Refusing to use {path}: not a directory owned by "
+                              "the current user")
+    if S_IMODE(info.st_mode) != 0o700:
+        os.chmod(path, 0o700)
+    return path
+
+
+class RecipeManifest:
+    """Index of the recipes in a recipe folder, revalidated with ``stat`` calls
+
+    Walking the recipe tree on each call to `get_recipes` lists every
+    directory. The manifest instead records for each directory its
+    modification time and sub-directories. As adding or removing an
+    entry changes the modification time of a directory, only
+    directories with a changed time need to be listed again (with
+    ``os.scandir``).
+
+    For each recipe, the manifest also records size, modification time
+    and hash of its ``meta.yaml`` (see `check_files`), so that only
+    recipes that actually changed need to be parsed again.
+
+    The manifest is saved in the cache directory (see
+    `get_recipe_cache_path`) and kept in memory for the lifetime of the
+    process (see `get`).
+
+    Arguments:
+      recipe_folder: Top-level dir of the recipes
+    """
+    #: Name of manifest file (see `get_recipe_cache_path`)
+    FNAME = 'manifest.json'
+
+    #: Format version of the manifest file
+    VERSION = 1
+
+    #: Entries changed less than this many nanoseconds before they
+    #: were recorded are checked again (file system time stamps may be
+    #: coarse)
+    RACY_NS = 2 * 10**9
+
+    _instances: Dict[str, "RecipeManifest"] = {}
+
+    def __init__(self, recipe_folder: str) -> None:
+        self.recipe_folder = recipe_folder
+        self.path = get_recipe_cache_path(recipe_folder, self.FNAME)
+        #: Maps directories (relative to the recipe folder) to their
+        #: time, sub-directories and whether they contain a ``meta.yaml``
+        self.dirs: Dict[str, List] = {}
+        #: Maps recipe directories to time, size and hash of ``meta.yaml``
+        self.files: Dict[str, List] = {}
+        #: Sorted recipe directories (relative to the recipe folder)
+        self.recipes: List[str] = []
+        # when dirs and files were recorded
+        self._time = 0
+        self._files_time = 0
+        self._load()
+
+    @classmethod
+    def get(cls, recipe_folder: str) -> "RecipeManifest":
+        """Get the revalidated manifest for **recipe_folder**"""
+        if recipe_folder not in cls._instances:
+            cls._instances[recipe_folder] = cls(recipe_folder)
+        manifest = cls._instances[recipe_folder]
+        manifest.update()
+        return manifest
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as fdes:
+                data = json.load(fdes)
+            if data['version'] == self.VERSION:
+                self.dirs = data['dirs']
+                self.files = data['files']
+                self._time, self._files_time = data['time']
+        except FileNotFoundError:
+            pass
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Ignoring broken recipe manifest %s: %s", self.path, exc)
+
+    def save(self) -> None:
+        """Write the manifest to disk"""
+        data = {'version': self.VERSION, 'time': [self._time, self._files_time],
+                'dirs': self.dirs, 'files': self.files}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(self.path),
+                                             delete=False) as fdes:
+                json.dump(data, fdes)
+            os.replace(fdes.name, self.path)
+        except OSError as exc:
+            logger.debug("Unable to write recipe manifest %s: %s", self.path, exc)
+
+    def update(self) -> None:
+        """Revalidate the list of recipes, saving the manifest if it changed"""
+        scan_time = time.time_ns()
+        trusted = self._time - self.RACY_NS
+        prefix = os.path.join(self.recipe_folder, '')
+        old_dirs = self.dirs
+        dirs: Dict[str, List] = {}
+        racy = modified = False
+        stack = ['']
+        while stack:
+            reldir = stack.pop()
+            path = prefix + reldir
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            entry = old_dirs.get(reldir)
+            if entry is not None and entry[0] == mtime and mtime >= trusted:
+                racy = True
+                entry = None
+            if entry is None or entry[0] != mtime:
+                subdirs, has_meta = [], False
+                try:
+                    with os.scandir(path) as entries:
+                        for item in entries:
+                            if item.name.startswith('.'):
+                                continue
+                            # like `os.walk`, follow only the top level symlinks
+                            if item.is_dir(follow_symlinks=not reldir):
+                                subdirs.append(item.name)
+                            elif item.name == 'meta.yaml':
+                                has_meta = True
+                except OSError:
+                    continue
+                new_entry = [mtime, sorted(subdirs), has_meta]
+                modified |= new_entry != old_dirs.get(reldir)
+                entry = new_entry
+            dirs[reldir] = entry
+            subprefix = reldir + '/' if reldir else ''
+            stack.extend(subprefix + subdir for subdir in entry[1])
+
+        self.recipes = sorted(reldir for reldir, entry in dirs.items() if entry[2])
+        if racy or modified or len(dirs) != len(old_dirs):
+            # also re-save to trust entries recorded too early before
+            self.dirs = dirs
+            self._time = scan_time
+            self.save()
+
+    def check_files(self) -> Tuple[Set[str], Set[str]]:
+        """Check for recipes changed since the manifest was last saved
+
+        Only ``meta.yaml`` files with changed size or modification
+        time are read again to compare their hash.
+
+        Returns:
+          Sets of recipe directories added or modified and of those removed
+        """
+        self.update()
+        scan_time = time.time_ns()
+        trusted = self._files_time - self.RACY_NS
+        prefix = os.path.join(self.recipe_folder, '')
+        files: Dict[str, List] = {}
+        changed = set()
+        racy = False
+        for reldir in self.recipes:
+            path = prefix + reldir + '/meta.yaml'
+            entry = self.files.get(reldir)
+            try:
+                stat = os.stat(path)
+                if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size \
+                   or stat.st_mtime_ns >= trusted:
+                    racy |= entry is not None and entry[0] == stat.st_mtime_ns
+                    with open(path, 'rb') as fdes:
+                        digest = hashlib.sha256(fdes.read()).hexdigest()
+                    if entry is None or entry[2] != digest:
+                        changed.add(reldir)
+                    entry = [stat.st_mtime_ns, stat.st_size, digest]
+            except OSError:
+                continue
+            files[reldir] = entry
+        removed = set(self.files) - set(files)
+        if racy or changed or removed or files != self.files:
+            self.files = files
+            self._files_time = scan_time
+            self.save()
+        return changed, removed
+
+    def get_recipes(self, package="*", exclude=None) -> List[str]:
+        """Get paths to the recipes matching **package** and not **exclude**
+
+        See `get_recipes`.
+        """
+        if isinstance(package, str):
+            package = [package]
+        if isinstance(exclude, str):
+            exclude = [exclude]
+        if not package:
+            return []
+        pattern = compile_recipe_globs(tuple(package), tuple(exclude or []))
+        prefix = os.path.join(self.recipe_folder, '')
+        return [prefix + reldir
+                for reldir in self.recipes
+                if pattern.match('/' + reldir)]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate glob **pattern** with wildcards not matching ``/`` (like `glob.glob`)"""
+    parts = []
+    for part in re.split(r'(\*|\?|\[[^\]]+\])', pattern.strip('/')):
+        if part == '*':
+            parts.append('[^/]*')
+        elif part == '?':
+            parts.append('[^/]')
+        elif part.startswith('[') and len(part) > 2:
+            parts.append('[^' + part[2:] if part[1] == '!' else part)
+        else:
+            parts.append(re.escape(part))
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=64)
+def compile_recipe_globs(package: Tuple[str, ...], exclude: Tuple[str, ...]) -> Pattern:
+    """Compile include and exclude globs into a single regex
+
+    The regex matches the path of a recipe relative to the recipe
+    folder (prefixed with ``/``) if it is in or below a folder matching
+    one of the **package** globs and does not match one of the
+    **exclude** patterns (using `fnmatch`).
+    """
+    regex = '/(?:{})(?:/.*)?\\Z'.format('|'.join(_glob_to_regex(pat) for pat in package))
+    if exclude:
+        regex = '(?!{})'.format('|'.join(fnmatch.translate(pat) for pat in exclude)) + regex
+    return re.compile(regex, re.DOTALL)
 
 
 def get_recipes(recipe_folder, package="*", exclude=None):
     """
     Generator of recipes.
 
-    Finds (possibly nested) directories containing a ``meta.yaml`` file.
+    Finds (possibly nested) directories containing a ``meta.yaml`` file
+    using the `RecipeManifest`.
 
     Parameters
     ----------
@@ -780,23 +1493,12 @@ def get_recipes(recipe_folder, package="*", exclude=None):
 
     package : str or iterable
         Pattern or patterns to restrict the results.
+
+    exclude : str or iterable
+        Patterns of recipes to skip (matched against the path of the
+        recipe within **recipe_folder** with leading ``/``).
     """
-    if isinstance(package, str):
-        package = [package]
-    if isinstance(exclude, str):
-        exclude = [exclude]
-    if exclude is None:
-        exclude = []
-    for p in package:
-        logger.debug("get_recipes(%s, package='%s'): %s",
-                     recipe_folder, package, p)
-        path = os.path.join(recipe_folder, p)
-        for new_dir in glob.glob(path):
-            for dir_path, dir_names, file_names in os.walk(new_dir):
-                if any(fnmatch.fnmatch(dir_path[len(recipe_folder):], pat) for pat in exclude):
-                    continue
-                if "meta.yaml" in file_names:
-                    yield dir_path
+    yield from RecipeManifest.get(recipe_folder).get_recipes(package, exclude)
 
 
 def get_latest_recipes(recipe_folder, config, package="*"):
@@ -821,7 +1523,20 @@ def get_latest_recipes(recipe_folder, config, package="*"):
         return x.replace(
             recipe_folder, '').strip(os.path.sep).split(os.path.sep)[0]
 
+    def get_version(path):
+        version = get_recipe_version(path, platform)
+        if version is not None:
+            try:
+                return VersionOrder(version)
+            except Exception:  # pylint: disable=broad-except
+                pass
+        # fall back to rendering with conda-build
+        meta_path = os.path.join(path, 'meta.yaml')
+        meta = load_first_metadata(meta_path, finalize=False)
+        return VersionOrder(meta.get_value('package/version'))
+
     config = load_config(config)
+    platform = get_build_platform()
     recipes = sorted(get_recipes(recipe_folder, package), key=toplevel)
 
     for package, group in groupby(recipes, key=toplevel):
@@ -829,14 +1544,8 @@ def get_latest_recipes(recipe_folder, config, package="*"):
         if len(group) == 1:
             yield group[0]
         else:
-            def get_version(p):
-                meta_path = os.path.join(p, 'meta.yaml')
-                meta = load_first_metadata(meta_path, finalize=False)
-                version = meta.get_value('package/version')
-                return VersionOrder(version)
-            sorted_versions = sorted(group, key=get_version)
-            if sorted_versions:
-                yield sorted_versions[-1]
+            # last of the recipes with the highest version
+            yield max(reversed(group), key=get_version)
 
 
 class DivergentBuildsError(Exception):
@@ -869,7 +1578,7 @@ def built_package_paths(recipe):
     Does not necessarily exist; equivalent to ``conda build --output recipename``
     but without the subprocess.
     """
-    config = load_conda_build_config()
+    config = RenderPool.build_config()
     # NB: Setting bypass_env_check disables ``pin_compatible`` parsing, which
     #     these days does not change the package build string, so should be fine.
     paths = api.get_output_file_paths(recipe, config=config, bypass_env_check=True)
@@ -976,16 +1685,21 @@ def changed_since_master(recipe_folder):
     ]
 
 
-def _load_platform_metas(recipe, finalize=True):
-    # check if package is noarch, if so, build only on linux
+def get_build_platform():
+    """Returns the platform we are building for (``linux`` or ``osx``)"""
     # with temp_os, we can fool the MetaData if needed.
     platform = os.environ.get('OSTYPE', sys.platform)
     if platform.startswith("darwin"):
         platform = 'osx'
     elif platform == "linux-gnu":
         platform = "linux"
+    return platform
+
 
-    config = load_conda_build_config(platform=platform)
+def _load_platform_metas(recipe, finalize=True):
+    # check if package is noarch, if so, build only on linux
+    platform = get_build_platform()
+    config = RenderPool.build_config(platform)
     return platform, load_all_meta(recipe, config=config, finalize=finalize)
 
 
@@ -995,23 +1709,33 @@ def _meta_subdir(meta):
 
 
 
-def check_recipe_skippable(recipe, check_channels):
+def check_recipe_skippable(recipe, check_channels, package_data=None):
     """
     Return True if the same number of builds (per subdir) defined by the recipe
     are already in channel_packages.
+
+    Args:
+      recipe: Path to recipe
+      check_channels: Channels to look for existing builds in
+      package_data: Precomputed result of `RepoData.get_package_data_bulk`
+        with key ``subdir`` for ``check_channels`` and ``native=True``
+        (e.g. for many recipes at once). Packages of this recipe missing
+        from it are queried here.
     """
     platform, metas = _load_platform_metas(recipe, finalize=False)
     packages =  set(
         (meta.name(), meta.version(), int(meta.build_number() or 0))
         for meta in metas
     )
-    r = RepoData()
+    missing = packages.difference(package_data or ())
+    if missing:
+        package_data = dict(package_data or {})
+        package_data.update(RepoData().get_package_data_bulk(
+            missing, "subdir", channels=check_channels, native=True))
     num_existing_pkg_builds = Counter(
         (name, version, build_number, subdir)
         for name, version, build_number in packages
-        for subdir in r.get_package_data("subdir", name=name, version=version,
-                                         build_number=build_number,
-                                         channels=check_channels, native=True)
+        for subdir in package_data.get((name, version, build_number), [])
     )
     if num_existing_pkg_builds == Counter():
         # No packages with same version + build num in channels: no need to skip
@@ -1034,14 +1758,12 @@ def _filter_existing_packages(metas, check_channels):
         pkg_build = (_meta_subdir(meta), meta.build_id())
         key_build_meta[pkg_key][pkg_build] = meta
 
-    r = RepoData()
+    package_data = RepoData().get_package_data_bulk(key_build_meta.keys(),
+                                                    ['subdir', 'build'],
+                                                    channels=check_channels,
+                                                    native=True)
     for pkg_key, build_meta in key_build_meta.items():
-        existing_pkg_builds = set(r.get_package_data(['subdir', 'build'],
-                                                     name=pkg_key[0],
-                                                     version=pkg_key[1],
-                                                     build_number=pkg_key[2],
-                                                     channels=check_channels,
-                                                     native=True))
+        existing_pkg_builds = set(package_data[pkg_key])
         for pkg_build, meta in build_meta.items():
             if pkg_build not in existing_pkg_builds:
                 new_metas.append(meta)
@@ -1053,9 +1775,11 @@ def _filter_existing_packages(metas, check_channels):
     return new_metas, existing_metas, divergent_builds
 
 
-def get_package_paths(recipe, check_channels, force=False):
+def get_package_paths(recipe, check_channels, force=False, skippable=None):
     if not force:
-        if check_recipe_skippable(recipe, check_channels):
+        if skippable is None:
+            skippable = check_recipe_skippable(recipe, check_channels)
+        if skippable:
             # NB: If we skip early here, we don't detect possible divergent builds.
             logger.info(
                 'FILTER: not building recipe %s because '
@@ -1211,7 +1935,7 @@ class AsyncRequests:
     CONNECTIONS_PER_HOST = 4
 
     @classmethod
-    def fetch(cls, urls, descs, cb, datas):
+    def fetch(cls, urls, descs, cb, datas, headers=None, fds=None):
         """Fetch data from URLs.
 
         This will use asyncio to manage a pool of connections at once, speeding
@@ -1224,6 +1948,13 @@ class AsyncRequests:
           descs: Matching list of descriptions (for progress display)
           cb: As each download is completed, data is passed through this function.
               Use to e.g. offload json parsing into download loop.
+          headers: Matching list of dicts with additional request headers
+              (e.g. for conditional requests). If given, **cb** is passed the
+              response headers as third argument, and `None` instead of the
+              data if the server replied with ``304 Not Modified``.
+          fds: Matching list of file like objects. If given, the data is
+              passed to their ``write`` method as it arrives instead of
+              to **cb** (e.g. for incremental parsing).
         """
         try:
             loop = asyncio.get_event_loop()
@@ -1236,10 +1967,11 @@ class AsyncRequests:
             # Workaround the fact that asyncio's loop is marked as not-reentrant
             # (it is apparently easy to patch, but not desired by the devs,
             with ThreadPool(1) as pool:
-                res = pool.apply(cls.fetch, (urls, descs, cb, datas))
+                res = pool.apply(cls.fetch, (urls, descs, cb, datas, headers, fds))
             return res
 
-        task = asyncio.ensure_future(cls.async_fetch(urls, descs, cb, datas))
+        task = asyncio.ensure_future(cls.async_fetch(urls, descs, cb, datas, fds,
+                                                     headers=headers))
 
         try:
             loop.run_until_complete(task)
@@ -1251,21 +1983,25 @@ class AsyncRequests:
         return task.result()
 
     @classmethod
-    async def async_fetch(cls, urls, descs=None, cb=None, datas=None, fds=None):
+    async def async_fetch(cls, urls, descs=None, cb=None, datas=None, fds=None,
+                          headers=None):
         if descs is None:
             descs = []
         if datas is None:
             datas = []
         if fds is None:
             fds = []
+        if headers is None:
+            headers = []
         conn = aiohttp.TCPConnector(limit_per_host=cls.CONNECTIONS_PER_HOST)
         async with aiohttp.ClientSession(
                 connector=conn,
                 headers={'User-Agent': cls.USER_AGENT}
         ) as session:
             coros = [
-                asyncio.ensure_future(cls._async_fetch_one(session, url, desc, cb, data, fd))
-                for url, desc, data, fd in zip_longest(urls, descs, datas, fds)
+                asyncio.ensure_future(cls._async_fetch_one(session, url, desc, cb, data, fd,
+                                                           hdrs))
+                for url, desc, data, fd, hdrs in zip_longest(urls, descs, datas, fds, headers)
             ]
             with tqdm(asyncio.as_completed(coros),
                       total=len(coros),
@@ -1276,10 +2012,15 @@ class AsyncRequests:
     @staticmethod
     @backoff.on_exception(backoff.fibo, aiohttp.ClientResponseError, max_tries=20,
                           giveup=lambda ex: ex.code not in [429, 502, 503, 504])
-    async def _async_fetch_one(session, url, desc, cb=None, data=None, fd=None):
+    async def _async_fetch_one(session, url, desc, cb=None, data=None, fd=None,
+                               headers=None):
         result = []
-        async with session.get(url, timeout=None) as resp:
+        async with session.get(url, timeout=None, headers=headers) as resp:
             resp.raise_for_status()
+            if headers is not None:
+                resp_headers = resp.headers
+                if resp.status == 304:
+                    return cb(None, data, resp_headers) if cb else None
             size = int(resp.headers.get("Content-Length", 0))
             with tqdm(total=size, unit='B', unit_scale=True, unit_divisor=1024,
                       desc=desc, miniters=1,
@@ -1295,16 +2036,35 @@ class AsyncRequests:
                     else:
                         result.append(block)
         if cb:
+            if headers is not None:
+                return cb(b"".join(result), data, resp_headers)
             return cb(b"".join(result), data)
         else:
             return b"".join(result)
 
 
+#: Dependencies of the package files in `RepoData` in compressed sparse
+#: row layout. The dependencies of row ``i`` of the frame are the
+#: ``specs[edges[offsets[i]:offsets[i+1]]]``, with each spec a tuple of
+#: package name and version constraint. ``names`` maps the package names
+#: required to ids, and the rows requiring a name with id ``n`` are
+#: ``rev_rows[rev_offsets[n]:rev_offsets[n+1]]``.
+DependsIndex = namedtuple('DependsIndex', ['offsets', 'edges', 'specs', 'names',
+                                           'rev_offsets', 'rev_rows'])
+
+
+def _remove_owned_dir(path, pid):
+    """Remove **path** unless called in a process other than **pid**"""
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
 class RepoData:
     """Singleton providing access to package directory on anaconda cloud
 
-    If the first call provides a filename as **cache** argument, the
-    file is used to cache the directory in CSV format.
+    If a directory is set using `set_cache` before first use, it is
+    used to cache the package directory in the columnar format
+    implemented in `repodata`.
 
     Data structure:
 
@@ -1314,6 +2074,9 @@ class RepoData:
     for Bioconda. (Technically ``(noarch|(linux|osx|win)-(64|32))``
     appears to be the schema).
 
+    Packages can also be published under a **label** within a channel.
+    These are addressed by using ``channel/label/name`` as channel.
+
     For **channel/subdir** (aka **channel/platform**) combination, a
     **repodata.json** contains a **package** key describing each
     package file with at least the following information:
@@ -1328,8 +2091,9 @@ class RepoData:
       number. Used to distinguish different builds of the same
       package/version combination.
 
-    depends: Runtime requirements for package as list of strings. We
-      do not currently load this.
+    depends: Runtime requirements for package as list of strings. Split
+      into package name and constraint on demand (see `get_depends`
+      and `get_dependents`).
 
     arch: Architecture key (x86_64). Not used by conda and not loaded
       here.
@@ -1338,6 +2102,21 @@ class RepoData:
       upstream, not used by conda. We generate this from the subdir
       information to have it available.
 
+    filename: The key of the package in **packages**. We use this to
+      update the loaded data when only some packages changed.
+
+    The **channel/platform** slices are loaded on demand. Queries
+    restricted to some channels or platforms only load those (see
+    `_get_data`). Others load all `channels` for the default
+    `platforms`. Platforms not in `platforms`, such as
+    ``linux-aarch64``, are loaded only if a query asks for them.
+
+    Internally, all strings are stored as integer codes into one
+    table shared by all columns, channels and subdirs (see
+    `_pack_frame`). The **depends** of all package files are kept in
+    one flat array of codes (`_depends`). Strings are only created for
+    the values returned by queries.
+
 
     Repodata versions:
 
@@ -1360,19 +2139,59 @@ class RepoData:
 
     _load_columns = ['build', 'build_number', 'name', 'version', 'depends']
 
-    #: Columns available in internal dataframe
-    columns = _load_columns + ['channel', 'subdir', 'platform']
-    #: Platforms loaded
+    #: Columns available in queries
+    columns = _load_columns + ['channel', 'subdir', 'platform', 'filename']
+    #: Platforms loaded if a query does not select platforms
     platforms = ['linux', 'osx', 'noarch']
+    #: Maps supported platforms to their subdir
+    PLATFORM_SUBDIRS = {
+        'linux': 'linux-64',
+        'osx': 'osx-64',
+        'noarch': 'noarch',
+        'linux-aarch64': 'linux-aarch64',
+        'osx-arm64': 'osx-arm64',
+    }
     # config object
     config = None
 
     cache_file = None
     _df = None
     _df_ts = None
+    #: Codes of the ``depends`` of all rows of `_df`. For each row, the
+    #: range in this array is given by its ``depends_start`` and
+    #: ``depends_stop`` columns.
+    _depends = None
+    #: Tuple of `_df` and the `repodata.StringTable` its string columns
+    #: and `_depends` hold codes into (see `_get_data`)
+    _strings = None
+    #: Tuple of frame, frame sorted by name and its names (see `_get_name_index`)
+    _name_index = None
+    #: Tuple of sorted frame and its `DependsIndex` (see `_get_depends_index`)
+    _depends_index = None
+    #: Maps ``channel/platform`` to the HTTP validators (ETag and
+    #: Last-Modified) of the repodata from which `_df` was loaded.
+    #: The keys are the slices loaded so far.
+    _sources = {}
 
     #: default lifetime for repodata cache
     cache_timeout = 60*60*8
+    #: reload expired data in the background (see `set_timeout`)
+    background_refresh = False
+    #: minimum seconds between background refresh attempts
+    REFRESH_RETRY = 60
+    #: protects `_df`, `_depends` and `_strings` against concurrent replacement
+    _swap_lock = Lock()
+    #: serializes loads, so that slices loaded concurrently are not lost
+    _load_lock = Lock()
+    _refresh_thread = None
+    _refresh_started = None
+    _refresh_duration = None
+    _refresh_count = 0
+    _refresh_errors = 0
+
+    #: Environment variable naming a cache directory shared between
+    #: processes (see `share`). Used if no cache was set with `set_cache`.
+    SHARED_CACHE_ENV = 'BIOCONDA_REPODATA_CACHE'
 
     @classmethod
     def register_config(cls, config):
@@ -1385,6 +2204,7 @@ class RepoData:
             assert RepoData.config is not None, ("bug: ensure to load config "
                                                  "before instantiating RepoData.")
             RepoData.__instance = object.__new__(cls)
+            RepoData.__instance.cache_file = os.environ.get(cls.SHARED_CACHE_ENV)
         return RepoData.__instance
 
     def set_cache(self, cache):
@@ -1393,9 +2213,83 @@ class RepoData:
         else:
             self.cache_file = cache
 
-    def set_timeout(self, timeout):
-        """Set the timeout after which the repodata should be reloaded"""
+    def share(self, path=None):
+        """Share the repodata with processes started from here on
+
+        Loads the repodata into a cache directory and exports its
+        location in the environment variable `SHARED_CACHE_ENV`. The
+        workers of process pools (or any other child processes) then
+        load the same cache instead of each downloading and parsing
+        the repodata. All columns, the depends and the string table
+        are memory mapped and shared. Strings are decoded only as
+        queries need them (see `_read_cache`). The frame of this process
+        is switched to the cache as well, so that forked workers share
+        its pages.
+
+        Workers refresh the cache like any other process once it is
+        older than the timeout. The cache is replaced atomically (see
+        `repodata.save_frame`), so other processes continue to use the
+        old data until their own copy expires.
+
+        Args:
+          path: Directory to use if no cache was set with `set_cache`.
+            Defaults to a temporary directory removed at exit.
+
+        Returns:
+          The cache directory
+        """
+        if self.cache_file is None:
+            if path is None:
+                tmpdir = tempfile.mkdtemp(prefix="bioconda-repodata-")
+                atexit.register(_remove_owned_dir, tmpdir, os.getpid())
+                path = os.path.join(tmpdir, "RepoDataCache")
+            self.cache_file = path
+        df, depends, table = self._get_data()  # (re)load if needed, updating the cache
+        if table is not None and not os.path.exists(self.cache_file):
+            self._save_cache(df, depends, table, self._sources)
+        df, depends, table = self._read_cache(repodata.ColumnarCache(self.cache_file))
+        with self._swap_lock:
+            self._df, self._depends, self._strings = df, depends, (df, table)
+        os.environ[self.SHARED_CACHE_ENV] = self.cache_file
+        return self.cache_file
+
+    def set_timeout(self, timeout, background=False):
+        """Set the timeout after which the repodata should be reloaded
+
+        Args:
+          timeout: Maximum age of the data in seconds
+          background: If set, expired data continues to be served while
+            it is reloaded in a background thread. The new data replaces
+            the old once it has been loaded completely. Use this in long
+            running processes that should not stall while reloading.
+        """
         self.cache_timeout = timeout
+        self.background_refresh = background
+
+    def get_age(self):
+        """Get the age of the loaded data in seconds (`None` if not loaded)"""
+        if self._df_ts is None:
+            return None
+        return (datetime.datetime.now() - self._df_ts).total_seconds()
+
+    def get_metrics(self):
+        """Get metrics describing the state of the loaded data
+
+        Returns:
+          Dictionary with the keys ``age`` (see `get_age`),
+          ``refreshing`` (whether a background refresh is running),
+          ``last_refresh_duration`` (seconds taken by the last load),
+          ``refresh_count`` (number of completed loads) and
+          ``refresh_errors`` (number of failed background refreshes).
+        """
+        thread = self._refresh_thread
+        return {
+            'age': self.get_age(),
+            'refreshing': thread is not None and thread.is_alive(),
+            'last_refresh_duration': self._refresh_duration,
+            'refresh_count': self._refresh_count,
+            'refresh_errors': self._refresh_errors,
+        }
 
     @property
     def channels(self):
@@ -1407,73 +2301,617 @@ class RepoData:
         """Internal Pandas DataFrame object
 
         Try not to use this ... the point of this class is to be able to
-        change the structure in which the data is held.
+        change the structure in which the data is held. The string
+        columns hold codes into a `repodata.StringTable` (see `_get_data`).
+
+        Accessing this loads all `channels` for the default `platforms`.
         """
-        if self._df_ts is not None:
-            seconds = (datetime.datetime.now() - self._df_ts).seconds
+        self._ensure_loaded(self._get_slices())
+        return self._df
+
+    def _get_data(self, channels=None, platform=None):
+        """Get the frame, its depends array and its string table
+
+        Queries must use this rather than accessing `df`, `_depends` and
+        `_strings` separately, as a background refresh may replace them
+        in between.
+
+        The string columns of frames loaded from the channels or the
+        cache (and the depends array) hold codes into the string table
+        (a `repodata.StringTable`). Frames set up directly (e.g. in
+        tests) hold the strings instead and have no string table.
+
+        Args:
+          channels: Channel(s) the query is restricted to. Only these
+            are loaded. Defaults to all `channels`.
+          platform: Platform(s) the query is restricted to. Only these
+            are loaded. Defaults to `platforms`.
+
+        Returns:
+          Tuple of frame, depends array and string table (`None` if the
+          frame holds strings). The frame contains at least the slices
+          requested, but may contain others loaded earlier.
+        """
+        self._ensure_loaded(self._get_slices(channels, platform))
+        with self._swap_lock:
+            strings = self._strings
+            table = strings[1] if strings is not None and strings[0] is self._df else None
+            return self._df, self._depends, table
+
+    def _get_slices(self, channels=None, platform=None):
+        """Get the ``(channel, platform)`` slices needed by a query
+
+        Unsupported platforms are skipped, as there is nothing to load
+        for them (and nothing to find).
+        """
+        if channels is None:
+            channels = self.channels
+        elif isinstance(channels, str):
+            channels = [channels]
+        if platform is None:
+            platforms = self.platforms
+        elif isinstance(platform, str):
+            platforms = [platform]
         else:
-            seconds = 0
+            platforms = platform
+        platforms = [p for p in platforms if p in self.PLATFORM_SUBDIRS]
+        return list(product(channels, platforms))
 
-        if self._df is None or seconds > self.cache_timeout:
-            self._df = self._load_channel_dataframe_cached()
-            self._df_ts = datetime.datetime.now()
-        return self._df
+    def _get_filters(self, channels=None, platform=None):
+        """Get the channels and platforms to restrict query results to
+
+        Slices outside the default `channels` and `platforms` are loaded
+        only if requested. Queries not requesting them must not see them
+        either, regardless of what was loaded for earlier queries.
+        """
+        loaded = [desc.rsplit('/', 1) for desc in self._sources]
+        if channels is None and any(chan not in self.channels for chan, _ in loaded):
+            channels = list(self.channels)
+        if platform is None and any(plat not in self.platforms for _, plat in loaded):
+            platform = list(self.platforms)
+        return channels, platform
+
+    def _ensure_loaded(self, slices):
+        """Load missing **slices** and refresh expired data"""
+        if self._df is not None and not self._sources:
+            return  # frame was set up directly (e.g. in tests)
+        if self._df is None:
+            self._load(slices)
+            return
+        missing = [repo for repo in slices if "{}/{}".format(*repo) not in self._sources]
+        if (self.get_age() or 0) > self.cache_timeout:
+            if self.background_refresh and not missing:
+                self._start_refresh()
+            else:
+                self._load(missing, refresh=True)
+        elif missing:
+            self._load(missing)
+
+    def _load(self, slices=(), refresh=False):
+        """Load the data and replace the current frame with it
+
+        Args:
+          slices: ``(channel, platform)`` tuples to add to the data
+          refresh: Whether to reload the slices loaded previously as well
+        """
+        start = time.monotonic()
+        with self._load_lock:
+            # another thread may have loaded what we need meanwhile
+            if self._df is not None:
+                slices = [repo for repo in slices
+                          if "{}/{}".format(*repo) not in self._sources]
+                if not slices and not refresh:
+                    return
+            df, depends, table, sources, timestamp = self._load_channel_dataframe_cached(
+                slices, refresh)
+            with self._swap_lock:
+                self._df, self._depends, self._sources = df, depends, sources
+                self._strings = (df, table)
+                self._df_ts = timestamp
+        self._refresh_duration = time.monotonic() - start
+        self._refresh_count += 1
+
+    def _start_refresh(self):
+        """Start reloading the data in a background thread
+
+        Does nothing if a refresh is running already or if the last
+        attempt failed less than `REFRESH_RETRY` seconds ago.
+        """
+        with self._swap_lock:
+            thread = self._refresh_thread
+            if thread is not None and (
+                    thread.is_alive() or
+                    time.monotonic() - self._refresh_started < self.REFRESH_RETRY):
+                return
+            logger.info("Repodata expired. Refreshing in background")
+            self._refresh_started = time.monotonic()
+            self._refresh_thread = Thread(target=self._refresh, name="RepoDataRefresh",
+                                          daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh(self):
+        try:
+            self._load(refresh=True)
+        except Exception:  # pylint: disable=broad-except
+            self._refresh_errors += 1
+            logger.exception("Background refresh of repodata failed")
 
     def _make_repodata_url(self, channel, platform):
         if channel == "defaults":
             # caveat: this only gets defaults main, not 'free', 'r' or 'pro'
-            url_template = self.REPODATA_DEFAULTS_URL
-        else:
-            url_template = self.REPODATA_URL
+            return self.REPODATA_DEFAULTS_URL.format(subdir=self.platform2subdir(platform))
+        if '/label/' in channel:
+            channel, label = channel.split('/label/', 1)
+            return self.REPODATA_LABELED_URL.format(channel=channel, label=label,
+                                                    subdir=self.platform2subdir(platform))
+        return self.REPODATA_URL.format(channel=channel,
+                                        subdir=self.platform2subdir(platform))
+
+    def _load_channel_dataframe_cached(self, slices, refresh=False):
+        """Load **slices** in addition to the data loaded already
 
-        url = url_template.format(channel=channel,
-                                  subdir=self.platform2subdir(platform))
-        return url
+        Uses the cache file if it is recent enough. Slices missing from
+        the cache are downloaded and added to it. Expired data, or all
+        data if **refresh** is set, is reloaded.
+
+        Returns:
+          Tuple of frame, depends array, string table, sources and the
+          time at which the data was last refreshed.
+        """
+        now = datetime.datetime.now()
+        previous, timestamp = None, now
+        df, depends, table = self._df, self._depends, None
+        if self._strings is not None and self._strings[0] is df:
+            table = self._strings[1]
+        if df is not None and depends is not None and table is not None:
+            previous, timestamp = (df, depends, table, self._sources), self._df_ts
 
-    def _load_channel_dataframe_cached(self):
         if self.cache_file is not None and os.path.exists(self.cache_file):
             ts = datetime.datetime.fromtimestamp(os.path.getmtime(self.cache_file))
-            seconds = (datetime.datetime.now() - ts).seconds
-            if seconds <= self.cache_timeout:
-                logger.info("Loading repodata from cache %s", self.cache_file)
-                return pd.read_pickle(self.cache_file)
+            seconds = (now - ts).total_seconds()
+            try:
+                cache = repodata.ColumnarCache(self.cache_file)
+                cached = self._read_cache(cache)
+            except ValueError as exc:
+                logger.info("Unable to use repodata cache (%s). Reloading", exc)
             else:
-                logger.info("Repodata cache file too old. Reloading")
+                sources = cache.meta.get('sources', {})
+                if seconds > self.cache_timeout:
+                    logger.info("Repodata cache file too old. Refreshing")
+                    if previous is None:
+                        previous, refresh = cached + (sources,), True
+                elif previous is None or set(previous[3]) <= set(sources):
+                    # the cache may have been extended or refreshed by others
+                    if all("{}/{}".format(*repo) in sources for repo in slices):
+                        logger.info("Loading repodata from cache %s", self.cache_file)
+                        return cached + (sources, ts)
+                    previous, timestamp = cached + (sources,), ts
+                    refresh = False
+
+        loaded = [tuple(desc.rsplit('/', 1)) for desc in previous[3]] if previous else []
+        if refresh:
+            repos = loaded + [repo for repo in slices if repo not in loaded]
+            timestamp = now
+        else:
+            repos = [repo for repo in slices if repo not in loaded]
 
-        res = self._load_channel_dataframe()
+        res, depends, table, sources, changed = self._load_channel_dataframe(previous, repos)
 
         if self.cache_file is not None:
-            res.to_pickle(self.cache_file)
-        return res
+            if changed or not os.path.exists(self.cache_file):
+                self._save_cache(res, depends, table, sources)
+            # the age of the cache is that of its oldest slices
+            os.utime(self.cache_file, (timestamp.timestamp(), timestamp.timestamp()))
+        return res, depends, table, sources, timestamp
+
+    def _save_cache(self, df, depends, table, sources):
+        """Write frame, depends and string table to the cache"""
+        repodata.save_frame(df, self.cache_file, meta={'sources': sources},
+                            arrays={'depends': depends}, table=table,
+                            coded=self._string_columns)
+
+    def _read_cache(self, cache):
+        """Get frame, depends array and string table from `repodata.ColumnarCache`
+
+        Nothing is decoded. All columns and the depends array are used
+        from the memory map, with the string columns holding codes into
+        the (memory mapped) string table.
+
+        Raises:
+          `ValueError` if the cache was not written by `_save_cache`
+        """
+        if 'depends' not in cache.arrays:
+            raise ValueError(f"Repodata cache {cache.path} lacks depends")
+        table = cache.get_strings(self._string_columns[0])
+        df = pd.DataFrame({name: cache.get_codes(name) if name in self._string_columns
+                                 else cache.get_column(name)
+                           for name in self._frame_columns},
+                          columns=self._frame_columns, copy=False)
+        if any(cache.get_strings(name) is not table for name in self._string_columns):
+            raise ValueError(f"Repodata cache {cache.path} has multiple string tables")
+        return df, cache.get_array('depends'), table
+
+    def _load_channel_dataframe(self, previous=None, repos=None):
+        """Download and parse the repodata for channels and platforms
+
+        Args:
+          previous: Tuple of a frame, its depends array, its string table
+            and the matching `_sources` from an earlier load. Requests are made
+            conditional on the stored validators. Slices the server
+            reports as unchanged are taken from the previous frame,
+            changed slices are updated with the added and removed
+            packages (see `_apply_delta`). Slices not in **repos** are
+            kept as they are.
+          repos: ``(channel, platform)`` tuples to download. Defaults to
+            all `channels` for all `platforms`.
+
+        Returns:
+          Tuple of the new frame, its depends array, its string table, the
+          new sources and a flag indicating whether the frame differs from
+          the previous one.
+        """
+        if previous is not None:
+            prev_df, prev_depends, prev_table, prev_sources = previous
+            # Keep the codes of the previous frame, so that the codes of
+            # unchanged packages match between old and new slices.
+            strings = {string: code for code, string in enumerate(prev_table.to_list())}
+        else:
+            prev_df, prev_depends, prev_sources = None, None, {}
+            strings = {}
 
-    def _load_channel_dataframe(self):
-        repos = list(product(self.channels, self.platforms))
+        if repos is None:
+            repos = list(product(self.channels, self.platforms))
+        else:
+            repos = list(repos)
         urls = [self._make_repodata_url(c, p) for c, p in repos]
         descs = ["{}/{}".format(c, p) for c, p in repos]
-
-        def to_dataframe(json_data, meta_data):
+        headers = []
+        for desc in descs:
+            source = prev_sources.get(desc, {})
+            conditions = {}
+            if source.get('etag'):
+                conditions['If-None-Match'] = source['etag']
+            if source.get('last_modified'):
+                conditions['If-Modified-Since'] = source['last_modified']
+            headers.append(conditions)
+
+        # The JSON is parsed while downloading, keeping only the columns
+        # we need (see `repodata.RepodataParser`).
+        parsers = [repodata.RepodataParser(self._load_columns + ['filename'], strings)
+                   for _ in repos]
+
+        def to_dataframe(json_data, meta_data, resp_headers):
             channel, platform = meta_data
-            repo = json.loads(json_data)
-            df = pd.DataFrame.from_dict(repo['packages'], 'index',
-                                        columns=self._load_columns)
-            # Ensure that version is always a string.
-            df['version'] = df['version'].astype(str)
-            df['channel'] = channel
-            df['platform'] = platform
-            df['subdir'] = repo['info']['subdir']
-            return df
+            source = {
+                'etag': resp_headers.get('ETag'),
+                'last_modified': resp_headers.get('Last-Modified'),
+            }
+            if json_data is None:  # not modified
+                return meta_data, None, source
+            parser = parsers[repos.index(meta_data)]
+            parser.close()
+            df = parser.to_frame()
+            for col, value in (('channel', channel), ('platform', platform),
+                               ('subdir', parser.info['subdir'])):
+                df[col] = np.int32(strings.setdefault(value, len(strings)))
+            return meta_data, (df, parser.get_values('depends')), source
+
+        slices = []
+        sources = {}
+        changed = prev_df is None
+        for desc, source in prev_sources.items():
+            if desc not in descs:
+                channel, platform = desc.rsplit('/', 1)
+                slices.append(self._to_codes(
+                    prev_df[(prev_df['channel'] == strings.get(channel, -1)) &
+                            (prev_df['platform'] == strings.get(platform, -1))],
+                    prev_depends))
+                sources[desc] = source
+        results = AsyncRequests.fetch(urls, descs, to_dataframe, repos, headers,
+                                      parsers) if urls else []
+        for (channel, platform), data, source in results:
+            desc = "{}/{}".format(channel, platform)
+            if prev_df is not None and desc in prev_sources:
+                old = self._to_codes(
+                    prev_df[(prev_df['channel'] == strings.get(channel, -1)) &
+                            (prev_df['platform'] == strings.get(platform, -1))],
+                    prev_depends)
+                if data is None:
+                    logger.info("Repodata for %s unchanged", desc)
+                    # servers need not repeat validators with 304
+                    source = {key: value or prev_sources[desc].get(key)
+                              for key, value in source.items()}
+                    data = old
+                else:
+                    data, num_changes = self._apply_delta(old, data)
+                    logger.info("Repodata for %s changed (%i packages added or removed)",
+                                desc, num_changes)
+                    changed |= num_changes > 0
+            else:
+                changed = True
+            slices.append(data)
+            sources[desc] = source
+
+        res, depends, table = self._pack_frame(*self._concat_slices(slices), strings)
+        return res, depends, table, sources, changed
+
+    #: Columns of the frame holding codes into the string table
+    _string_columns = ['build', 'name', 'version', 'channel', 'subdir', 'platform', 'filename']
+    #: Columns of the frame, with ``depends`` held in a separate array
+    _frame_columns = ['build', 'build_number', 'name', 'version', 'depends_start',
+                      'depends_stop', 'channel', 'subdir', 'platform', 'filename']
+
+    def _to_codes(self, df, depends):
+        """Get rows of a loaded frame as slice of codes (see `_concat_slices`)"""
+        data = pd.DataFrame({col: df[col].to_numpy() for col in self._frame_columns})
+        depends, data['depends_start'], data['depends_stop'] = repodata.gather_ranges(
+            depends, data['depends_start'], data['depends_stop'])
+        return data, depends
+
+    def _concat_slices(self, slices):
+        """Concatenate slices of codes
 
-        if urls:
-            dfs = AsyncRequests.fetch(urls, descs, to_dataframe, repos)
-            res = pd.concat(dfs)
+        Each slice is a tuple of a frame, with strings given as codes,
+        and the array of depends codes its ``depends_start`` and
+        ``depends_stop`` columns refer to.
+
+        Returns:
+          Tuple of the concatenated frame and depends array
+        """
+        frames = [pd.DataFrame({col: np.zeros(0, dtype=np.int64)
+                                for col in self._frame_columns})]
+        arrays = [np.zeros(0, dtype=np.int32)]
+        offset = 0
+        for df, depends in slices:
+            depends, starts, stops = repodata.gather_ranges(
+                depends, df['depends_start'], df['depends_stop'])
+            frames.append(df.assign(depends_start=starts + offset,
+                                    depends_stop=stops + offset))
+            arrays.append(depends)
+            offset += len(depends)
+        return pd.concat(frames, ignore_index=True), np.concatenate(arrays)
+
+    def _pack_frame(self, df, depends, strings):
+        """Create the final frame from concatenated slices of codes
+
+        Strings no longer used are dropped from the string table and
+        the remaining strings are sorted, so that sorting by code sorts
+        by value. All string columns hold codes into this table. The
+        rows are sorted by name, so that `_get_name_index` can address
+        each package as a contiguous range of rows without having to
+        reorder the frame.
+
+        Returns:
+          Tuple of the frame, its depends array and the string table
+        """
+        table = np.array(list(strings), dtype=object)
+        used = np.unique(np.concatenate(
+            [df[col].to_numpy(dtype=np.int64) for col in self._string_columns] +
+            [depends.astype(np.int64)]))
+        order = np.argsort(table[used], kind='mergesort')
+        remap = np.full(len(table), -1, dtype=np.int32)
+        remap[used[order]] = np.arange(len(used), dtype=np.int32)
+
+        codes = {col: remap[df[col].to_numpy(dtype=np.int64)]
+                 for col in self._string_columns}
+        rows = np.argsort(codes['name'], kind='mergesort')
+        depends, starts, stops = repodata.gather_ranges(
+            remap[depends], df['depends_start'].to_numpy()[rows],
+            df['depends_stop'].to_numpy()[rows])
+        res = pd.DataFrame({
+            col: codes[col][rows] if col in self._string_columns else df[col].to_numpy()[rows]
+            for col in self._frame_columns
+        })
+        res['build_number'] = res['build_number'].astype(np.int64)
+        res['depends_start'] = starts
+        res['depends_stop'] = stops
+        return res, depends, repodata.StringTable(table[used[order]].tolist(), is_sorted=True)
+
+    def _apply_delta(self, old, new):
+        """Update the repodata slice **old** to match **new**
+
+        Rows are matched by filename and content (packages may be patched
+        in place upstream, e.g. to amend ``depends``). Rows of **old** still
+        present in **new** are kept, rows missing from **new** are dropped
+        and rows only in **new** are added. Both slices must use the same
+        string codes (see `_concat_slices`).
+
+        Returns:
+          Tuple of the updated slice and the number of added and removed rows
+        """
+        def signatures(df, depends):
+            depends = depends.tolist()
+            return list(zip(
+                df['filename'].tolist(), df['build'].tolist(), df['build_number'].tolist(),
+                df['name'].tolist(), df['version'].tolist(),
+                (tuple(depends[start:stop]) for start, stop in zip(
+                    df['depends_start'].tolist(), df['depends_stop'].tolist()))
+            ))
+        old_sigs = signatures(*old)
+        new_sigs = signatures(*new)
+        old_set = set(old_sigs)
+        new_set = set(new_sigs)
+        keep = np.array([sig in new_set for sig in old_sigs], dtype=bool)
+        add = np.array([sig not in old_set for sig in new_sigs], dtype=bool)
+        num_changes = int(add.sum() + len(keep) - keep.sum())
+        return self._concat_slices([(old[0][keep], old[1]), (new[0][add], new[1])]), \
+            num_changes
+
+    def _get_name_index(self, df, table):
+        """Get **df** sorted by name and the sorted names
+
+        The index is built only once for each loaded frame. Frames
+        loaded via `_load_channel_dataframe` are already sorted by
+        name, other frames (e.g. set up directly) are sorted here.
+
+        Args:
+          df: The frame
+          table: The string table of the frame (see `_get_data`)
+
+        Returns:
+          Tuple of the sorted frame and the name of each of its rows,
+          given as codes if the frame has a string table. The rows of
+          a package are found with ``searchsorted`` (see `_select_names`).
+        """
+        cached = self._name_index
+        if cached is not None and cached[0] is df:
+            return cached[1], cached[2]
+
+        sorted_df = df
+        if table is not None:
+            # Work on the codes. This avoids decoding a string for each
+            # row of frames loaded from the (memory mapped) cache.
+            keys = df['name'].to_numpy()
         else:
-            res = pd.DataFrame(columns=self.columns)
+            keys = np.asarray(df['name'].astype(str), dtype=object)
+        if len(keys) and not (keys[:-1] <= keys[1:]).all():
+            order = np.argsort(keys, kind='mergesort')
+            sorted_df = df.iloc[order]
+            keys = keys[order]
+        if not sorted_df.index.equals(pd.RangeIndex(len(sorted_df))):
+            # the index labels are used as row numbers (see `get_depends`)
+            sorted_df = sorted_df.reset_index(drop=True)
+
+        self._name_index = (df, sorted_df, keys)
+        return sorted_df, keys
+
+    def _select_names(self, df, name, table):
+        """Get the rows of frame **df** for one or more package names"""
+        df, keys = self._get_name_index(df, table)
+        names = list(name) if isinstance(name, (list, tuple)) else [name]
+        if table is not None:
+            names = [code for code in table.get_codes(names) if code >= 0]
+        ranges = [(keys.searchsorted(item, 'left'), keys.searchsorted(item, 'right'))
+                  for item in names]
+        if not isinstance(name, (list, tuple)):
+            start, stop = ranges[0] if ranges else (0, 0)
+            return df.iloc[start:stop]
+        rows = [np.arange(start, stop) for start, stop in ranges if start < stop]
+        if not rows:
+            return df.iloc[0:0]
+        return df.iloc[np.concatenate(rows)]
+
+    def _get_depends_index(self, df, depends, table):
+        """Get sorted frame and `DependsIndex` for the depends of **df**
+
+        The index is built on first use for each loaded frame. Each
+        distinct dependency string is decoded and split into package
+        name and constraint only once.
 
-        for col in ('channel', 'platform', 'subdir', 'name', 'version', 'build'):
-            res[col] = res[col].astype('category')
-        res = res.reset_index(drop=True)
+        Args:
+          df: The frame
+          depends: The depends array of the frame (see `_get_data`)
+          table: The string table of the frame (see `_get_data`)
+        """
+        df, _ = self._get_name_index(df, table)
+        cached = self._depends_index
+        if cached is not None and cached[0] is df:
+            return cached
+
+        if table is None:  # lists of strings (e.g. in tests)
+            depends = df['depends']
+            offsets = np.zeros(len(depends) + 1, dtype=np.int64)
+            np.cumsum(np.fromiter(map(len, depends), dtype=np.int64, count=len(depends)),
+                      out=offsets[1:])
+            edges, uniques = pd.factorize(pd.Series(list(chain.from_iterable(depends)),
+                                                    dtype=object))
+        else:
+            values, starts, stops = repodata.gather_ranges(
+                depends, df['depends_start'], df['depends_stop'])
+            offsets = np.concatenate(([0], stops)).astype(np.int64)
+            codes, edges = np.unique(values, return_inverse=True)
+            uniques = table.take(codes)
+        specs = [tuple(dep.split(' ', 1)) if ' ' in dep else (dep, '')
+                 for dep in uniques]
+        spec_names, names = pd.factorize(pd.Series([spec[0] for spec in specs],
+                                                   dtype=object))
+
+        # reverse index: rows of each dependency name, grouped by name id
+        edge_names = spec_names[edges]
+        order = np.argsort(edge_names, kind='mergesort')
+        rows = np.repeat(np.arange(len(df)), np.diff(offsets))
+        rev_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_names, minlength=len(names)), out=rev_offsets[1:])
+
+        index = DependsIndex(
+            offsets=offsets,
+            edges=edges.astype(np.int32),
+            specs=specs,
+            names={name: num for num, name in enumerate(names)},
+            rev_offsets=rev_offsets,
+            rev_rows=rows[order],
+        )
+        self._depends_index = (df, index)
+        return self._depends_index
 
-        return res
+    def _filter_rows(self, df, table, build=None, version=None, channels=None,
+                     platform=None, build_number=None):
+        """Filter rows of **df** by the given column values
+
+        Strings are looked up in the string table **table** (if any),
+        so that the columns are compared by code.
+        """
+        # We iteratively drill down here, starting with the (probably)
+        # most specific columns. Filtering this way on a large data frame
+        # is much faster than executing the comparisons for all values
+        # every time.
+        for col, val in (
+                ('build', build),       # build string should vary a lot
+                ('version', version),   # still pretty good variety
+                ('channel', channels),  # 3 values
+                ('platform', platform), # 3 values
+                ('build_number', build_number), # most values 0
+        ):
+            if val is None:
+                continue
+            if table is not None and col in self._string_columns:
+                val = (table.get_codes(val) if isinstance(val, (list, tuple))
+                       else table.get_code(str(val)))
+            if isinstance(val, (list, tuple, np.ndarray)):
+                df = df[df[col].isin(val)]
+            else:
+                df = df[df[col] == val]
+        return df
+
+    def _decode_columns(self, df, table, columns=None):
+        """Get **df** with the codes in (selected) string columns replaced by strings
+
+        Only the rows of **df** are decoded. Frames without string table
+        are returned as they are.
+        """
+        if table is None:
+            return df
+        if columns is None:
+            columns = df.columns
+        return df.assign(**{col: table.take(df[col].to_numpy())
+                            for col in columns if col in self._string_columns})
+
+    def _get_key(self, df, key, depends, table):
+        """Format result of query as described in `get_package_data`"""
+        if key is None:
+            return not df.empty
+        columns = [key] if isinstance(key, str) else key
+        df = self._with_depends(df, columns, depends, table)
+        df = self._decode_columns(df, table, columns)
+        if isinstance(key, str):
+            return list(df[key])
+        return df[key].itertuples(index=False)
+
+    @staticmethod
+    def _with_depends(df, columns, depends, table):
+        """Add ``depends`` column as lists of strings to **df** if needed
+
+        The frame only holds the range of each row in the **depends**
+        array (see `_get_data`). The strings are created only for the
+        rows returned by a query.
+        """
+        if 'depends' not in columns or 'depends' in df.columns:
+            return df
+        values, _, stops = repodata.gather_ranges(
+            depends, df['depends_start'], df['depends_stop'])
+        strings = table.take(values)
+        starts = stops - (df['depends_stop'] - df['depends_start']).to_numpy()
+        return df.assign(depends=[strings[start:stop] for start, stop in zip(starts, stops)])
 
     @staticmethod
     def native_platform():
@@ -1483,17 +2921,13 @@ class RepoData:
             return "osx"
         raise ValueError("Running on unsupported platform")
 
-    @staticmethod
-    def platform2subdir(platform):
-        if platform == 'linux':
-            return 'linux-64'
-        elif platform == 'osx':
-            return 'osx-64'
-        elif platform == 'noarch':
-            return 'noarch'
-        else:
-            raise ValueError(
-                'Unsupported platform: bioconda only supports linux, osx and noarch.')
+    @classmethod
+    def platform2subdir(cls, platform):
+        try:
+            return cls.PLATFORM_SUBDIRS[platform]
+        except KeyError:
+            raise ValueError('Unsupported platform: bioconda only supports {}.'.format(
+                ', '.join(cls.PLATFORM_SUBDIRS))) from None
 
 
 
@@ -1508,14 +2942,22 @@ class RepoData:
           e.g. {'0.1': ['linux'], '0.2': ['linux', 'osx'], '0.3': ['noarch']}
         """
         # called from doc generator
-        packages = self.df[self.df.name == name][['version', 'platform']]
-        versions = packages.groupby('version').agg(lambda x: list(set(x)))
-        return versions['platform'].to_dict()
+        df, _, table = self._get_data()
+        channels, platform = self._get_filters()
+        packages = self._filter_rows(self._select_names(df, name, table), table,
+                                     channels=channels, platform=platform)
+        packages = self._decode_columns(packages, table, ['platform', 'version'])
+        platforms = packages['platform'].to_numpy(dtype=object)
+        versions = pd.Series(platforms, index=packages.index).groupby(
+            packages['version'].astype(str)).agg(lambda x: list(set(x)))
+        return versions.to_dict()
 
     def get_latest_versions(self, channel):
         """Get the latest version for each package in **channel**"""
         # called from pypi module
-        packages = self.df[self.df.channel == channel]['version']
+        df, _, table = self._get_data(channel)
+        packages = self._decode_columns(self._filter_rows(df, table, channels=channel),
+                                        table, ['version'])['version']
         def max_vers(x):
             return max(VersionOrder(v) for v in x)
         vers = packages.groupby('name').agg(max_vers)
@@ -1534,28 +2976,141 @@ class RepoData:
         if version is not None:
             version = str(version)
 
-        df = self.df
-        # We iteratively drill down here, starting with the (probably)
-        # most specific columns. Filtering this way on a large data frame
-        # is much faster than executing the comparisons for all values
-        # every time, in particular if we are looking at a specific package.
-        for col, val in (
-                ('name', name),         # thousands of different values
-                ('build', build),       # build string should vary a lot
-                ('version', version),   # still pretty good variety
-                ('channel', channels),  # 3 values
-                ('platform', platform), # 3 values
-                ('build_number', build_number), # most values 0
-        ):
-            if val is None:
-                continue
-            if isinstance(val, list) or isinstance(val, tuple):
-                df = df[df[col].isin(val)]
-            else:
-                df = df[df[col] == val]
+        df, depends, table = self._get_data(channels, platform)
+        channels, platform = self._get_filters(channels, platform)
+        # Package names are looked up in the name index, so that a query
+        # for a specific package only ever touches the rows of that package.
+        if name is not None:
+            df = self._select_names(df, name, table)
+        df = self._filter_rows(df, table, build=build, version=version, channels=channels,
+                               platform=platform, build_number=build_number)
+        return self._get_key(df, key, depends, table)
+
+    def get_depends(self, name, version=None, build_number=None, channels=None,
+                    platform=None, build=None, native=False):
+        """Get the dependencies of each matching package file
+
+        Like ``get_package_data('depends', ...)``, but with each
+        dependency split into package name and version constraint.
+
+        Returns:
+          List containing for each package file a list of
+          ``(name, constraint)`` tuples. The constraint is an empty
+          string if the dependency is not constrained.
+        """
+        if native:
+            platform = ['noarch', self.native_platform()]
+        if version is not None:
+            version = str(version)
+        df, depends, table = self._get_data(channels, platform)
+        channels, platform = self._get_filters(channels, platform)
+        _, index = self._get_depends_index(df, depends, table)
+        df = self._filter_rows(self._select_names(df, name, table), table, build=build,
+                               version=version, channels=channels, platform=platform,
+                               build_number=build_number)
+        rows = df.index.to_numpy()  # row numbers of the sorted frame
+        return [[index.specs[spec] for spec in index.edges[start:stop]]
+                for start, stop in zip(index.offsets[rows], index.offsets[rows + 1])]
+
+    def get_dependents(self, name, key='name', channels=None, platform=None):
+        """Get **key** for each package file depending on package **name**
+
+        Uses the reverse index built from the ``depends`` of all
+        package files, so this does not need to scan all rows.
+
+        Args:
+          name: Name of the package required
+          key: As in `get_package_data`. Defaults to the names of the
+               dependent packages, which are repeated for each build.
+          channels: Restrict to dependent packages in these channels
+          platform: Restrict to dependent packages for these platforms
+
+        Returns:
+          List of values of **key** (see `get_package_data`)
+        """
+        df, depends, table = self._get_data(channels, platform)
+        channels, platform = self._get_filters(channels, platform)
+        df, index = self._get_depends_index(df, depends, table)
+        num = index.names.get(name)
+        if num is None:
+            rows = []
+        else:
+            rows = np.unique(index.rev_rows[index.rev_offsets[num]:index.rev_offsets[num + 1]])
+        df = self._filter_rows(df.iloc[rows], table, channels=channels, platform=platform)
+        return self._get_key(df, key, depends, table)
+
+    def get_package_data_bulk(self, queries, key=None, channels=None, platform=None,
+                              native=False, by=('name', 'version', 'build_number')):
+        """Get **key** for many packages at once
 
+        Answers all **queries** with a single join against the channel
+        data instead of calling `get_package_data` once per package.
+
+        Args:
+          queries: DataFrame or iterable of tuples, with one column/item
+                   per column named in **by**.
+          key: Column(s) to return, as in `get_package_data`
+          channels: Restrict to these channels
+          platform: Restrict to these platforms
+          native: Restrict to ``noarch`` and the native platform
+          by: Columns to match **queries** against
+
+        Returns:
+          Dictionary mapping each query tuple to what `get_package_data`
+          would have returned for it (with tuple iterators returned as
+          lists). Queries without matches map to ``False`` or ``[]``.
+        """
+        by = list(by)
+        if isinstance(queries, pd.DataFrame):
+            query_df = queries[by]
+        else:
+            query_df = pd.DataFrame(list(queries), columns=by)
+        query_df = self._normalize_keys(query_df).drop_duplicates()
+
+        if native:
+            platform = ['noarch', self.native_platform()]
+
+        df, depends, table = self._get_data(channels, platform)
+        channels, platform = self._get_filters(channels, platform)
+        if 'name' in by:
+            df = self._select_names(df, list(query_df['name'].unique()), table)
+        df = self._filter_rows(df, table, channels=channels, platform=platform)
+
+        # Join on the codes, so that strings are decoded only for matches
+        keys = query_df.assign(_query=np.arange(len(query_df)))
+        if table is None:
+            data = self._normalize_keys(df[by])
+        else:
+            data = df[by]
+            keys = keys.assign(**{col: table.get_codes(query_df[col])
+                                  for col in by if col in self._string_columns})
+        merged = keys.merge(data.assign(_row=np.arange(len(data))), on=by, how='inner')
+
+        queries = list(query_df.itertuples(index=False, name=None))
+        result = {query: False if key is None else [] for query in queries}
         if key is None:
-            return not df.empty
-        if isinstance(key, str):
-            return list(df[key])
-        return df[key].itertuples(index=False)
+            for num in merged['_query'].tolist():
+                result[queries[num]] = True
+            return result
+        columns = [key] if isinstance(key, str) else list(key)
+        rows = self._with_depends(df.iloc[merged['_row'].to_numpy()], columns, depends, table)
+        rows = self._decode_columns(rows, table, columns)
+        for num, value in zip(merged['_query'].tolist(),
+                              rows[columns].itertuples(index=False, name=None)):
+            if isinstance(key, str):
+                result[queries[num]].append(value[0])
+            else:
+                result[queries[num]].append(value)
+        return result
+
+    @staticmethod
+    def _normalize_keys(df):
+        """Convert key columns to plain types so that frames can be joined"""
+        df = df.copy()
+        for col in df.columns:
+            if col == 'build_number':
+                df[col] = df[col].astype(int)
+            elif col in ('name', 'version', 'build', 'channel', 'platform', 'subdir'):
+                # (converting categories to str would convert all strings in the table)
+                df[col] = df[col].to_numpy(dtype=object).astype(str)
+        return df
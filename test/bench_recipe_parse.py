@@ -0,0 +1,65 @@
+"""Compare time needed to load recipes in round-trip and readonly mode
+
+Usage::
+
+   python test/bench_recipe_parse.py path/to/bioconda-recipes/recipes [--limit N]
+
+Loads all recipes below the folder with `bioconda_utils.recipe.Recipe.from_file`,
+once with the default round-trip YAML loader and once with ``readonly=True``
+(using libyaml if available), and compares the results. The recipe cache
+is disabled for the measurement.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# pylint: disable=wrong-import-position
+from bioconda_utils import utils
+from bioconda_utils.recipe import Recipe, RecipeError, ReadonlyLoader
+
+
+def load_all(recipe_folder, recipe_dirs, readonly):
+    recipes = {}
+    failed = 0
+    start = time.perf_counter()
+    for recipe_dir in recipe_dirs:
+        recipe = Recipe.from_file(recipe_folder, recipe_dir, return_exceptions=True,
+                                  readonly=readonly)
+        if isinstance(recipe, (RecipeError, Exception)):
+            failed += 1
+        else:
+            recipes[recipe_dir] = recipe
+    return recipes, failed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recipe_folder', help="Path to recipes folder")
+    parser.add_argument('--limit', type=int, help="Load only this many recipes")
+    args = parser.parse_args()
+    os.environ.pop(Recipe.CACHE_ENV, None)
+
+    recipe_folder = args.recipe_folder.rstrip('/')
+    recipe_dirs = list(utils.get_recipes(recipe_folder))[:args.limit]
+    print(f"Loading {len(recipe_dirs)} recipes (readonly loader based on "
+          f"{ReadonlyLoader.__mro__[1].__name__})")
+
+    results = {}
+    for readonly in (False, True):
+        recipes, failed, elapsed = load_all(recipe_folder, recipe_dirs, readonly)
+        results[readonly] = recipes
+        mode = "readonly" if readonly else "roundtrip"
+        print(f"{mode:>10}: {elapsed:6.2f}s ({len(recipes)} loaded, {failed} failed)")
+
+    differ = [recipe_dir for recipe_dir, recipe in results[False].items()
+              if recipe_dir in results[True] and recipe.meta != results[True][recipe_dir].meta]
+    print(f"{len(differ)} recipes parsed differently")
+    for recipe_dir in differ[:10]:
+        print("  ", recipe_dir)
+
+
+if __name__ == '__main__':
+    main()
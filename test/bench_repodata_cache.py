@@ -0,0 +1,135 @@
+"""Compare load time and memory of the repodata cache formats
+
+Usage::
+
+   python test/bench_repodata_cache.py RepoDataCache.pkl [--processes 4]
+
+Takes a pickled repodata frame (as written by older versions of
+``RepoData`` when a cache file was set), writes it in the columnar
+format of `bioconda_utils.repodata` and loads each format in fresh
+child processes. For each format, the time to load, the resident set
+size (RSS) and the proportional set size (PSS, Linux only) of each
+child are reported. Pages shared between the children count fully
+towards RSS but only proportionally towards PSS.
+
+The ``pickle`` and ``columnar`` formats load the complete frame. The
+``repodata`` format is the cache as written and used by `RepoData`
+(string columns kept as codes, see `RepoData._read_cache`); its
+children run a query for a single package through `RepoData`, which
+decodes only the strings of the rows found.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from itertools import chain, product
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bioconda_utils import repodata, utils  # pylint: disable=wrong-import-position
+
+
+def _pss_kb():
+    try:
+        with open("/proc/self/smaps_rollup") as fdes:
+            for line in fdes:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _write_repodata_cache(df, path):
+    """Write pickled frame **df** as `RepoData` cache to **path**
+
+    Registers the channels of **df** with `RepoData` and returns the
+    name of the last package, to be used for the queries.
+    """
+    utils.RepoData.register_config({'channels': sorted(set(df['channel']))})
+    repo = utils.RepoData()
+    repo.cache_file = path
+    if 'filename' not in df:
+        df = df.assign(filename='')
+    strings = {}
+
+    def encode(values):
+        return np.array([strings.setdefault(str(value), len(strings)) for value in values],
+                        dtype=np.int32)
+
+    frame = pd.DataFrame({col: encode(df[col]) for col in repo._string_columns})
+    lengths = np.array([len(deps) for deps in df['depends']], dtype=np.int64)
+    frame['build_number'] = df['build_number'].to_numpy()
+    frame['depends_stop'] = np.cumsum(lengths)
+    frame['depends_start'] = frame['depends_stop'] - lengths
+    depends = encode(chain.from_iterable(df['depends']))
+    # pretend all slices queried by default were loaded from the channels
+    sources = {f"{channel}/{platform}": {}
+               for channel, platform in chain(
+                   product(repo.channels, repo.platforms),
+                   zip(df['channel'], df['platform']))}
+    repo._save_cache(*repo._pack_frame(frame, depends, strings), sources)
+    return df['name'].iloc[-1]
+
+
+def _load(fmt, path, barrier, queue, name=None):
+    start = time.perf_counter()
+    if fmt == 'pickle':
+        df = pd.read_pickle(path)
+    elif fmt == 'columnar':
+        df = repodata.load_frame(path)
+    else:
+        # loads the cache written by _write_repodata_cache
+        utils.RepoData().get_package_data(['version', 'build_number', 'depends'], name=name)
+    if fmt != 'repodata':
+        # touch all rows of the most frequently queried columns
+        df['name'].iloc[-1], df['version'].iloc[-1]  # pylint: disable=pointless-statement
+    elapsed = time.perf_counter() - start
+    barrier.wait()  # all children hold their copy now
+    queue.put((elapsed,
+               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               _pss_kb()))
+    barrier.wait()
+
+
+def bench(fmt, path, processes, name=None):
+    barrier = multiprocessing.Barrier(processes)
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_load, args=(fmt, path, barrier, queue, name))
+             for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    times, rss, pss = zip(*results)
+    print(f"{fmt:>8}: load {max(times):7.2f}s (max of {processes}), "
+          f"RSS {sum(rss)/1024:8.1f} MB, "
+          f"PSS {sum(pss)/1024 if None not in pss else float('nan'):8.1f} MB (sum)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pickle', help="Pickled repodata frame")
+    parser.add_argument('--processes', type=int, default=4,
+                        help="Number of processes loading concurrently")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        columnar = os.path.join(tmpdir, 'Columnar')
+        repodata.save_frame(pd.read_pickle(args.pickle), columnar)
+        cache = os.path.join(tmpdir, 'RepoDataCache')
+        name = _write_repodata_cache(pd.read_pickle(args.pickle), cache)
+        bench('pickle', args.pickle, args.processes)
+        bench('columnar', columnar, args.processes)
+        bench('repodata', cache, args.processes, name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare time and peak memory of parsing repodata.json
+
+Usage::
+
+   python test/bench_repodata_parser.py repodata.json [--chunk-size 16384]
+
+Parses a downloaded ``repodata.json`` (e.g. from
+https://conda.anaconda.org/conda-forge/linux-64/repodata.json) the way
+older versions of ``RepoData`` did (``json.loads`` followed by
+``DataFrame.from_dict``) and with `bioconda_utils.repodata.RepodataParser`
+fed in chunks as during download. Peak memory is measured with
+``tracemalloc`` and therefore only includes allocations made by Python.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bioconda_utils import repodata  # pylint: disable=wrong-import-position
+
+
+COLUMNS = ['build', 'build_number', 'name', 'version', 'depends']
+
+
+def parse_json(path, chunk_size):
+    with open(path, 'rb') as fdes:
+        chunks = []
+        while True:
+            chunk = fdes.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    repo = json.loads(b"".join(chunks))
+    df = pd.DataFrame.from_dict(repo['packages'], 'index', columns=COLUMNS)
+    df['version'] = df['version'].astype(str)
+    df['filename'] = df.index
+    return df
+
+
+def parse_streaming(path, chunk_size):
+    parser = repodata.RepodataParser(COLUMNS + ['filename'])
+    with open(path, 'rb') as fdes:
+        while True:
+            chunk = fdes.read(chunk_size)
+            if not chunk:
+                break
+            parser.write(chunk)
+    parser.close()
+    return parser.to_frame()
+
+
+def bench(name, func, path, chunk_size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = func(path, chunk_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>10}: {len(df)} packages in {elapsed:6.2f}s, "
+          f"peak {peak/1024/1024:8.1f} MB, "
+          f"frame {df.memory_usage(deep=True).sum()/1024/1024:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('repodata', help="Path to repodata.json")
+    parser.add_argument('--chunk-size', type=int, default=1024*16,
+                        help="Size of chunks read (as in AsyncRequests)")
+    args = parser.parse_args()
+    bench('json', parse_json, args.repodata, args.chunk_size)
+    bench('streaming', parse_streaming, args.repodata, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
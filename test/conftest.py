@@ -37,6 +37,14 @@ def pytest_runtest_setup(item):
             pytest.xfail("preceding test failed")
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmpdir_factory, monkeypatch):
+    """Keeps caches written by the tests out of the user's cache directory"""
+    path = str(tmpdir_factory.mktemp('cache'))
+    monkeypatch.setenv(utils.CACHE_DIR_ENV, path)
+    return path
+
+
 @pytest.fixture
 def mock_repodata(repodata, case):
     """Pepares RepoData singleton to contain mock data
@@ -0,0 +1,80 @@
+import subprocess as sp
+
+import pytest
+
+from bioconda_utils import graph
+from bioconda_utils.githandler import BiocondaRepo
+from bioconda_utils.recipe import RecipeError
+
+
+RECIPES = {
+    'one': 'package:\n  name: one\n  version: 0.1\n',
+    'two': 'package:\n  name: two\n  version: 0.2\nrequirements:\n  host:\n    - one\n',
+    'two/0.1': 'package:\n  name: two\n  version: 0.1\n',
+    'empty': '',
+}
+
+
+@pytest.fixture
+def git_repo(tmpdir):
+    folder = tmpdir.mkdir('repo')
+    for recipe, text in RECIPES.items():
+        folder.ensure('tools', recipe, 'meta.yaml').write(text)
+    folder.ensure('tools', 'one', 'build.sh').write('make')
+    folder.ensure('README.md').write('readme')
+
+    def run(*args):
+        sp.run(['git', *args], cwd=str(folder), check=True, stdout=sp.DEVNULL)
+    run('init', '-q')
+    run('remote', 'add', 'origin', 'https://github.com/grst/modules.git')
+    run('add', '.')
+    run('-c', 'user.name=test', '-c', 'user.email=test@example.org', 'commit', '-q', '-m', 'first')
+    folder.join('tools', 'one', 'meta.yaml').write(RECIPES['one'].replace('0.1', '0.2'))
+    repo = BiocondaRepo(str(folder))
+    yield repo
+    repo.close()
+
+
+def test_list_files(git_repo):
+    files = git_repo.list_files('HEAD', 'tools', 'meta.yaml')
+    assert sorted(files) == ['tools/empty/meta.yaml', 'tools/one/meta.yaml',
+                             'tools/two/0.1/meta.yaml', 'tools/two/meta.yaml']
+    assert sorted(git_repo.list_files('HEAD', 'tools/one')) == ['tools/one/build.sh',
+                                                               'tools/one/meta.yaml']
+    assert 'README.md' in git_repo.list_files('HEAD')
+
+    objects = [files['tools/one/meta.yaml'], 'HEAD:tools/two/meta.yaml', 'HEAD:missing']
+    assert list(git_repo.read_blobs(objects)) == [
+        (objects[0], RECIPES['one'].encode()),
+        (objects[1], RECIPES['two'].encode()),
+        (objects[2], None),
+    ]
+
+
+def test_iter_recipes(git_repo):
+    recipes = list(git_repo.iter_recipes(return_exceptions=True))
+    errors = [recipe for recipe in recipes if isinstance(recipe, Exception)]
+    assert len(errors) == 1 and isinstance(errors[0], RecipeError)
+    recipes = {recipe.reldir: recipe for recipe in recipes if recipe not in errors}
+    assert sorted(recipes) == ['one', 'two', 'two/0.1']
+    # read from HEAD, not from the modified working tree
+    assert recipes['one'].version == '0.1'
+    assert recipes['two/0.1'].path.endswith('tools/two/0.1/meta.yaml')
+    assert not recipes['one'].is_modified()
+
+    assert sorted(recipe.reldir for recipe in git_repo.iter_recipes(packages='two')) == \
+        ['two', 'two/0.1']
+    with pytest.raises(RecipeError):
+        list(git_repo.iter_recipes())
+
+    assert git_repo.read_from_branch('HEAD', git_repo.repo.working_dir + '/tools/one/meta.yaml') \
+        == RECIPES['one']
+    assert git_repo.read_from_branch('HEAD', git_repo.repo.working_dir + '/missing') is None
+
+
+def test_build_at_ref(git_repo):
+    dag, name2recipes = graph.build_at_ref(git_repo, 'HEAD')
+    assert sorted(dag) == ['one', 'two']
+    assert list(dag.edges()) == [('one', 'two')]
+    tools = git_repo.repo.working_dir + '/tools/'
+    assert name2recipes['two'] == {tools + 'two', tools + 'two/0.1'}
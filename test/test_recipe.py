@@ -1,5 +1,7 @@
 import os.path as op
 import os
+import pickle
+import sys
 
 import pytest
 
@@ -8,7 +10,8 @@ yaml = YAML(typ="rt")  # pylint: disable=invalid-name
 
 from bioconda_utils.recipe import (
     Recipe,
-    EmptyRecipe, MissingMetaYaml, RenderFailure, DuplicateKey, MissingKey
+    EmptyRecipe, MissingMetaYaml, RenderFailure, DuplicateKey, MissingKey,
+    InvalidSelector, TemplateCache, RecipeSummary
 )
 
 RECIPE_DATA = """
@@ -112,10 +115,16 @@ def test_save(recipe):
 def test_recipe_set_original(recipe, recipe_data):
     assert recipe_data['folder'] == recipe.reldir
     assert recipe.meta == recipe.orig.meta
-    recipe.meta['package']['name'] = "test"
+    assert not recipe.is_modified()
+    recipe.reset_buildnumber(1)
     assert recipe.meta != recipe.orig.meta
+    assert recipe.is_modified()
+    assert (recipe.build_number, recipe.orig.build_number) == (1, 0)
+    assert recipe.orig.version == recipe.version
+    assert recipe.orig.get('build/number') == '0'
     recipe.set_original()
     assert recipe.meta == recipe.orig.meta
+    assert not recipe.is_modified()
 
 
 @with_recipes
@@ -140,6 +149,29 @@ def test_recipe_render_duplicate_key(recipe):
         recipe.render()
 
 
+@with_recipes
+def test_recipe_readonly(recipe, recipe_dir, recipes_folder):
+    readonly = Recipe.from_file(str(recipes_folder), str(recipe_dir), readonly=True)
+    assert readonly.readonly and not recipe.readonly
+    assert readonly.meta == recipe.meta
+    assert not hasattr(readonly.meta, 'lc')
+    assert readonly.get('build/number') == '0'
+    assert readonly.version == recipe.version
+    assert readonly.get_raw_range('about/summary') == recipe.get_raw_range('about/summary')
+    assert readonly.orig.get_raw('about/summary') == 'the_summary'
+
+    readonly.meta_yaml += ['extra:', '  flag: true', '  other: yes', '  num: 1.10', '  none:']
+    readonly.render()
+    assert readonly.get('extra') == {'flag': True, 'other': 'yes', 'num': '1.10', 'none': None}
+    readonly.reset_buildnumber(2)
+    assert readonly.build_number == 2
+    assert not hasattr(readonly.meta, 'lc')
+
+    readonly.meta_yaml += ['build:']
+    with pytest.raises(DuplicateKey):
+        readonly.render()
+
+
 def remove_section(data, section):
     start_off = None
     for num, line in enumerate(data):
@@ -249,6 +281,133 @@ def test_recipe_set(recipe):
     assert recipe.get('package/bla/1/0') == 'test4'
 
 
+@with_recipes
+def test_recipe_cache(recipe_dir, recipes_folder, tmpdir, monkeypatch):
+    monkeypatch.setenv(Recipe.CACHE_ENV, str(tmpdir.join('recipe_cache')))
+    recipe = Recipe.from_file(str(recipes_folder), str(recipe_dir))
+    cache = Recipe.get_cache()
+    key = cache.get_key("\n".join(recipe.meta_yaml))
+    assert cache.get(key) == recipe.meta
+
+    # second load is served from the cache, with positions intact
+    cached = Recipe.from_file(str(recipes_folder), str(recipe_dir))
+    assert cached.meta == recipe.meta
+    assert cached.meta is not recipe.meta
+    assert cached.get_raw_range('about/summary') == recipe.get_raw_range('about/summary')
+
+    # changed text means different key
+    cached.meta_yaml.append('extra: {}')
+    cached.render()
+    assert 'extra' in cached.meta
+    assert cache.get_key("\n".join(cached.meta_yaml)) != key
+
+    # broken entries are ignored
+    with open(cache._get_fname(key), 'w') as fdes:
+        fdes.write('garbage')
+    assert Recipe.from_file(str(recipes_folder), str(recipe_dir)).meta == recipe.meta
+
+
+@with_recipes
+def test_recipe_edit(recipe, monkeypatch):
+    renders = []
+    render = recipe.render
+    monkeypatch.setattr(recipe, 'render', lambda: renders.append(1) or render())
+
+    with recipe.edit():
+        assert recipe.replace('0.1', '0.2') == 1
+        recipe.reset_buildnumber(3)
+        with recipe.edit():  # nested blocks render with the outermost
+            recipe.set('about/license', 'MIT')
+        assert not renders
+        assert recipe.version == '0.1'  # not rendered yet
+    assert len(renders) == 1
+    assert (recipe.version, recipe.build_number) == ('0.2', 3)
+    assert recipe.get('about/license') == 'MIT'
+
+    # edits are discarded on errors
+    lines = list(recipe.meta_yaml)
+    with pytest.raises(RuntimeError):
+        with recipe.edit():
+            recipe.reset_buildnumber(4)
+            raise RuntimeError()
+    assert recipe.meta_yaml == lines
+    assert recipe.build_number == 3
+    assert len(renders) == 1
+
+    # inserted lines update positions before they are used again
+    recipe.meta_yaml = [line.replace('number: 3', 'script: true')
+                        for line in recipe.meta_yaml]
+    recipe.render()
+    with recipe.edit():
+        recipe.reset_buildnumber(1)
+        recipe.set('about/summary', 'new_summary')
+    assert recipe.build_number == 1
+    assert recipe.get_raw('about/summary') == 'new_summary'
+
+
+@with_recipes
+def test_recipe_template_cache(recipe, monkeypatch):
+    templates = TemplateCache(recipe.TEMPLATES.env, maxsize=2)
+    monkeypatch.setattr(Recipe, 'TEMPLATES', templates)
+    recipe.render()
+    assert (templates.hits, templates.misses) == (0, 1)
+    meta = recipe.meta
+
+    # changes outside of Jinja tags reuse the compiled template
+    recipe.reset_buildnumber(5)
+    assert (templates.hits, templates.misses) == (1, 1)
+    assert recipe.build_number == 5
+    assert recipe.version == meta['package']['version']
+
+    recipe.replace('0.1', '0.2', within=('package',))
+    recipe.render()
+    assert templates.misses == 2
+    assert recipe.version == '0.2'
+
+    # rendering is unchanged where Jinja lexes text differently
+    for text in ('a: {{ "}}" }}\n', '{%- set x = 1 %}\n b: {{ x }}\n\n',
+                 '{% raw %}{{ x }}{% endraw %}{{ 1 }}', 'plain\n\n'):
+        expected = templates.env.from_string(text).render(recipe.JINJA_VARS)
+        assert templates.get_template(text).render(recipe.JINJA_VARS) == expected
+    assert len(templates._codes) == 2
+
+
+@with_recipes
+def test_recipe_summary(recipe_dir, recipes_folder):
+    summary = RecipeSummary.from_file(str(recipes_folder), str(recipe_dir))
+    recipe = summary.load()
+    assert isinstance(recipe, Recipe) and not recipe.readonly
+    assert not hasattr(summary, '__dict__')
+    assert (summary.reldir, summary.path, str(summary)) == (recipe.reldir, recipe.path, str(recipe))
+    assert (summary.name, summary.version, summary.build_number) == \
+        (recipe.name, recipe.version, recipe.build_number)
+    assert list(summary.package_names) == recipe.package_names
+    assert summary.source_urls == ('https://somewhere',) * (2 if recipe.name == 'two' else 1)
+    assert summary.maintainers == () and summary.get_deps() == []
+
+    recipe.meta_yaml.extend([
+        'requirements:',
+        '  build:',
+        '    - AA',
+        '  run:',
+        '    - BB >1',
+        '    - AA',
+        'extra:',
+        '  recipe-maintainers:',
+        '    - someone',
+    ])
+    recipe.render()
+    summary = pickle.loads(pickle.dumps(RecipeSummary(recipe)))
+    assert summary.deps == {'build': ('AA',), 'run': ('BB', 'AA')}
+    assert summary.get_deps() == ['AA', 'BB']
+    assert summary.get_deps('run') == ['BB', 'AA']
+    assert summary.maintainers == ('someone',)
+    assert summary.name is sys.intern(recipe.name)
+
+    assert isinstance(RecipeSummary.from_file(str(recipes_folder), op.join(str(recipes_folder), 'missing'),
+                                              return_exceptions=True), MissingMetaYaml)
+
+
 @with_recipes
 def test_recipe_package_names(recipe):
     expected = {
@@ -258,6 +417,46 @@ def test_recipe_package_names(recipe):
     assert recipe.package_names == expected
 
 
+@with_recipes
+def test_recipe_platform_meta(recipe):
+    recipe.meta_yaml = [line.replace('# [osx[', '# [osx]') for line in recipe.meta_yaml]
+    recipe.meta_yaml.extend([
+        'requirements:',
+        '  host:',
+        '    - AA',
+        '    - BB  # [linux]',
+        '    - CC  # [osx]',
+        '    - DD  # [py3k and not osx]',
+        '    - EE  # [py27]',
+        '    - FF  # [undefined_name]',
+        '  run:',
+        '    - GG  # [linux]',
+        '    - HH  # [osx]',
+    ])
+    recipe.render()
+    assert set(recipe.get_deps(platform='linux')) == {'AA', 'BB', 'DD', 'GG'}
+    assert set(recipe.get_deps(platform='osx')) == {'AA', 'CC', 'HH'}
+    assert set(recipe.get_deps(platform='noarch')) == {'AA', 'BB', 'DD', 'GG'}
+    py27 = recipe.get_platform_meta('linux', py=27)
+    assert py27['requirements']['host'] == ['AA', 'BB', 'EE']
+    assert recipe.get('requirements/run', platform='osx') == ['HH']
+    if recipe.name == 'two':
+        assert recipe.get('source/0/sha256', platform='linux') == '456'
+        assert recipe.get('source/0/sha256', platform='osx') == '123'
+
+    recipe.set_original()
+    recipe.meta_yaml = [line for line in recipe.meta_yaml if '# [linux]' not in line]
+    recipe.render()
+    assert recipe.orig.get('requirements/run', platform='linux') == ['GG']
+    assert recipe.get('requirements/run', platform='linux') is None
+    assert set(recipe.orig.get_deps(platform='linux')) == {'AA', 'BB', 'DD', 'GG'}
+
+    recipe.meta_yaml.append('    - II  # [osx and]')
+    recipe.render()
+    with pytest.raises(InvalidSelector):
+        recipe.get_platform_meta('osx')
+
+
 @with_recipes
 def test_get_deps_dict(recipe):
     recipe.meta_yaml.extend([
@@ -0,0 +1,500 @@
+import datetime
+import json
+import multiprocessing
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bioconda_utils import repodata, utils
+
+
+REPODATA = {
+    'bioconda': {
+        'zlib-bio': [
+            {'version': '1.0', 'build': 'h1_0', 'build_number': 0, 'platform': 'linux',
+             'subdir': 'linux-64'},
+        ],
+        'one': [
+            {'version': '0.1', 'build': 'py_0', 'build_number': 0},
+            {'version': '0.2', 'build': 'py_0', 'build_number': 0},
+            {'version': '0.2', 'build': 'py_1', 'build_number': 1,
+             'depends': ['python', 'zlib-bio >=1.0,<2']},
+        ],
+    },
+    'conda-forge': {
+        'one': [
+            {'version': '0.3', 'build': 'h1_0', 'build_number': 0, 'platform': 'linux',
+             'subdir': 'linux-64'},
+        ],
+        'two': [
+            {'version': '1.0', 'build': 'h1_0', 'build_number': 0, 'platform': 'osx',
+             'subdir': 'osx-64', 'depends': ['one 0.3.*', 'python >=3']},
+        ],
+    },
+}
+
+
+def with_repodata(func):
+    func = pytest.mark.parametrize('case', ({},))(func)
+    func = pytest.mark.parametrize('repodata', (REPODATA,))(func)
+    return func
+
+
+@pytest.fixture
+def repodata_config(monkeypatch):
+    monkeypatch.setattr(utils.RepoData, 'config', {'channels': ['bioconda', 'conda-forge']})
+
+
+@with_repodata
+def test_get_package_data_by_name(repodata_config, mock_repodata):
+    repo = utils.RepoData()
+    assert sorted(repo.get_package_data('version', name='one')) == ['0.1', '0.2', '0.2', '0.3']
+    assert sorted(repo.get_package_data('version', name='one', channels='bioconda')) == \
+        ['0.1', '0.2', '0.2']
+    assert sorted(repo.get_package_data('name', name=['two', 'zlib-bio', 'missing'])) == \
+        ['two', 'zlib-bio']
+    assert repo.get_package_data('build', name='missing') == []
+    assert repo.get_package_data(name='two', platform='osx')
+    assert not repo.get_package_data(name='two', platform='linux')
+    assert set(repo.get_package_data(['version', 'build_number'],
+                                     name='one', version='0.2')) == {('0.2', 0), ('0.2', 1)}
+
+
+@with_repodata
+def test_get_package_data_without_name(repodata_config, mock_repodata):
+    repo = utils.RepoData()
+    assert sorted(set(repo.get_package_data('name', channels='conda-forge'))) == ['one', 'two']
+    assert sorted(repo.get_package_data('name', platform='linux')) == ['one', 'zlib-bio']
+
+
+@with_repodata
+def test_get_package_data_bulk(repodata_config, mock_repodata):
+    repo = utils.RepoData()
+    queries = [('one', '0.2', 0), ('one', '0.3', 0), ('one', '0.4', 0), ('two', '1.0', 0)]
+    res = repo.get_package_data_bulk(queries, 'channel')
+    assert res == {
+        ('one', '0.2', 0): ['bioconda'],
+        ('one', '0.3', 0): ['conda-forge'],
+        ('one', '0.4', 0): [],
+        ('two', '1.0', 0): ['conda-forge'],
+    }
+    for query in queries:
+        assert repo.get_package_data_bulk([query])[query] == \
+            repo.get_package_data(name=query[0], version=query[1], build_number=query[2])
+
+    res = repo.get_package_data_bulk([('one', '0.2')], ['build', 'build_number'],
+                                     channels='bioconda', by=['name', 'version'])
+    assert sorted(res[('one', '0.2')]) == [('py_0', 0), ('py_1', 1)]
+
+
+@with_repodata
+def test_get_depends(repodata_config, mock_repodata):
+    repo = utils.RepoData()
+    assert repo.get_depends('one', version='0.2', build_number=1) == \
+        [[('python', ''), ('zlib-bio', '>=1.0,<2')]]
+    assert repo.get_depends('one', version='0.2', build_number=0) == [[]]
+    assert repo.get_depends('two') == [[('one', '0.3.*'), ('python', '>=3')]]
+    assert repo.get_depends('missing') == []
+
+
+@with_repodata
+def test_get_dependents(repodata_config, mock_repodata):
+    repo = utils.RepoData()
+    assert sorted(repo.get_dependents('python')) == ['one', 'two']
+    assert repo.get_dependents('python', channels='bioconda') == ['one']
+    assert repo.get_dependents('python', platform='linux') == []
+    assert [tuple(item) for item in repo.get_dependents('one', ['name', 'version'])] == \
+        [('two', '1.0')]
+    assert repo.get_dependents('zlib-bio', 'build') == ['py_1']
+    assert repo.get_dependents('two') == []
+    assert repo.get_dependents('missing') == []
+
+
+def test_columnar_cache_roundtrip(tmpdir):
+    df = pd.DataFrame({
+        'name': ['a', 'a', 'b'],
+        'build_number': [0, 1, 0],
+        'depends': [['python >=3'], [], ['a 1.*', 'python >=3']],
+        'channel': ['bioconda', 'bioconda', 'conda-forge'],
+    })
+    df['name'] = df['name'].astype('category')
+    path = str(tmpdir.join('cache'))
+    repodata.save_frame(df, path)
+    repodata.save_frame(df, path)  # replaces existing cache
+
+    cache = repodata.ColumnarCache(path)
+    assert cache.rows == 3
+    assert list(cache.get_column('build_number')) == [0, 1, 0]
+
+    loaded = repodata.load_frame(path)
+    assert list(loaded.columns) == list(df.columns)
+    for column in df.columns:
+        assert list(loaded[column]) == list(df[column])
+    assert hasattr(loaded['name'], 'cat')
+
+
+def test_columnar_cache_shared_categories(tmpdir):
+    dtype = pd.CategoricalDtype(['a', 'b', 'c'])
+    df = pd.DataFrame({
+        'name': pd.Categorical.from_codes([0, 1], dtype=dtype),
+        'version': pd.Categorical.from_codes([2, 2], dtype=dtype),
+    })
+    path = str(tmpdir.join('cache'))
+    repodata.save_frame(df, path, arrays={'values': [1, 2, 3]})
+    assert not tmpdir.join('cache', 'version.strings.npy').exists()
+
+    cache = repodata.ColumnarCache(path)
+    assert cache.arrays == ['values']
+    assert list(cache.get_array('values')) == [1, 2, 3]
+    loaded = cache.to_frame()
+    assert list(loaded['name']) == ['a', 'b']
+    assert list(loaded['version']) == ['c', 'c']
+    assert loaded['name'].dtype == loaded['version'].dtype
+
+
+def test_columnar_cache_coded(tmpdir):
+    table = repodata.StringTable(['a', 'b', 'c', 'ü'], is_sorted=True)
+    df = pd.DataFrame({
+        'name': np.array([0, 3, 1], dtype=np.int32),
+        'version': np.array([2, 2, 0], dtype=np.int32),
+        'build_number': [0, 1, 0],
+    })
+    path = str(tmpdir.join('cache'))
+    repodata.save_frame(df, path, table=table, coded=['name', 'version'])
+
+    cache = repodata.ColumnarCache(path)
+    assert list(cache.get_codes('name')) == [0, 3, 1]
+    with pytest.raises(ValueError):
+        cache.get_codes('build_number')
+    strings = cache.get_strings('name')
+    assert strings is cache.get_strings('version')
+    assert len(strings) == 4
+    assert strings[3] == 'ü'
+    assert list(strings.take(cache.get_codes('version'))) == ['c', 'c', 'a']
+    assert list(strings.get_codes(['ü', 'a', 'missing', 'bb', ''])) == [3, 0, -1, -1, -1]
+    assert list(cache.to_frame()['name']) == ['a', 'ü', 'b']
+
+
+def test_columnar_cache_replace(tmpdir):
+    path = str(tmpdir.join('cache'))
+    tmpdir.mkdir('cache').join('columns.json').write('{}')  # older layout
+    repodata.save_frame(pd.DataFrame({'build_number': [0]}), path)
+    cache = repodata.ColumnarCache(path)
+    for number in (1, 2):
+        repodata.save_frame(pd.DataFrame({'build_number': [number]}), path)
+    assert os.path.islink(path)
+    assert sorted(os.listdir(str(tmpdir))) == sorted(['cache', 'cache.lock', os.readlink(path)])
+    # maps of replaced caches remain valid
+    assert list(cache.get_column('build_number')) == [0]
+    assert list(repodata.ColumnarCache(path).get_column('build_number')) == [2]
+
+
+def test_columnar_cache_invalid(tmpdir):
+    path = tmpdir.join('cache')
+    path.write('not a cache')
+    with pytest.raises(ValueError):
+        repodata.load_frame(str(path))
+
+
+def test_repodata_parser():
+    data = json.dumps({
+        'info': {'subdir': 'linux-64', 'arch': None},
+        'packages': {
+            'a-1.0-0.tar.bz2': {'name': 'a', 'version': '1.0', 'build': '0',
+                                'build_number': 0, 'depends': ['python >=3', 'b']},
+            'b-2-\u00e4_1.tar.bz2': {'name': 'b', 'version': 2, 'build': '\u00e4_1',
+                                      'build_number': 1, 'depends': [],
+                                      'extra': {'nested': [1, '}"']}},
+            'a-1.1-0.tar.bz2': {'name': 'a', 'version': '1.1', 'build': '0',
+                                'build_number': 0},
+        },
+        'packages.conda': {
+            'c-1.0-0.conda': {'name': 'c', 'version': '1.0', 'build': '0',
+                              'build_number': 0, 'depends': []},
+        },
+        'removed': ['d-1.0-0.tar.bz2'],
+        'repodata_version': 1,
+    }, indent=1, ensure_ascii=False).encode('utf-8')
+    columns = ['build', 'build_number', 'name', 'version', 'depends', 'filename']
+
+    for chunk_size in (1, 7, len(data)):
+        strings = {'b': 0}
+        parser = repodata.RepodataParser(columns, strings)
+        for start in range(0, len(data), chunk_size):
+            parser.write(data[start:start + chunk_size])
+        parser.close()
+        assert parser.info == {'subdir': 'linux-64', 'arch': None}
+        df = parser.to_frame()
+        table = list(strings)
+        assert strings['b'] == 0
+        assert list(df.columns) == ['build', 'build_number', 'name', 'version',
+                                    'depends_start', 'depends_stop', 'filename']
+        assert [table[code] for code in df['filename']] == \
+            ['a-1.0-0.tar.bz2', 'b-2-\u00e4_1.tar.bz2', 'a-1.1-0.tar.bz2']
+        assert [table[code] for code in df['name']] == ['a', 'b', 'a']
+        assert [table[code] for code in df['version']] == ['1.0', '2', '1.1']
+        assert [table[code] for code in df['build']] == ['0', '\u00e4_1', '0']
+        assert list(df['build_number']) == [0, 1, 0]
+        depends = parser.get_values('depends')
+        assert [[table[code] for code in depends[start:stop]]
+                for start, stop in zip(df['depends_start'], df['depends_stop'])] == \
+            [['python >=3', 'b'], [], []]
+
+    parser = repodata.RepodataParser(columns)
+    parser.write(b'{"info": {}, "packages": {}}')
+    parser.close()
+    assert len(parser.to_frame()) == 0
+    assert len(parser.get_values('depends')) == 0
+
+    for empty in (b'{}', b'{"packages": {}}', b'{"info": {}, "packages": { }}'):
+        parser = repodata.RepodataParser(columns)
+        parser.write(empty)
+        parser.close()
+        assert len(parser.to_frame()) == 0
+
+    for invalid in (data[:-1], data + b'{}', b'[]', b'{"packages": {"x": 1}}',
+                    b'{"a": 1,}', b'{"k": }', b'{"packages": {}, }',
+                    b'{"packages": {"x.tar.bz2": {},}}', b'{"packages": {,}}'):
+        for chunk_size in (1, len(invalid)):
+            parser = repodata.RepodataParser(columns)
+            with pytest.raises(ValueError):
+                for start in range(0, len(invalid), chunk_size):
+                    parser.write(invalid[start:start + chunk_size])
+                parser.close()
+
+
+class RepodataServer(HTTPServer):
+    """Serves repodata.json files from **files** (``/channel/subdir/repodata.json``)
+
+    Honors ``If-None-Match`` with ``304`` replies and records the
+    status of each reply in **log**.
+    """
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RepodataRequestHandler)
+        self.files = {}
+        self.log = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%i/{channel}/{subdir}/repodata.json' % self.server_port
+
+    @property
+    def labeled_url(self):
+        return self.url.replace('{subdir}', 'label/{label}/{subdir}')
+
+    def set_packages(self, channel, subdir, packages):
+        self.files[f'/{channel}/{subdir}/repodata.json'] = json.dumps({
+            'info': {'subdir': subdir},
+            'packages': packages,
+        })
+
+
+class RepodataRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.server.log.append((self.path, 404))
+            self.send_error(404)
+            return
+        etag = '"%x"' % (hash(data) & 0xffffffff)
+        if self.headers.get('If-None-Match') == etag:
+            self.server.log.append((self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.log.append((self.path, 200))
+        body = data.encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_package(name, version, build_number=0, depends=()):
+    build = f'h0_{build_number}'
+    return f'{name}-{version}-{build}.tar.bz2', {
+        'name': name, 'version': version, 'build': build,
+        'build_number': build_number, 'depends': list(depends),
+    }
+
+
+@pytest.fixture
+def repodata_server(monkeypatch, tmpdir):
+    server = RepodataServer()
+    monkeypatch.setattr(utils.RepoData, 'config', {'channels': ['bioconda']})
+    repo = utils.RepoData()
+    monkeypatch.setattr(utils.RepoData, 'REPODATA_URL', server.url)
+    monkeypatch.setattr(utils.RepoData, 'REPODATA_LABELED_URL', server.labeled_url)
+    monkeypatch.setattr(utils.RepoData, 'platforms', ['linux', 'noarch'])
+    monkeypatch.setattr(repo, '_df', None)
+    monkeypatch.setattr(repo, '_depends', None)
+    monkeypatch.setattr(repo, '_df_ts', None)
+    monkeypatch.setattr(repo, '_sources', {})
+    monkeypatch.setattr(repo, 'cache_file', str(tmpdir.join('RepoDataCache')))
+    # undone after the test, as `set_timeout` stores them on the singleton
+    monkeypatch.setattr(repo, 'cache_timeout', utils.RepoData.cache_timeout)
+    monkeypatch.setattr(repo, 'background_refresh', utils.RepoData.background_refresh)
+    monkeypatch.setenv(utils.RepoData.SHARED_CACHE_ENV, '')
+    monkeypatch.delenv(utils.RepoData.SHARED_CACHE_ENV)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_repodata_conditional_refresh(repodata_server):
+    server = repodata_server
+    server.set_packages('bioconda', 'linux-64', dict([
+        make_package('one', '1.0'),
+        make_package('two', '1.0', depends=['one >=1']),
+    ]))
+    server.set_packages('bioconda', 'noarch', dict([
+        make_package('three', '0.1'),
+    ]))
+    repo = utils.RepoData()
+    assert sorted(repo.get_package_data('name')) == ['one', 'three', 'two']
+    assert sorted(status for _, status in server.log) == [200, 200]
+    assert repo.get_package_data(['name', 'depends'], name='two').__next__() == \
+        ('two', ['one >=1'])
+    assert repo.get_depends('two') == [[('one', '>=1')]]
+    assert repo.get_dependents('one') == ['two']
+    assert repo.get_package_data_bulk([('two', '1.0', 0)], 'depends') == \
+        {('two', '1.0', 0): [['one >=1']]}
+
+    # linux-64 changes (one removed, two patched, four added), noarch stays
+    server.log.clear()
+    server.set_packages('bioconda', 'linux-64', dict([
+        make_package('two', '1.0', depends=['one >=1,<2']),
+        make_package('four', '2.0'),
+    ]))
+    an_hour_ago = datetime.datetime.now() - datetime.timedelta(hours=1)
+    repo._df_ts = an_hour_ago
+    os.utime(repo.cache_file, (an_hour_ago.timestamp(), an_hour_ago.timestamp()))
+    repo.set_timeout(60)
+    assert sorted(repo.get_package_data('name')) == ['four', 'three', 'two']
+    assert repo.get_package_data('depends', name='two') == [['one >=1,<2']]
+    assert sorted(server.log) == [('/bioconda/linux-64/repodata.json', 200),
+                                  ('/bioconda/noarch/repodata.json', 304)]
+
+    # a new process would start from the on-disk cache
+    server.log.clear()
+    repo._df = None
+    repo._depends = None
+    repo._sources = {}
+    repo._df_ts = None
+    assert sorted(repo.get_package_data('name')) == ['four', 'three', 'two']
+    assert not server.log
+
+
+def test_repodata_lazy_slices(repodata_server):
+    server = repodata_server
+    server.set_packages('bioconda', 'linux-64', dict([make_package('one', '1.0')]))
+    server.set_packages('bioconda', 'noarch', dict([make_package('two', '1.0')]))
+    server.set_packages('bioconda', 'linux-aarch64', dict([make_package('one', '1.1')]))
+    server.set_packages('bioconda/label/dev', 'noarch', dict([make_package('two', '2.0')]))
+    repo = utils.RepoData()
+    assert repo.get_package_data('version', name='two', platform='noarch') == ['1.0']
+    assert server.log == [('/bioconda/noarch/repodata.json', 200)]
+
+    server.log.clear()
+    assert repo.get_package_data('version', name='one', platform='linux-aarch64') == ['1.1']
+    assert repo.get_package_data('version', channels='bioconda/label/dev',
+                                 platform='noarch') == ['2.0']
+    assert sorted(server.log) == [('/bioconda/label/dev/noarch/repodata.json', 200),
+                                  ('/bioconda/linux-aarch64/repodata.json', 200)]
+
+    # queries not asking for the extra slices load the defaults only
+    server.log.clear()
+    assert sorted(repo.get_package_data(['name', 'version'])) == \
+        [('one', '1.0'), ('two', '1.0')]
+    assert repo.get_versions('one') == {'1.0': ['linux']}
+    assert server.log == [('/bioconda/linux-64/repodata.json', 200)]
+
+    # the cache holds all slices loaded
+    server.log.clear()
+    repo._df = repo._depends = None
+    repo._sources = {}
+    assert repo.get_package_data('platform', name='one', platform='linux-aarch64') == \
+        ['linux-aarch64']
+    assert not server.log
+    with pytest.raises(ValueError):
+        repo.platform2subdir('win')
+
+
+def _query_in_child(queue):
+    repo = utils.RepoData()
+    repo._df = repo._depends = None  # as in a freshly started process
+    repo.cache_file = os.environ[utils.RepoData.SHARED_CACHE_ENV]
+    queue.put(sorted(repo.get_package_data('name')))
+
+
+def test_repodata_share(repodata_server):
+    server = repodata_server
+    server.set_packages('bioconda', 'linux-64', dict([make_package('one', '1.0')]))
+    server.set_packages('bioconda', 'noarch', dict([make_package('two', '1.0')]))
+    repo = utils.RepoData()
+    path = repo.share()
+    assert os.environ[utils.RepoData.SHARED_CACHE_ENV] == path == repo.cache_file
+    assert len(server.log) == 2
+
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_query_in_child, args=(queue,)) for _ in range(2)]
+    for proc in procs:
+        proc.start()
+    assert [queue.get(timeout=30) for _ in procs] == [['one', 'two']] * 2
+    for proc in procs:
+        proc.join()
+    assert len(server.log) == 2  # children did not download
+
+
+def test_repodata_background_refresh(repodata_server):
+    server = repodata_server
+    server.set_packages('bioconda', 'linux-64', dict([make_package('one', '1.0')]))
+    server.set_packages('bioconda', 'noarch', {})
+    repo = utils.RepoData()
+    repo.set_timeout(60, background=True)
+    assert repo.get_package_data('name') == ['one']
+    metrics = repo.get_metrics()
+    assert metrics['age'] < 60
+    assert not metrics['refreshing']
+    assert metrics['last_refresh_duration'] >= 0
+
+    server.set_packages('bioconda', 'linux-64', dict([make_package('two', '1.0')]))
+    a_day_ago = datetime.datetime.now() - datetime.timedelta(days=1)
+    repo._df_ts = a_day_ago  # age exceeding a day must not wrap around
+    os.utime(repo.cache_file, (a_day_ago.timestamp(), a_day_ago.timestamp()))
+    assert repo.get_age() > 60 * 60 * 24
+    # stale data is served while the refresh runs
+    thread_started = threading.Event()
+    release = threading.Event()
+    load = repo._load_channel_dataframe_cached
+
+    def slow_load(*args):
+        thread_started.set()
+        release.wait(10)
+        return load(*args)
+    repo._load_channel_dataframe_cached = slow_load
+    try:
+        assert repo.get_package_data('name') == ['one']
+        assert thread_started.wait(10)
+        assert repo.get_metrics()['refreshing']
+        assert repo.get_package_data('name') == ['one']
+        release.set()
+        repo._refresh_thread.join(10)
+    finally:
+        del repo._load_channel_dataframe_cached
+    assert repo.get_package_data('name') == ['two']
+    metrics = repo.get_metrics()
+    assert metrics['age'] < 60
+    assert not metrics['refreshing']
+    assert metrics['refresh_errors'] == 0
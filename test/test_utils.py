@@ -1,22 +1,29 @@
 import os
+import random
 import sys
 import subprocess as sp
 import pytest
 import yaml
 import tempfile
+import time
 import requests
 import uuid
 import contextlib
 import tarfile
 import logging
 import shutil
+from itertools import chain
 from textwrap import dedent
 
+import networkx as nx
+
 from bioconda_utils import utils
+from bioconda_utils import graph
 from bioconda_utils import pkg_test
 from bioconda_utils import docker_utils
 from bioconda_utils import build
 from bioconda_utils import upload
+from bioconda_utils.recipe import Recipe
 from helpers import ensure_missing, Recipes
 
 
@@ -892,6 +899,366 @@ def test_variants():
     assert len(utils.load_all_meta(recipe, config)) == 2
 
 
+def test_render_cache(tmpdir, monkeypatch):
+    """
+    Renderings should be reused unless recipe or variant config change
+    """
+    r = Recipes(
+        """
+        one:
+          meta.yaml: |
+            package:
+              name: one
+              version: "0.1"
+            requirements:
+              build:
+                - mypkg {{ mypkg }}
+        """, from_string=True)
+    r.write_recipes()
+    recipe = r.recipe_dirs['one']
+
+    calls = []
+    render = utils.api.render
+    def counting_render(*args, **kwargs):
+        calls.append(args)
+        return render(*args, **kwargs)
+    monkeypatch.setattr(utils.api, 'render', counting_render)
+    monkeypatch.setenv(utils.RenderCache.ENV, str(tmpdir))
+
+    tmp = tmpdir.join('conda_build_config.yaml')
+    tmp.write("mypkg:\n  - 1.0\n  - 2.0\n")
+    config = utils.load_conda_build_config()
+    config.exclusive_config_files = [str(tmp)]
+
+    metas = utils.load_all_meta(recipe, config, finalize=False)
+    assert len(metas) == 2
+    assert len(utils.load_all_meta(recipe, config, finalize=False)) == 2
+    assert len(calls) == 1
+
+    # finalized renderings depend on the channels and are not cached
+    assert len(utils.load_all_meta(recipe, config)) == 2
+    assert len(utils.load_all_meta(recipe, config)) == 2
+    assert len(calls) == 3
+
+    tmp.write("mypkg:\n  - 1.0\n")
+    assert len(utils.load_all_meta(recipe, config, finalize=False)) == 1
+    assert len(calls) == 4
+
+    with open(os.path.join(recipe, 'meta.yaml'), 'a') as fdes:
+        fdes.write("about:\n  license: MIT\n")
+    metas = utils.load_all_meta(recipe, config, finalize=False)
+    assert len(calls) == 5
+    assert metas[0].get_value('about/license') == 'MIT'
+
+
+def _pid_and_config(value):
+    return os.getpid(), value, id(utils.RenderPool.build_config())
+
+
+def test_render_pool(monkeypatch, tmpdir):
+    """
+    Workers should be reused, keep their config and follow the environment
+    """
+    items = list(range(20))
+    results = list(utils.parallel_iter(_pid_and_config, items, "Testing"))
+    assert [value for _, value, _ in results] == items
+    pids = {pid for pid, _, _ in results}
+    assert os.getpid() not in pids
+    configs = {pid: config for pid, _, config in results}
+    assert all(configs[pid] == config for pid, _, config in results)
+
+    results = list(utils.parallel_iter(_pid_and_config, items, "Testing"))
+    assert pids & {pid for pid, _, _ in results}
+
+    # unrelated variables do not restart the workers
+    monkeypatch.setenv("BIOCONDA_TEST_RENDER_POOL", "1")
+    results = list(utils.parallel_iter(_pid_and_config, items, "Testing"))
+    assert pids & {pid for pid, _, _ in results}
+
+    # neither does a change while work is pending
+    future = utils.RenderPool.submit(time.sleep, 0.5)
+    monkeypatch.setenv(utils.RenderCache.ENV, str(tmpdir))
+    assert utils.RenderPool.submit(os.getpid).result() in pids
+    future.result()
+
+    results = list(utils.parallel_iter(_pid_and_config, items, "Testing"))
+    assert not pids & {pid for pid, _, _ in results}
+    assert {utils.RepoData.SHARED_CACHE_ENV, Recipe.CACHE_ENV} <= \
+        set(utils.RenderPool.ENV_VARS)
+    utils.RenderPool.shutdown()
+
+
+def _square(value):
+    return value * value
+
+
+def test_render_pool_imap():
+    """
+    Items should be consumed lazily, keeping a bounded number in flight
+    """
+    consumed = []
+
+    def items():
+        for value in range(100):
+            consumed.append(value)
+            yield value
+
+    results = utils.RenderPool.imap(_square, items(), chunksize=3, window=2)
+    first = next(results)
+    assert first in {value * value for value in range(6)}
+    assert len(consumed) <= 3 * 3
+    assert sorted([first] + list(results)) == [value * value for value in range(100)]
+
+    results = utils.RenderPool.imap(_square, items(), chunksize=7, ordered=True)
+    assert list(results) == [value * value for value in range(100)]
+    with pytest.raises(TypeError):
+        list(utils.RenderPool.imap(_square, [1, None, 2]))
+    utils.RenderPool.shutdown()
+
+
+def test_make_private_dir(tmpdir, monkeypatch):
+    """
+    Private directories should be created for and owned by the current user only
+    """
+    path = str(tmpdir.join('a', 'private'))
+    assert utils.make_private_dir(path) == path
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+    os.chmod(path, 0o777)
+    utils.make_private_dir(path)
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(path).st_uid + 1)
+    with pytest.raises(PermissionError):
+        utils.make_private_dir(path)
+    monkeypatch.undo()
+
+    tmpdir.join('link').mksymlinkto(path)
+    with pytest.raises(PermissionError):
+        utils.make_private_dir(str(tmpdir.join('link')))
+
+
+def test_recipe_manifest(tmpdir, monkeypatch):
+    """
+    Recipes should be found via the manifest, listing only changed directories
+    """
+    folder = tmpdir.mkdir('recipes')
+    for recipe in ('a', 'b', 'b/1.0', '.hidden'):
+        folder.ensure(recipe, 'meta.yaml').write(recipe)
+    folder.ensure('c', 'build.sh')
+
+    def set_old_times():
+        for path in [folder] + list(folder.visit()):
+            os.utime(str(path), (1e9, 1e9))
+    set_old_times()
+
+    base = str(folder)
+    get = lambda *args: [os.path.relpath(path, base) for path in utils.get_recipes(base, *args)]
+    assert get() == ['a', 'b', 'b/1.0']
+    assert get('b') == ['b', 'b/1.0']
+    assert get(['b/*', 'a']) == ['a', 'b/1.0']
+    assert get('*', ['*1.0', '/a']) == ['b']
+    assert get([]) == []
+    assert os.path.exists(utils.get_recipe_cache_path(base, 'manifest.json'))
+    assert tmpdir.listdir() == [folder]  # nothing written into the recipes repo
+
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or scandir(path))
+    manifest = utils.RecipeManifest(base)  # as in new process
+    manifest.update()
+    assert not scanned
+    assert manifest.check_files() == ({'a', 'b', 'b/1.0'}, set())
+    assert manifest.check_files() == (set(), set())
+
+    folder.join('a', 'meta.yaml').write('changed')
+    folder.ensure('d', 'meta.yaml').write('d')
+    folder.join('b', '1.0').remove()
+    scanned.clear()
+    assert manifest.check_files() == ({'a', 'd'}, {'b/1.0'})
+    assert sorted(os.path.relpath(path, base) for path in scanned) == ['.', 'b', 'd']
+    assert manifest.get_recipes() == [os.path.join(base, recipe) for recipe in ('a', 'b', 'd')]
+
+    set_old_times()
+    manifest.check_files()
+    scanned.clear()
+    manifest = utils.RecipeManifest(base)
+    assert manifest.check_files() == (set(), set())
+    assert not scanned
+
+
+def test_get_latest_recipes(tmpdir, monkeypatch):
+    folder = tmpdir.mkdir('recipes')
+    for recipe, version in (('one', '1.0'), ('one/0.9', '0.9'), ('one/1.10', '1.10'),
+                            ('two', '2'), ('three/1.0', '1.0')):
+        folder.ensure(recipe, 'meta.yaml').write(
+            '{% set version = "' + version + '" %}\n'
+            'package:\n  name: x\n  version: {{ version }}\n'
+            'requirements:\n  build:\n    - {{ compiler("c") }}\n')
+    folder.ensure('three', 'meta.yaml').write(
+        'package:\n  name: three\n  version: "{{ environ.get(\'VERSION\') }}"\n')
+    folder.ensure('four', 'meta.yaml').write(
+        'package:\n  name: four\n  version: "1.{{ minor }}"\n')
+    folder.ensure('five', 'meta.yaml').write(
+        'package:\n  name: five\n'
+        '  version: 1.0  # [linux]\n'
+        '  version: 2.0  # [osx]\n')
+
+    assert utils.get_recipe_version(str(folder.join('one', '1.10'))) == '1.10'
+    assert utils.get_recipe_version(str(folder.join('three'))) is None
+    assert utils.get_recipe_version(str(folder.join('four'))) is None
+    assert utils.get_recipe_version(str(folder.join('five')), 'linux') == '1.0'
+    assert utils.get_recipe_version(str(folder.join('five')), 'osx') == '2.0'
+
+    rendered = []
+
+    class Meta:
+        @staticmethod
+        def get_value(key):
+            assert key == 'package/version'
+            return '0.1'
+
+    def load_first_metadata(path, finalize=True):
+        rendered.append(path)
+        return Meta()
+    monkeypatch.setattr(utils, 'load_first_metadata', load_first_metadata)
+    latest = utils.get_latest_recipes(str(folder), {}, ['one', 'two', 'three'])
+    assert sorted(os.path.relpath(path, str(folder)) for path in latest) == \
+        ['one/1.10', 'three/1.0', 'two']
+    assert rendered == [str(folder.join('three', 'meta.yaml'))]
+
+
+def _recipe_text(recipe):
+    with open(os.path.join(recipe, 'meta.yaml')) as fdes:
+        text = fdes.read()
+    if text == 'broken':
+        raise ValueError(recipe)
+    return text
+
+
+def test_recipe_graph_store(tmpdir, monkeypatch):
+    """
+    Recipes should be parsed again only if their meta.yaml changed
+    """
+    folder = tmpdir.mkdir('recipes')
+    folder.ensure('a', 'meta.yaml').write(
+        'package:\n  name: a\nrequirements:\n  host:\n    - b >=1\n    - zlib\n')
+    folder.ensure('b', 'meta.yaml').write('package:\n  name: b\n')
+    folder.ensure('c', 'meta.yaml').write(
+        'package:\n  name: c\nrequirements:\n  build:\n    - a\n  run:\n    - b\n')
+    base = str(folder)
+
+    dag, name2recipes = graph.build(utils.get_recipes(base), None, recipe_folder=base)
+    assert sorted(dag.edges()) == [('a', 'c'), ('b', 'a')]
+    assert name2recipes['a'] == {os.path.join(base, 'a')}
+    fname = 'graph_deps_{}.pkl'.format(utils.get_build_platform())
+    assert os.path.exists(utils.get_recipe_cache_path(base, fname))
+    assert tmpdir.listdir() == [folder]  # nothing written into the recipes repo
+
+    store = graph.RecipeGraphStore(base, 'text', _recipe_text)
+    assert store.update()['b'] == 'package:\n  name: b\n'
+    store.records['b'] = (store.records['b'][0], 'cached')
+    store.save()
+    folder.join('a', 'meta.yaml').write('package:\n  name: a\n')
+    folder.join('c').remove()
+    folder.ensure('d', 'meta.yaml').write('broken')
+    store = graph.RecipeGraphStore(base, 'text', _recipe_text)  # as in new process
+    assert store.update() == {'a': 'package:\n  name: a\n', 'b': 'cached'}
+    assert store.update(['b', 'c']) == {'b': 'cached'}
+    # recipes parsed before the failure were saved, as was the failure
+    store = graph.RecipeGraphStore(base, 'text', _recipe_text)
+    assert sorted(store.records) == ['a', 'b']
+    assert list(store.failures) == ['d']
+
+    # broken recipes are skipped, and not parsed again while unchanged
+    dag, _ = graph.build(utils.get_recipes(base), None, recipe_folder=base)
+    assert sorted(dag) == ['a', 'b']
+    with monkeypatch.context() as mpatch:
+        mpatch.setattr(utils.RenderPool, 'imap', None)
+        dag, _ = graph.build(utils.get_recipes(base), None, recipe_folder=base)
+    assert sorted(dag) == ['a', 'b']
+    folder.join('d').remove()
+
+    # stores written by other bioconda-utils versions are discarded
+    monkeypatch.setattr(graph, '__version__', 'other')
+    assert not graph.RecipeGraphStore(base, 'text', _recipe_text).records
+    monkeypatch.undo()
+
+    dag, _ = graph.build(utils.get_recipes(base), None, recipe_folder=base)
+    assert sorted(dag) == ['a', 'b'] and not dag.edges()
+    utils.RenderPool.shutdown()
+
+
+def test_check_recipes_skippable(tmpdir, monkeypatch):
+    """
+    Recipes should be checked with conda-build unless their packages are missing
+    """
+    folder = tmpdir.mkdir('recipes')
+    folder.ensure('one', 'meta.yaml').write(
+        'package:\n  name: one\n  version: 1.0\nbuild:\n  number: 2\n')
+    folder.ensure('two', 'meta.yaml').write('package:\n  name: two\n  version: 0.1\n')
+    base = str(folder)
+    recipes = [os.path.join(base, 'one'), os.path.join(base, 'two')]
+
+    class RepoDataStub:
+        def get_package_data_bulk(self, keys, key, channels=None, native=False):
+            assert (key, channels, native) == ('subdir', ['bioconda'], True)
+            return {query: ['linux-64'] if query == ('one', '1.0', 2) else []
+                    for query in keys}
+
+    checked = {}
+
+    def check_recipe_skippable(recipe, check_channels, package_data=None):
+        checked[recipe] = package_data
+        return True
+
+    monkeypatch.setattr(utils, 'RepoData', RepoDataStub)
+    monkeypatch.setattr(utils, 'check_recipe_skippable', check_recipe_skippable)
+    monkeypatch.setattr(utils, 'parallel_iter',
+                        lambda func, items, desc, *args: (func(*args, item) for item in items))
+    # packages not found may still exist under the name, version or build
+    # number conda-build renders, so "two" is left to be checked later
+    assert build.check_recipes_skippable(base, recipes, ['bioconda']) == \
+        {recipes[0]: True, recipes[1]: None}
+    assert checked == {recipes[0]: {('one', '1.0', 2): ['linux-64']}}
+
+
+def test_indexed_graph():
+    """
+    Closures, cycles and order should match those found by networkx
+    """
+    rand = random.Random(1)
+    dag = nx.gnp_random_graph(200, 0.01, seed=1, directed=True)
+    dag.add_nodes_from(['isolated', 'self'])
+    dag.add_edge('self', 'self')
+    indexed = graph.IndexedGraph.from_networkx(dag)
+    assert len(indexed) == len(dag)
+    assert sorted(indexed.to_networkx().edges(), key=str) == sorted(dag.edges(), key=str)
+
+    # reached by at least one edge (nx excludes the source even if in a cycle)
+    def reached(nodes, neighbors, closure):
+        return {found for node in nodes for neighbor in neighbors(node)
+                for found in closure(dag, neighbor) | {neighbor}}
+    for _ in range(20):
+        nodes = rand.sample(sorted(dag, key=str), 3)
+        assert indexed.ancestors(nodes) == reached(nodes, dag.predecessors, nx.ancestors)
+        assert indexed.descendants(nodes) == reached(nodes, dag.successors, nx.descendants)
+    assert indexed.descendants([]) == set()
+    with pytest.raises(KeyError):
+        indexed.ancestors(['missing'])
+
+    cycles = [sorted(comp) for comp in nx.strongly_connected_components(dag) if len(comp) > 1]
+    assert sorted(map(sorted, indexed.cycles()), key=str) == sorted(cycles + [['self']], key=str)
+    with pytest.raises(ValueError):
+        indexed.topological_sort()
+
+    dag.remove_nodes_from(list(chain.from_iterable(indexed.cycles())))
+    order = graph.IndexedGraph.from_networkx(dag).topological_sort()
+    assert sorted(order, key=str) == sorted(dag, key=str)
+    position = {node: num for num, node in enumerate(order)}
+    assert all(position[source] < position[target] for source, target in dag.edges())
+
+
 @pytest.mark.long_running_2
 def test_cb3_outputs(config_fixture):
     r = Recipes(